@@ -0,0 +1,249 @@
+import hashlib
+import json
+import os
+from functools import lru_cache
+import numpy as np
+import librosa
+from pathlib import Path
+
+from jcr import file_sha256
+from profiling import span
+
+# ==========================================
+# 解析キャッシュ（デコード済みPCM・HPSS調波成分・振幅スペクトログラム）
+# ==========================================
+# キーは「ファイル内容のハッシュ + 段階名 + パラメータ」なので、
+# ファイル名が変わっても内容が同じならヒットし、内容やパラメータが変われば別エントリになる。
+# 各エントリは <key>.npy と <key>.json（メタデータ）で、.npy は memmap で読む。
+# 最終使用時刻（.npy の mtime）が古いものから、合計サイズが上限を超えないよう削除する。
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "joycon-mp3player"
+DEFAULT_MAX_BYTES = 4 * 1024 ** 3
+
+
+class AnalysisCache:
+    def __init__(self, root=DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._hashes = {}
+
+    def source_hash(self, path: str) -> str:
+        # 同じプロセス内では (パス, サイズ, 更新時刻) が同じ間はハッシュを使い回す
+        st = os.stat(path)
+        memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+        if memo_key not in self._hashes:
+            self._hashes[memo_key] = file_sha256(path).hex()
+        return self._hashes[memo_key]
+
+    def key(self, path: str, stage: str, **params) -> str:
+        desc = json.dumps(
+            {"source": self.source_hash(path), "stage": stage, "params": params},
+            sort_keys=True,
+        )
+        return f"{stage}-{hashlib.sha256(desc.encode()).hexdigest()[:32]}"
+
+    def _paths(self, key: str) -> (Path, Path):
+        return self.root / f"{key}.npy", self.root / f"{key}.json"
+
+    def load(self, key: str) -> (np.ndarray, dict):
+        """ヒットすれば (memmap配列, メタデータ)、無ければ (None, None) を返す"""
+        npy_path, meta_path = self._paths(key)
+        try:
+            array = np.load(npy_path, mmap_mode='r')
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None, None
+        try:
+            os.utime(npy_path)  # LRU のため最終使用時刻を更新
+        except OSError:
+            pass  # 読んだ直後に他のプロセスが evict した（memmap は開いたまま使える）
+        return array, meta
+
+    def store(self, key: str, array: np.ndarray, **meta) -> np.ndarray:
+        """保存して memmap で読み直した配列を返す"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        npy_path, meta_path = self._paths(key)
+        # 書き込み途中のファイルを読まれないよう、どちらも一時ファイルに書いてから置き換える
+        tmp_path = npy_path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_meta_path = meta_path.with_suffix(f".{os.getpid()}.json.tmp")
+        with open(tmp_path, 'wb') as f:
+            np.save(f, np.ascontiguousarray(array))
+        with open(tmp_meta_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        # メタデータが無い間は load がミスとして扱うので、配列を先に置く
+        os.replace(tmp_path, npy_path)
+        os.replace(tmp_meta_path, meta_path)
+        stored = np.load(npy_path, mmap_mode='r')
+        self.evict(keep=key)
+        return stored
+
+    def entries(self) -> list:
+        """(キー, 合計サイズ, 最終使用時刻) のリストを古い順に返す"""
+        if not self.root.exists():
+            return []
+        out = []
+        for npy_path in self.root.glob("*.npy"):
+            meta_path = npy_path.with_suffix(".json")
+            try:
+                size = npy_path.stat().st_size
+                size += meta_path.stat().st_size if meta_path.exists() else 0
+                out.append((npy_path.stem, size, npy_path.stat().st_mtime))
+            except FileNotFoundError:
+                continue
+        return sorted(out, key=lambda e: e[2])
+
+    def _remove(self, key: str) -> bool:
+        for p in self._paths(key):
+            try:
+                p.unlink()
+            except FileNotFoundError:
+                pass
+            except OSError:  # 他のプロセスが memmap で開いている場合など
+                return False
+        return True
+
+    def evict(self, max_bytes: int = None, keep: str = None) -> int:
+        """
+        合計サイズが上限以下になるまで最も長く使われていないエントリから削除する。
+        keep に指定したエントリ（直前に保存したもの）は上限を超えていても残す。
+        """
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        entries = self.entries()
+        total = sum(e[1] for e in entries)
+        removed = 0
+        for key, size, _ in entries:
+            if total <= limit:
+                break
+            if key == keep or not self._remove(key):
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+    def purge(self) -> int:
+        return self.evict(max_bytes=0)
+
+
+@lru_cache(maxsize=None)
+def _cache_for(root: str, max_bytes: int) -> AnalysisCache:
+    return AnalysisCache(root, max_bytes)
+
+
+def default_cache():
+    """
+    環境変数 JOYCON_CACHE_DIR / JOYCON_CACHE_MAX_MB で場所と上限を変えられる。
+    JOYCON_CACHE=0 でキャッシュを無効にする（None を返す）。
+    """
+    if os.environ.get("JOYCON_CACHE", "1") == "0":
+        return None
+    root = os.environ.get("JOYCON_CACHE_DIR", str(DEFAULT_CACHE_DIR))
+    max_mb = os.environ.get("JOYCON_CACHE_MAX_MB")
+    max_bytes = int(max_mb) * 1024 ** 2 if max_mb else DEFAULT_MAX_BYTES
+    # 同じ設定なら同じインスタンスを使い、ファイルハッシュの計算結果を共有する
+    return _cache_for(root, max_bytes)
+
+
+# ==========================================
+# 解析の各段階（キャッシュがあれば再計算しない）
+# ==========================================
+# 計算の本体。計測の区間もここで取る（キャッシュにヒットした場合は現れない）
+def _decode(path: str, sr: int) -> (np.ndarray, int):
+    with span("decode", unit="samples") as s:
+        y, sr = librosa.load(path, sr=sr, mono=True)
+        s.count = len(y)
+    return y, sr
+
+
+def _hpss_harmonic(y: np.ndarray, margin: float) -> np.ndarray:
+    with span("hpss", count=len(y), unit="samples"):
+        return librosa.effects.hpss(y, margin=margin)[0]
+
+
+def _stft_magnitude(y: np.ndarray, n_fft: int, hop_length: int) -> np.ndarray:
+    with span("stft", count=len(y), unit="samples"):
+        return np.abs(librosa.stft(y, n_fft=n_fft, hop_length=hop_length))
+
+
+def cached_load(path: str, sr: int = None, cache=None) -> (np.ndarray, int):
+    """librosa.load(path, sr=sr, mono=True) 相当"""
+    cache = cache or default_cache()
+    if cache is None:
+        return _decode(path, sr)
+
+    key = cache.key(path, "pcm", sr=sr)
+    y, meta = cache.load(key)
+    if y is None:
+        y, loaded_sr = _decode(path, sr)
+        y = cache.store(key, y, sr=loaded_sr)
+        return y, loaded_sr
+    return y, meta["sr"]
+
+
+def cached_harmonic(path: str, margin: float, sr: int = None, cache=None) -> (np.ndarray, int):
+    """librosa.effects.hpss(y, margin=margin) の調波成分"""
+    cache = cache or default_cache()
+    if cache is None:
+        y, sr = _decode(path, sr)
+        return _hpss_harmonic(y, margin), sr
+
+    key = cache.key(path, "harmonic", sr=sr, margin=margin)
+    y_harmonic, meta = cache.load(key)
+    if y_harmonic is None:
+        y, loaded_sr = cached_load(path, sr=sr, cache=cache)
+        y_harmonic = _hpss_harmonic(y, margin)
+        y_harmonic = cache.store(key, y_harmonic, sr=loaded_sr)
+        return y_harmonic, loaded_sr
+    return y_harmonic, meta["sr"]
+
+
+def cached_stft_magnitude(path: str, margin: float, hop_length: int = None, n_fft: int = 2048,
+                          sr: int = None, cache=None, fps: int = None) -> (np.ndarray, int):
+    """
+    調波成分の振幅スペクトログラム np.abs(librosa.stft(y_harmonic, ...))。
+    hop_length の代わりに fps を渡すと hop_length = int(sr / fps) とする
+    （sr はキャッシュのメタデータかデコード結果から取るので、先に sr を調べる必要がない）。
+    """
+    if (hop_length is None) == (fps is None):
+        raise ValueError("hop_length と fps のどちらか一方を指定してください")
+    hop = (lambda loaded_sr: hop_length) if fps is None else (lambda loaded_sr: int(loaded_sr / fps))
+    cache = cache or default_cache()
+    if cache is None:
+        y_harmonic, sr = cached_harmonic(path, margin, sr=sr, cache=None)
+        return _stft_magnitude(y_harmonic, n_fft, hop(sr)), sr
+
+    hop_param = {"hop_length": hop_length} if fps is None else {"fps": fps}
+    key = cache.key(path, "stft", sr=sr, margin=margin, n_fft=n_fft, **hop_param)
+    magnitude, meta = cache.load(key)
+    if magnitude is None:
+        y_harmonic, loaded_sr = cached_harmonic(path, margin, sr=sr, cache=cache)
+        magnitude = _stft_magnitude(y_harmonic, n_fft, hop(loaded_sr))
+        magnitude = cache.store(key, magnitude, sr=loaded_sr)
+        return magnitude, loaded_sr
+    return magnitude, meta["sr"]
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="解析キャッシュの確認と削除")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="エントリを古い順に表示")
+    sub.add_parser("info", help="場所・合計サイズ・上限を表示")
+    purge = sub.add_parser("purge", help="エントリを削除")
+    purge.add_argument("--keep-mb", type=int, default=0, help="この容量まで新しいものを残す")
+    args = parser.parse_args()
+
+    cache = default_cache() or AnalysisCache()
+    entries = cache.entries()
+    if args.command == "list":
+        for key, size, used in entries:
+            print(f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(used))}  {size / 1e6:9.1f} MB  {key}")
+    elif args.command == "info":
+        total = sum(e[1] for e in entries)
+        print(f"場所  : {cache.root}")
+        print(f"件数  : {len(entries)}")
+        print(f"合計  : {total / 1e6:.1f} MB / 上限 {cache.max_bytes / 1e6:.1f} MB")
+    elif args.command == "purge":
+        removed = cache.evict(max_bytes=args.keep_mb * 1024 ** 2)
+        print(f"{removed} 件のエントリを削除しました。")
@@ -0,0 +1,46 @@
+import numpy as np
+import librosa
+import soundfile as sf
+
+# ==========================================
+# 長い音声ファイルのブロック読み込みとHPSS
+# ==========================================
+HPSS_HOP = 512         # librosa.effects.hpss の既定 hop_length
+HPSS_CONTEXT = 16384   # メディアンフィルタ(31フレーム)とFFT窓が届く範囲を十分に覆う前後の余白
+
+
+def audio_info(path: str) -> (int, int):
+    """(総サンプル数, サンプリング周波数) をデコードせずに返す"""
+    info = sf.info(path)
+    return info.frames, info.samplerate
+
+
+def read_span(f: sf.SoundFile, start: int, stop: int) -> np.ndarray:
+    """[start, stop) をモノラルの float32 で読む。ファイル外の部分は 0 で埋める"""
+    out = np.zeros(stop - start, dtype=np.float32)
+    lo, hi = max(start, 0), min(stop, f.frames)
+    if hi > lo:
+        f.seek(lo)
+        block = f.read(hi - lo, dtype='float32', always_2d=True)
+        out[lo - start:lo - start + len(block)] = block.mean(axis=1)
+    return out
+
+
+def stream_harmonic(path: str, spans, margin: float = 1.2, context: int = HPSS_CONTEXT):
+    """
+    spans で指定したサンプル区間 [a, b) ごとに、HPSS の調波成分を返すジェネレータ。
+    各区間は前後に context サンプルの余白を付けて HPSS し、余白を捨てて返す。
+    余白の開始位置は HPSS の hop 境界に揃えるため、一括処理と同じ STFT の格子で計算される。
+    ファイル外の部分は 0 になる。
+    """
+    with sf.SoundFile(path) as f:
+        for a, b in spans:
+            lo, hi = max(a, 0), min(b, f.frames)
+            out = np.zeros(b - a, dtype=np.float32)
+            if hi > lo:
+                start = max(0, lo - context) // HPSS_HOP * HPSS_HOP
+                stop = min(f.frames, hi + context)
+                y = read_span(f, start, stop)
+                y_harmonic, _ = librosa.effects.hpss(y, margin=margin)
+                out[lo - a:hi - a] = y_harmonic[lo - start:hi - start]
+            yield out
@@ -0,0 +1,1239 @@
+import csv
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from pathlib import Path
+
+import jcr
+import rumble
+from frameclock import FrameClock, POLICIES
+from fanout import play_tracks_on_joycons
+from tests import legacy
+from tests.synthetic import (
+    FakeHidBus, random_commands, synthetic_stft, write_synthetic_wav,
+)
+
+
+# ==========================================
+# シミュレーションしたJoy-Con（実機不要）
+# ==========================================
+def _simulated_audio_joycon(product_id: int = None, **kw):
+    """
+    SimulatedJoyCon につないだ AudioJoyCon と SimulatedJoyCon を返す。kw は SimulatedJoyCon へ
+    （write_latency, stall_at など）。接続時の書き込みは記録から消す
+    """
+    from main import AudioJoyCon
+    from pyjoycon import SimulatedJoyCon
+    from pyjoycon.constants import JOYCON_VENDOR_ID, JOYCON_L_PRODUCT_ID
+
+    sim = SimulatedJoyCon(product_id=product_id or JOYCON_L_PRODUCT_ID, **kw)
+    jc = AudioJoyCon(JOYCON_VENDOR_ID, sim.product_id, transport=sim)
+    sim.output_reports.clear()
+    return jc, sim
+
+
+def _arrivals(sim) -> np.ndarray:
+    """振動フレームの書き込みが完了した時刻"""
+    return np.array([t for t, _ in sim.rumble_reports()])
+
+
+# ==========================================
+# 振動エンコーダ（テーブル方式 vs 元の計算式）
+# ==========================================
+def bench_rumble_encode(n: int = 20000):
+    commands = random_commands(n)
+    rows = commands.tolist()
+
+    rumble._tables.cache_clear()
+    t0 = time.perf_counter()
+    rumble._tables()
+    print(f"テーブル構築: {(time.perf_counter() - t0) * 1e3:.2f} ms")
+
+    t0 = time.perf_counter()
+    for cmd in rows:
+        data = rumble._encode_joycon_rumble_formula(*cmd)
+        data + data
+    formula = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for cmd in rows:
+        data = rumble.encode_joycon_rumble(*cmd)
+        data + data
+    table = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    rumble.encode_many(commands)
+    many = time.perf_counter() - t0
+
+    print(f"元の計算式      : {formula / n * 1e6:8.3f} us/frame")
+    print(f"テーブル(1件ずつ): {table / n * 1e6:8.3f} us/frame (x{formula / table:.1f})")
+    print(f"encode_many     : {many / n * 1e6:8.3f} us/frame (x{formula / many:.1f})")
+
+
+# ==========================================
+# トラック読み込み（CSV vs .jcr）
+# ==========================================
+def bench_track_load(minutes: int = 60, fps: int = 66):
+    from main import load_commands_from_csv
+
+    commands = random_commands(minutes * 60 * fps)
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = Path(tmp) / "long.csv"
+        jcr_path = Path(tmp) / "long.jcr"
+        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['hf_freq', 'hf_amp', 'lf_freq', 'lf_amp'])
+            writer.writerows(commands.tolist())
+        jcr.csv_to_jcr(str(csv_path), str(jcr_path), fps=fps)
+
+        # CSV: 行ごとのパース + 再生前のエンコード
+        t0 = time.perf_counter()
+        frames = jcr.as_frames(load_commands_from_csv(str(csv_path)))
+        csv_time = time.perf_counter() - t0
+        del frames
+
+        # .jcr: mmap してペイロードをそのまま使う
+        t0 = time.perf_counter()
+        with jcr.load_track(str(jcr_path)) as track:
+            frames = jcr.as_frames(track)
+            jcr_time = time.perf_counter() - t0
+            del frames
+
+        csv_size = csv_path.stat().st_size
+        jcr_size = jcr_path.stat().st_size
+
+    print(f"{len(commands)} フレーム ({minutes} 分)")
+    print(f"CSV : {csv_time * 1e3:9.2f} ms  {csv_size / 1e6:7.2f} MB")
+    print(f"JCR : {jcr_time * 1e3:9.2f} ms  {jcr_size / 1e6:7.2f} MB (x{csv_time / jcr_time:.0f})")
+
+
+# ==========================================
+# フレームクロック（CPU使用率とジッタ）
+# ==========================================
+def _busy_wait_playback(joycon, num_frames: int, fps: int):
+    # 以前の再生ループ（1フレームの間ずっとビジーウェイト）
+    frame_duration = 1.0 / fps
+    start_time = time.perf_counter()
+    for i in range(num_frames):
+        joycon.send_rumble_data(b'\x00\x01\x40\x40' * 2)
+        next_frame_time = start_time + (i + 1) * frame_duration
+        while time.perf_counter() < next_frame_time:
+            pass
+
+
+def _print_histogram(counts: np.ndarray, edges: np.ndarray):
+    scale = max(1, counts.max() // 50)
+    for count, lo, hi in zip(counts, edges[:-1], edges[1:]):
+        label = f"{lo:4.1f}-{hi:4.1f} ms" if np.isfinite(hi) else f"{lo:4.1f}-     ms"
+        print(f"  {label} {count:6d} {'#' * int(count // scale)}")
+
+
+def bench_frame_clock(seconds: float = 3.0, fps: int = 66):
+    num_frames = int(seconds * fps)
+
+    device, sim = _simulated_audio_joycon()
+    wall, cpu = time.perf_counter(), time.process_time()
+    _busy_wait_playback(device, num_frames, fps)
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    sim.close()
+    sent = _arrivals(sim)
+    late = (sent - sent[0] - np.arange(num_frames) / fps) * 1e3
+    print(f"ビジーウェイト : CPU {cpu / wall * 100:5.1f}%  ジッタ {np.std(np.diff(sent)) * 1e3:.3f} ms  "
+          f"最大遅れ {late.max():.3f} ms")
+
+    device, sim = _simulated_audio_joycon()
+    clock = FrameClock(fps)
+    wall, cpu = time.perf_counter(), time.process_time()
+    for i in clock.ticks(num_frames):
+        device.send_rumble_data(b'\x00\x01\x40\x40' * 2)
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    sim.close()
+    s = clock.stats()
+    print(f"FrameClock    : CPU {cpu / wall * 100:5.1f}%  ジッタ {s['jitter_ms']:.3f} ms  "
+          f"最大遅れ {s['late_max_ms']:.3f} ms")
+    _print_histogram(*clock.histogram())
+
+    # 送信が時々 40ms 止まるデバイスでの遅延フレームの扱い
+    for policy in POLICIES:
+        device, sim = _simulated_audio_joycon(stall_at=range(49, num_frames, 50), stall=0.04)
+        clock = FrameClock(fps, policy=policy)
+        wall = time.perf_counter()
+        for i in clock.ticks(num_frames):
+            device.send_rumble_data(b'\x00\x01\x40\x40' * 2)
+        wall = time.perf_counter() - wall
+        sim.close()
+        s = clock.stats()
+        print(f"{policy:8s}: 送信 {s['sent']} / スキップ {s['skipped']} / 再生時間 {wall:.3f} s "
+              f"(予定 {num_frames / fps:.3f} s) / p99遅れ {s['late_p99_ms']:.3f} ms")
+
+
+# ==========================================
+# 複数デバイス間のずれ（逐次送信 vs 送信スレッド）
+# ==========================================
+def _skew_ms(devices: list, num_frames: int) -> np.ndarray:
+    arrived = []
+    for _, sim in devices:
+        sim.close()
+        arrived.append(_arrivals(sim)[:num_frames])
+    arrived = np.array(arrived)
+    return (arrived.max(axis=0) - arrived.min(axis=0)) * 1e3
+
+
+def bench_fanout(seconds: float = 3.0, fps: int = 66, latencies=(0.001, 0.004, 0.002, 0.003)):
+    num_frames = int(seconds * fps)
+    commands = random_commands(num_frames)
+
+    devices = [_simulated_audio_joycon(write_latency=lat) for lat in latencies]
+    frames = jcr.as_frames(commands)
+    for i in FrameClock(fps).ticks(num_frames):
+        for jc, _ in devices:
+            jc.send_rumble_data(frames[i * 8:(i + 1) * 8])
+    skew = _skew_ms(devices, num_frames)
+    print(f"逐次送信            : 平均ずれ {skew.mean():.3f} ms / 最大 {skew.max():.3f} ms")
+
+    devices = [_simulated_audio_joycon(write_latency=lat) for lat in latencies]
+    play_tracks_on_joycons([(jc, commands) for jc, _ in devices], fps=fps)
+    skew = _skew_ms(devices, num_frames)
+    print(f"送信スレッド(自動補正): 平均ずれ {skew.mean():.3f} ms / 最大 {skew.max():.3f} ms")
+
+    devices = [_simulated_audio_joycon(write_latency=lat) for lat in latencies]
+    play_tracks_on_joycons([(jc, commands) for jc, _ in devices], fps=fps, latencies=list(latencies))
+    skew = _skew_ms(devices, num_frames)
+    print(f"送信スレッド(固定補正): 平均ずれ {skew.mean():.3f} ms / 最大 {skew.max():.3f} ms")
+
+
+# ==========================================
+# ストリーミング解析（一括処理との一致とメモリ使用量）
+# ==========================================
+def bench_stream_analysis(minutes: float = 60.0):
+    import mp3_to_command_noize as engine
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "long.wav")
+        write_synthetic_wav(path, minutes * 60)
+
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        frames = 0
+        checkpoints = []
+        for block in engine.analyze_with_stft_stream(path):
+            frames += len(block)
+            checkpoints.append((frames, tracemalloc.get_traced_memory()[1]))
+        elapsed = time.perf_counter() - t0
+        tracemalloc.stop()
+
+    print(f"{minutes:.0f} 分 / {frames} フレーム: {elapsed:.1f} s (実時間の x{minutes * 60 / elapsed:.1f})")
+    for frac in (0.1, 0.5, 1.0):
+        done, peak = checkpoints[max(0, int(len(checkpoints) * frac) - 1)]
+        print(f"  {done:8d} フレーム時点のピークメモリ: {peak / 1e6:7.1f} MB")
+
+
+# ==========================================
+# ピーク抽出（フレームごとのループ vs 行列まとめて）
+# ==========================================
+def bench_peak_picking(minutes: float = 5.0):
+    import mp3_csv
+    import mp3_to_command_noize as engine
+
+    stft_matrix, frequencies = synthetic_stft(minutes * 60)
+
+    for name, looped, vectorized in (
+        ("STFT", legacy.stft_peaks, engine.pick_stft_peaks),
+        ("DSP ", legacy.dsp_peaks, mp3_csv._pick_dsp_peaks),
+    ):
+        t0 = time.perf_counter()
+        looped(stft_matrix, frequencies)
+        loop = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        vectorized(stft_matrix, frequencies)
+        vec = time.perf_counter() - t0
+        print(f"{name}: ループ {loop * 1e3:8.1f} ms / まとめて {vec * 1e3:6.1f} ms (x{loop / vec:.0f}) "
+              f"[{stft_matrix.shape[1]} フレーム]")
+
+
+# ==========================================
+# 解析キャッシュ（初回 vs 2回目以降）
+# ==========================================
+def bench_analysis_cache(seconds: float = 120.0):
+    import librosa
+    import analysis_cache
+    import mp3_to_command_noize as engine
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "track.wav")
+        write_synthetic_wav(path, seconds)
+        cache = analysis_cache.AnalysisCache(Path(tmp) / "cache")
+        _, sr = analysis_cache.cached_load(path, cache=cache)
+        hop_length = int(sr / 66)
+
+        for label in ("初回(キャッシュなし)", "2回目(キャッシュあり)"):
+            t0 = time.perf_counter()
+            stft_matrix, _ = analysis_cache.cached_stft_magnitude(path, margin=1.2, hop_length=hop_length, cache=cache)
+            engine.pick_stft_peaks(stft_matrix, librosa.fft_frequencies(sr=sr))
+            print(f"{label}: {time.perf_counter() - t0:8.3f} s")
+        print(f"キャッシュ容量: {sum(e[1] for e in cache.entries()) / 1e6:.1f} MB")
+
+
+# ==========================================
+# F0推定（pyin vs 高速な推定方式）
+# ==========================================
+def _synthetic_melody(seconds: float, sr: int = 22050, fps: int = 66, seed: int = 0):
+    """
+    倍音付きのメロディ（休符あり）と、フレームごとの正解F0（休符は0）を返す。
+    音の切り替わり前後2フレームは正解が曖昧なので評価から外す（mask）。
+    """
+    rng = np.random.default_rng(seed)
+    hop_length = int(sr / fps)
+    y = np.zeros(int(seconds * sr))
+    truth = np.zeros(1 + len(y) // hop_length)
+    mask = np.ones(len(truth), dtype=bool)
+    pos = 0
+    while pos < len(y):
+        length = min(len(y) - pos, int(sr * rng.uniform(0.2, 0.6)))
+        f0 = 0.0 if rng.random() < 0.2 else 55.0 * 2 ** (rng.integers(0, 48) / 12)
+        if f0 > 0:
+            t = np.arange(length) / sr
+            note = sum(np.sin(2 * np.pi * f0 * h * t) / h for h in range(1, 6) if f0 * h < sr / 2)
+            y[pos:pos + length] = 0.3 * note * np.hanning(length) ** 0.1
+        t0, t1 = int(np.ceil(pos / hop_length)), (pos + length) // hop_length
+        truth[t0:t1 + 1] = f0
+        mask[max(0, t0 - 2):t0 + 3] = False
+        pos += length
+    y += 0.005 * rng.standard_normal(len(y))
+    return y.astype(np.float32), truth, mask
+
+
+def _pitch_scores(f0: np.ndarray, voiced: np.ndarray, truth: np.ndarray, mask: np.ndarray) -> dict:
+    n = min(len(f0), len(truth))
+    f0, voiced, truth, mask = f0[:n], voiced[:n], truth[:n], mask[:n]
+    true_voiced = (truth > 0) & mask
+    both = true_voiced & voiced & (f0 > 0)
+    cents = np.abs(1200 * np.log2(f0[both] / truth[both]))
+    return {
+        "recall": both.sum() / max(1, true_voiced.sum()),
+        "accuracy": np.mean(cents < 50) if len(cents) else 0.0,
+        "false_alarm": np.mean(voiced[(truth == 0) & mask]) if np.any((truth == 0) & mask) else 0.0,
+    }
+
+
+def bench_f0(seconds: float = 30.0, sr: int = 22050, fps: int = 66):
+    import librosa
+    import pitch
+    from mp3_to_command_noize import F0_FMIN, F0_FMAX
+
+    y, truth, mask = _synthetic_melody(seconds, sr=sr, fps=fps)
+    hop_length = int(sr / fps)
+
+    def run_pyin():
+        f0, voiced, _ = librosa.pyin(y, fmin=F0_FMIN, fmax=F0_FMAX, sr=sr, hop_length=hop_length, fill_na=0.0)
+        return f0, voiced
+
+    def run_hps():
+        n_fft = 4096
+        magnitude = np.abs(librosa.stft(y, n_fft=n_fft, hop_length=hop_length))
+        return pitch.hps(magnitude, librosa.fft_frequencies(sr=sr, n_fft=n_fft), F0_FMIN, F0_FMAX)
+
+    methods = [
+        ("pyin", run_pyin),
+        ("yin", lambda: pitch.yin(y, sr, F0_FMIN, F0_FMAX, hop_length)),
+        ("yin (4プロセス)", lambda: pitch.yin(y, sr, F0_FMIN, F0_FMAX, hop_length, workers=4, chunk_frames=256)),
+        ("hps (STFT込み)", run_hps),
+    ]
+    print(f"合成メロディ {seconds:.0f} 秒 / {len(truth)} フレーム（正解率 = 正解から50セント以内）")
+    baseline = None
+    for label, run in methods:
+        t0 = time.perf_counter()
+        f0, voiced = run()
+        elapsed = time.perf_counter() - t0
+        baseline = baseline or elapsed
+        s = _pitch_scores(np.asarray(f0), np.asarray(voiced), truth, mask)
+        print(f"{label:16s}: {elapsed:7.2f} s (x{baseline / elapsed:6.1f}) | "
+              f"有声検出 {s['recall'] * 100:5.1f}% / 正解率 {s['accuracy'] * 100:5.1f}% / "
+              f"休符の誤検出 {s['false_alarm'] * 100:5.1f}%")
+
+
+# ==========================================
+# ライブ入力モード（WAVを実時間でコールバックに流す）
+# ==========================================
+def bench_live(seconds: float = 10.0, block_size: int = 256, latencies=(0.002, 0.004)):
+    import live
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "live.wav")
+        write_synthetic_wav(path, seconds)
+        devices = [_simulated_audio_joycon(write_latency=lat) for lat in latencies]
+        rumble_live = live.LiveRumble([jc for jc, _ in devices], 44100)
+        rumble_live.start()
+        live.feed_wav(rumble_live, path, block_size=block_size)
+        rumble_live.stop()
+    for _, sim in devices:
+        sim.close()
+    print(f"WAV {seconds:.0f} 秒 / ブロック {block_size} サンプル / シミュレーター {len(devices)} 台 "
+          f"(書き込み {', '.join(f'{lat * 1000:.0f}' for lat in latencies)} ms)")
+    rumble_live.print_summary()
+
+
+# ==========================================
+# 波形合成（フレームごとのループ vs ベクトル化）
+# ==========================================
+def bench_synthesize(minutes: float = 10.0, fps: int = 66):
+    import csv_emu
+
+    commands = random_commands(int(minutes * 60 * fps), seed=3).astype(np.float64)
+    commands[::7, 1] = 0.0  # 無音のフレームも混ぜる
+    commands[::5, 2] = 0.0
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = str(Path(tmp) / "commands.csv")
+        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['hf_freq', 'hf_amp', 'lf_freq', 'lf_amp'])
+            writer.writerows(commands.tolist())
+
+        t0 = time.perf_counter()
+        looped = legacy.synthesize(csv_emu.load_commands(csv_path).tolist())
+        t_legacy = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        audio, _ = csv_emu.synthesize_joycon_audio(csv_path)
+        t_new = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        smooth, _ = csv_emu.synthesize_joycon_audio(csv_path, interpolate=True)
+        t_smooth = time.perf_counter() - t0
+
+    max_diff = np.max(np.abs(looped - audio))
+    print(f"以前の波形との最大差: {max_diff:.2e} ({len(audio)} サンプル / {minutes:.0f} 分, 音量 0.5 に正規化後)")
+    print(f"ループ   : {t_legacy:7.2f} s")
+    print(f"ベクトル化: {t_new:7.2f} s (x{t_legacy / t_new:.1f})  ※CSV読み込み込み")
+    print(f"補間あり  : {t_smooth:7.2f} s")
+
+    # ストリーミング用のブロック生成：最初のブロックまでの時間とピークメモリ
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    blocks = csv_emu.synthesize_blocks(commands, fps, interpolate=True, block_frames=64)
+    next(blocks)
+    first = time.perf_counter() - t0
+    for _ in blocks:
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"ストリーミング: 最初のブロックまで {first * 1000:.1f} ms / ピークメモリ {peak / 1e6:.1f} MB "
+          f"(一括合成の出力だけで {len(audio) * 4 / 1e6:.1f} MB)")
+
+
+# ==========================================
+# デコーダと量子化レポート
+# ==========================================
+def bench_report(minutes: float = 60.0, fps: int = 66):
+    import rumble_report
+
+    commands = random_commands(int(minutes * 60 * fps), seed=4)
+    frames = rumble.encode_many(commands)
+    t0 = time.perf_counter()
+    result = rumble_report.compare(commands, frames, fps=fps)
+    elapsed = time.perf_counter() - t0
+    print(f"{minutes:.0f} 分のトラックの集計: {elapsed:.2f} s (実時間の x{minutes * 60 / elapsed:.0f})")
+    print(f"誤差 平均 {result['err_mean_db']:.1f} dB / p95 {result['err_p95_db']:.1f} dB / "
+          f"範囲外コード HF {result['invalid_hf_amp']} / LF {result['invalid_lf_amp']}")
+
+
+# ==========================================
+# 入力レポートの解析（ゲッターごとのビット演算 vs 1回だけデコード）
+# ==========================================
+def bench_input_report(n: int = 20000):
+    from pyjoycon import PythonicJoyCon, SimulatedJoyCon
+    from pyjoycon.constants import JOYCON_VENDOR_ID, JOYCON_L_PRODUCT_ID
+
+    sim = SimulatedJoyCon(accel_offset=(12, -30, 7), gyro_offset=(-3, 5, 20),
+                          gyro_coeff=(13000, 13400, 13500))
+    jc = PythonicJoyCon(JOYCON_VENDOR_ID, JOYCON_L_PRODUCT_ID, transport=sim)
+    sim.close()  # 計測中にレポートが入れ替わらないよう止める
+    rng = np.random.default_rng(0)
+    jc._input_report = bytes([0x30]) + rng.integers(0, 256, 48, dtype=np.uint8).tobytes()
+
+    # 以前の解析と結果が一致することは tests/test_joycon.py で確かめている
+    cases = [
+        ("get_status", lambda: legacy.get_status(jc), jc.get_status),
+        ("accel", lambda: legacy.accel(jc), lambda: jc.accel),
+        ("gyro", lambda: legacy.gyro(jc), lambda: jc.gyro),
+    ]
+    for label, before, current in cases:
+        timings = []
+        for fn in (before, current):
+            t0 = time.perf_counter()
+            for _ in range(n):
+                fn()
+            timings.append((time.perf_counter() - t0) / n * 1e6)
+        print(f"{label:10s}: {timings[0]:6.2f} us → {timings[1]:6.2f} us (x{timings[0] / timings[1]:.1f})")
+
+    # 新しい方式ではレポート1つにつきデコードが1回増える（受信スレッド側のコスト）
+    report = jc._input_report
+    t0 = time.perf_counter()
+    for _ in range(n):
+        jc._input_report = report
+    print(f"デコード  : {(time.perf_counter() - t0) / n * 1e6:6.2f} us / レポート")
+
+
+# ==========================================
+# IMU の (3, 6) 配列 API とリングバッファ
+# ==========================================
+def bench_imu(n: int = 20000, seconds: float = 1.0):
+    from pyjoycon import PythonicJoyCon, SimulatedJoyCon
+    from pyjoycon.constants import JOYCON_VENDOR_ID, JOYCON_L_PRODUCT_ID
+
+    sim = SimulatedJoyCon(accel_offset=(12, -30, 7), gyro_offset=(-3, 5, 20), gyro_coeff=(13000, 13400, 13500))
+    jc = PythonicJoyCon(JOYCON_VENDOR_ID, JOYCON_L_PRODUCT_ID, transport=sim)
+    sim.close()
+    rng = np.random.default_rng(0)
+    jc._input_report = bytes([0x30]) + rng.integers(0, 256, 48, dtype=np.uint8).tobytes()
+
+    def from_properties():
+        # これまで (3, 6) の配列を得るには 18 回のゲッター呼び出しが必要だった
+        return np.array([a + g for a, g in zip(jc.accel, jc.gyro)], dtype=np.float32)
+
+    for label, fn in (("accel+gyro から配列", from_properties), ("get_imu", jc.get_imu), ("get_imu_raw", jc.get_imu_raw)):
+        t0 = time.perf_counter()
+        for _ in range(n):
+            fn()
+        print(f"{label:18s}: {(time.perf_counter() - t0) / n * 1e6:6.2f} us")
+
+    # リングバッファ：受信スレッドでの追加コストと、履歴の取り出し
+    history = jc.enable_imu_history(2.0)
+    raw = jc.get_imu_raw()
+    t0 = time.perf_counter()
+    for i in range(n):
+        history.push(raw, i * 0.015)
+    print(f"履歴への追加      : {(time.perf_counter() - t0) / n * 1e6:6.2f} us / レポート")
+    t0 = time.perf_counter()
+    for _ in range(1000):
+        times, samples = jc.get_imu_history()
+    print(f"履歴の取り出し    : {(time.perf_counter() - t0) / 1000 * 1e6:6.2f} us ({len(times)} サンプル = 2 秒)")
+
+    # 実際に受信しているデバイスで、履歴が 5ms 間隔で埋まること
+    sim = SimulatedJoyCon()
+    jc = PythonicJoyCon(JOYCON_VENDOR_ID, sim.product_id, transport=sim)
+    jc.enable_imu_history(seconds)
+    time.sleep(seconds)
+    times, samples = jc.get_imu_history()
+    sim.close()
+    print(f"受信中の履歴      : {len(times)} サンプル / {seconds:.1f} 秒 (間隔 {np.median(np.diff(times)) * 1000:.2f} ms)")
+
+
+# ==========================================
+# ジャイロの姿勢積分（サンプルごとの3つの回転 vs 1回の回転）
+# ==========================================
+def _gyro_rate(t: np.ndarray) -> np.ndarray:
+    """トレースの真の角速度 (deg/s)"""
+    return np.stack([400 * np.sin(2 * np.pi * f * t + p) for f, p in ((0.7, 0.0), (0.45, 1.0), (0.3, 2.0))], axis=1)
+
+
+def _gyro_truth(seconds: float, yz_sign: int = -1, dt: float = 0.0005):
+    """ノイズの無い角速度を 0.5ms 刻み・倍精度で積分した姿勢（GyroTrackingJoyCon と同じ向き・係数）"""
+    import glm
+    from pyjoycon.imu import GYRO_IN_DEG, GYRO_IN_RAD
+
+    t = np.arange(int(seconds / dt)) * dt
+    steps = _gyro_rate(t) / GYRO_IN_DEG * GYRO_IN_RAD * (-1 / 86) * (dt / 0.005) * np.array([1, yz_sign, yz_sign])
+    x, y, z, q = glm.dvec3(1, 0, 0), glm.dvec3(0, 1, 0), glm.dvec3(0, 0, 1), glm.dquat()
+    for wx, wy, wz in steps:
+        axis = x * wx + y * wy + z * wz
+        angle = glm.length(axis)
+        if angle:
+            rotation = glm.angleAxis(angle, axis / angle)
+            x *= rotation
+            y *= rotation
+            z *= rotation
+            q *= rotation
+    return q
+
+
+def _gyro_trace(seconds: float = 20.0, period: float = 0.015, seed: int = 0) -> list:
+    """
+    手で振ったような角速度（最大 ±400 deg/s、軸がゆっくり変わる）の 0x30 レポート列。
+    ジャイロは 5ms ごとに 3 サンプル、ノイズとオフセット付き。
+    """
+    from pyjoycon.imu import GYRO_IN_DEG
+
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds / period) * 3) * (period / 3)
+    raw = _gyro_rate(t) / GYRO_IN_DEG + rng.normal(0, 4, (len(t), 3)) + (-3, 5, 20)
+    imu = np.zeros((len(t), 6), dtype=np.int16)
+    imu[:, 2] = 4096
+    imu[:, 3:] = np.round(raw)
+    reports = []
+    for i in range(0, len(imu), 3):
+        report = bytearray(49)
+        report[0] = 0x30
+        report[13:49] = imu[i:i + 3].tobytes()
+        reports.append(bytes(report))
+    return reports
+
+
+def _legacy_gyro_update_hook(self):
+    # 以前の GyroTrackingJoyCon._gyro_update_hook
+    from glm import angleAxis
+    for gx, gy, gz in self.gyro_in_rad:
+        rotation \
+            = angleAxis(gx * (-1/86), self.direction_X) \
+            * angleAxis(gy * (-1/86), self.direction_Y) \
+            * angleAxis(gz * (-1/86), self.direction_Z)
+        self.direction_X *= rotation
+        self.direction_Y *= rotation
+        self.direction_Z *= rotation
+        self.direction_Q *= rotation
+
+
+def bench_gyro(trace_path: str = None):
+    import glm
+    from pyjoycon import GyroTrackingJoyCon, SimulatedJoyCon
+    from pyjoycon.constants import JOYCON_VENDOR_ID
+
+    # 記録したトレース（0x30 レポートを並べた .npy）があればそれを使う
+    reports = [r.tobytes() for r in np.load(trace_path)] if trace_path else _gyro_trace()
+    print(f"トレース: {len(reports)} レポート ({len(reports) * 0.015:.1f} 秒)")
+
+    def tracker(**kw):
+        sim = SimulatedJoyCon(gyro_offset=(-3, 5, 20))
+        jc = GyroTrackingJoyCon(JOYCON_VENDOR_ID, sim.product_id, transport=sim, **kw)
+        sim.close()  # フックは下で直接呼ぶ
+        return jc
+
+    results = {}
+    for label, hook in (("以前 (3x3 angleAxis)", _legacy_gyro_update_hook),
+                        ("1回の回転", GyroTrackingJoyCon._gyro_update_hook)):
+        jc = tracker()
+        times = np.empty(len(reports))
+        for i, report in enumerate(reports):
+            t0 = time.perf_counter()
+            jc._input_report = report
+            hook(jc)
+            times[i] = time.perf_counter() - t0
+        results[label] = jc.direction_Q
+        print(f"{label:20s}: 受信スレッド {np.median(times) * 1e6:6.2f} us / レポート (p99 {np.percentile(times, 99) * 1e6:.2f} us)")
+
+    jc = tracker(integrate_in_thread=True)
+    times = np.empty(len(reports))
+    for i, report in enumerate(reports):
+        t0 = time.perf_counter()
+        jc._input_report = report
+        jc._gyro_enqueue_hook(jc)
+        times[i] = time.perf_counter() - t0
+    while not jc._gyro_queue.empty():
+        time.sleep(0.01)
+    time.sleep(0.01)
+    print(f"{'別スレッドで積分':20s}: 受信スレッド {np.median(times) * 1e6:6.2f} us / レポート (p99 {np.percentile(times, 99) * 1e6:.2f} us)")
+
+    def error(a, b):
+        return np.degrees(glm.angle(glm.inverse(glm.dquat(a)) * glm.dquat(b)))
+
+    before, batched = results.values()
+    print(f"姿勢の差: 以前 vs 1回の回転 {error(before, batched):.3f} deg / "
+          f"同じスレッド vs 別スレッド {error(batched, jc.direction_Q):.3f} deg")
+    if not trace_path:
+        truth = _gyro_truth(len(reports) * 0.015)
+        print(f"真の姿勢との差: 以前 {error(truth, before):.3f} deg / 1回の回転 {error(truth, batched):.3f} deg")
+
+
+# ==========================================
+# ボタンイベント（ボタンごとの比較 vs ビットマスクの XOR）
+# ==========================================
+def bench_button_events(n: int = 20000):
+    import asyncio
+    from pyjoycon import ButtonEventJoyCon, SimulatedJoyCon
+    from pyjoycon.constants import JOYCON_VENDOR_ID, JOYCON_R_PRODUCT_ID
+
+    def joycon(**kw):
+        sim = SimulatedJoyCon(product_id=JOYCON_R_PRODUCT_ID)
+        jc = ButtonEventJoyCon(JOYCON_VENDOR_ID, JOYCON_R_PRODUCT_ID, transport=sim, **kw)
+        sim.close()  # フックは下で直接呼ぶ
+        jc._events_buffer.clear()
+        for name in legacy.EVENT_NAMES:
+            setattr(jc, "_previous_" + name, 0)
+        return jc
+
+    # ボタンが何も変わらないレポートでのフックのコスト
+    idle = b'\x30' + bytes(48)
+    for label, hook in (("以前 (ボタンごと)", legacy.event_hook_right),
+                        ("XOR", ButtonEventJoyCon._event_tracking_update_hook)):
+        jc = joycon(track_sticks=True)
+        jc._input_report = idle
+        t0 = time.perf_counter()
+        for _ in range(n):
+            hook(jc)
+        print(f"{label:18s}: {(time.perf_counter() - t0) / n * 1e6:6.3f} us / レポート")
+
+    # 取り出し：list.pop(0) は O(n)、deque.popleft は O(1)
+    for size in (1000, 10000):
+        pending = [("a", 1)] * size
+        t0 = time.perf_counter()
+        while pending:
+            pending.pop(0)
+        t_list = time.perf_counter() - t0
+        jc._events_buffer.extend([(0.0, "a", 1)] * size)
+        t0 = time.perf_counter()
+        for _ in jc.events():
+            pass
+        print(f"{size:6d} イベントの取り出し: list {t_list * 1e3:7.2f} ms / deque {(time.perf_counter() - t0) * 1e3:7.2f} ms")
+
+    # aevents: 受信スレッドからのイベントが asyncio 側に届くまでの時間
+    sim = SimulatedJoyCon(product_id=JOYCON_R_PRODUCT_ID)
+    jc = ButtonEventJoyCon(JOYCON_VENDOR_ID, JOYCON_R_PRODUCT_ID, transport=sim)
+    time.sleep(0.05)
+
+    async def press(count: int = 20):
+        delays = []
+        events = jc.aevents(timestamps=True)
+        for i in range(count):
+            sim.buttons[0] = 0x08 if i % 2 == 0 else 0x00  # a
+            t, button, state = await events.__anext__()
+            delays.append(time.perf_counter() - t)
+        await events.aclose()
+        return np.array(delays) * 1e6
+
+    delays = asyncio.run(press())
+    sim.close()
+    print(f"aevents: 20 イベント / 検出から受け取りまで 平均 {delays.mean():.0f} us / 最大 {delays.max():.0f} us")
+
+
+# ==========================================
+# asyncio 版 JoyCon（受信スレッド x 台数 vs イベントループ 1 つ）
+# ==========================================
+def _spawn_simulated(product_id: int):
+    """別プロセスの SimulatedJoyCon と socketpair でつながった FdTransport を返す"""
+    import socket
+    import subprocess
+    from pyjoycon import FdTransport
+
+    host, device = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+    code = "import sys; from pyjoycon import SimulatedJoyCon; SimulatedJoyCon(product_id=int(sys.argv[2])).serve(int(sys.argv[1]))"
+    subprocess.Popen([sys.executable, "-c", code, str(device.fileno()), str(product_id)],
+                     pass_fds=[device.fileno()], cwd=Path(__file__).parent)
+    device.close()
+    return FdTransport(host.detach())
+
+
+def _os_thread_count() -> int:
+    try:
+        with open("/proc/self/status") as f:
+            return next(int(line.split()[1]) for line in f if line.startswith("Threads:"))
+    except (OSError, StopIteration):
+        import threading
+        return threading.active_count()
+
+
+def _measure_model(model: str, devices: int, idle: float, play: float, fps: int, results):
+    """計測用の子プロセス。結果を results (Queue) に入れて終了する"""
+    import asyncio
+    from pyjoycon.constants import JOYCON_VENDOR_ID, JOYCON_L_PRODUCT_ID, JOYCON_R_PRODUCT_ID
+
+    product_ids = [(JOYCON_L_PRODUCT_ID, JOYCON_R_PRODUCT_ID)[n % 2] for n in range(devices)]
+    commands = random_commands(int(play * fps))
+
+    def window(seconds: float) -> float:
+        cpu, wall = time.process_time(), time.perf_counter()
+        time.sleep(seconds)
+        return (time.process_time() - cpu) / (time.perf_counter() - wall) * 100
+
+    if model == "thread":
+        from main import AudioJoyCon
+        joycons = [AudioJoyCon(JOYCON_VENDOR_ID, pid, transport=_spawn_simulated(pid)) for pid in product_ids]
+        time.sleep(0.2)
+        threads, idle_cpu = _os_thread_count(), window(idle)
+        cpu, wall = time.process_time(), time.perf_counter()
+        play_tracks_on_joycons([(jc, commands) for jc in joycons], fps=fps)
+        play_cpu = (time.process_time() - cpu) / (time.perf_counter() - wall) * 100
+    else:
+        from pyjoycon import AsyncJoyCon
+        from fanout import play_tracks_async
+
+        async def run():
+            joycons = [await AsyncJoyCon.open(JOYCON_VENDOR_ID, pid, transport=_spawn_simulated(pid))
+                       for pid in product_ids]
+            # 受信スレッドと同じく、レポートは状態の更新だけに使う（reports() を読む人はいない）
+            await asyncio.sleep(0.2)
+            cpu, wall = time.process_time(), time.perf_counter()
+            await asyncio.sleep(idle)
+            idle_cpu = (time.process_time() - cpu) / (time.perf_counter() - wall) * 100
+            threads = _os_thread_count()
+            cpu, wall = time.process_time(), time.perf_counter()
+            await play_tracks_async([(jc, commands) for jc in joycons], fps=fps)
+            play_cpu = (time.process_time() - cpu) / (time.perf_counter() - wall) * 100
+            return threads, idle_cpu, play_cpu
+
+        threads, idle_cpu, play_cpu = asyncio.run(run())
+
+    results.put((threads, idle_cpu, play_cpu))
+    results.close()
+    results.join_thread()
+    # 受信スレッドは止める手段が無いので、後始末をせずにプロセスごと終える
+    os._exit(0)
+
+
+def bench_async(devices: int = 4, idle: float = 3.0, play: float = 3.0, fps: int = 66):
+    import multiprocessing
+
+    ctx = multiprocessing.get_context("fork")
+    print(f"シミュレーターの Joy-Con {devices} 台（別プロセス, 0x30 を 15ms ごとに送信）")
+    for model, label in (("thread", "受信スレッド (現行)"), ("async", "asyncio")):
+        results = ctx.Queue()
+        proc = ctx.Process(target=_measure_model, args=(model, devices, idle, play, fps, results))
+        proc.start()
+        threads, idle_cpu, play_cpu = results.get()
+        proc.join()
+        print(f"{label:20s}: スレッド数 {threads:3d} / 待機中 CPU {idle_cpu:5.1f} % / 再生中 CPU {play_cpu:5.1f} %")
+
+
+# ==========================================
+# サブコマンドの往復時間（受信スレッドでの振り分け、SPI のまとめ読み）
+# ==========================================
+_RUMBLE_NEUTRAL = b'\x00\x01\x40\x40\x00\x01\x40\x40'
+
+
+def _legacy_send_subcmd(device, packet_number: int, subcommand: bytes, argument: bytes):
+    # 以前の JoyCon._send_subcmd_get_response: 自分で読み、0x21 以外は捨てる（受信スレッドとは両立しない）
+    device.write(b'\x01' + bytes([packet_number]) + _RUMBLE_NEUTRAL + subcommand + argument)
+    report = device.read(49)
+    while report[0] != 0x21:
+        report = device.read(49)
+    return report[13] & 0x80, report[13:]
+
+
+def bench_subcommand(n: int = 200, ranges: int = 16, latency: float = 0.015):
+    from pyjoycon import JoyCon, SimulatedJoyCon
+    from pyjoycon.constants import JOYCON_VENDOR_ID, JOYCON_L_PRODUCT_ID
+
+    def summary(times):
+        times = np.array(times) * 1e3
+        return f"p50 {np.median(times):6.3f} ms / p99 {np.percentile(times, 99):6.3f} ms"
+
+    # 1. 1往復の時間（応答の遅延なし）
+    sim = SimulatedJoyCon()
+    times = []
+    for i in range(n):
+        t0 = time.perf_counter()
+        _legacy_send_subcmd(sim, i & 0xF, b'\x30', b'\x01')
+        times.append(time.perf_counter() - t0)
+    print(f"以前 (直接読む, ストリーミング無し)   : {summary(times)}")
+
+    for label, mode in (("振り分け (ストリーミング無し)", b'\x3f'), ("振り分け (0x30 受信中, 次の枠で応答)", b'\x30')):
+        sim = SimulatedJoyCon()
+        jc = JoyCon(JOYCON_VENDOR_ID, JOYCON_L_PRODUCT_ID, transport=sim)
+        jc._send_subcmd_get_response(b'\x03', mode)
+        times = []
+        for i in range(n):
+            t0 = time.perf_counter()
+            jc.set_player_lamp_on(i, wait=True)
+            times.append(time.perf_counter() - t0)
+        sim.close()
+        print(f"{label:32s}: {summary(times)}")
+
+    # 2. SPI の読み出し：1つずつ待つ vs まとめて送る（応答は latency 秒後）
+    sim = SimulatedJoyCon(reply_latency=latency)
+    received = []
+    jc = JoyCon(JOYCON_VENDOR_ID, JOYCON_L_PRODUCT_ID, transport=sim)
+    jc.register_update_hook(lambda jc: received.append(time.perf_counter()))
+    spans = [(0x6000 + i * 0x10, 0x10) for i in range(ranges)]
+
+    t0 = time.perf_counter()
+    for address, size in spans:
+        jc._spi_flash_read(address, size)
+    t_seq = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    jc._spi_flash_read_many(spans)
+    t_batch = time.perf_counter() - t0
+    during = [t for t in received if t0 <= t <= t0 + t_batch]
+    print(f"SPI {ranges} 回 (応答 {latency * 1e3:.0f} ms): 1つずつ {t_seq * 1e3:7.1f} ms / まとめて {t_batch * 1e3:6.1f} ms "
+          f"(その間も 0x30 を {len(during)} 回受信)")
+
+    # 3. 接続時の SPI（以前は 3 回を順番に待っていた）
+    t0 = time.perf_counter()
+    for address, size in ((0x6050, 6), (0x8026, 2), (0x6020, 24)):
+        jc._spi_flash_read(address, size)
+    t_seq = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    jc._read_joycon_data()
+    print(f"接続時の SPI 読み出し: 以前 {t_seq * 1e3:.1f} ms → {(time.perf_counter() - t0) * 1e3:.1f} ms")
+
+    # 4. 応答が来ない場合はタイムアウトして再送する
+    sim.reply_latency = 0.3
+    t0 = time.perf_counter()
+    jc._send_subcmd_get_response(b'\x30', b'\x01', timeout=0.1, retries=5)
+    print(f"応答 300 ms・タイムアウト 100 ms: {(time.perf_counter() - t0) * 1e3:.0f} ms で完了 "
+          f"(送信 {sum(1 for _, r in sim.output_reports[-6:] if r[0] == 0x01 and r[10] == 0x30)} 回)")
+    sim.close()
+
+
+# ==========================================
+# 接続時間（キャリブレーションと色のキャッシュ）
+# ==========================================
+def _legacy_connect_io(jc):
+    # 以前の _read_joycon_data + _setup_sensors: SPI 3 回を順番に待ち、固定の 20ms スリープ
+    jc._spi_flash_read(0x6050, 6)
+    if jc._spi_flash_read(0x8026, 2) == b"\xB2\xA1":
+        jc._spi_flash_read(0x8028, 24)
+    else:
+        jc._spi_flash_read(0x6020, 24)
+    jc._write_output_report(b'\x01', b'\x40', b'\x01')
+    time.sleep(0.02)
+    jc._write_output_report(b'\x01', b'\x03', b'\x30')
+
+
+def bench_connect(controllers: int = 16, latency: float = 0.015):
+    from pyjoycon import CalibrationCache, JoyCon, SimulatedJoyCon
+    from pyjoycon.constants import JOYCON_VENDOR_ID, JOYCON_L_PRODUCT_ID, JOYCON_R_PRODUCT_ID
+
+    rng = np.random.default_rng(0)
+    flashes = []
+    for n in range(controllers):
+        sim = SimulatedJoyCon(accel_offset=tuple(rng.integers(-200, 200, 3)),
+                              gyro_offset=tuple(rng.integers(-50, 50, 3)),
+                              color_body=tuple(rng.integers(0, 256, 3)))
+        flashes.append(bytes(sim.spi_flash))
+
+    def connect_all(cache, label):
+        joycons, times = [], []
+        for n, flash in enumerate(flashes):
+            product_id = (JOYCON_L_PRODUCT_ID, JOYCON_R_PRODUCT_ID)[n % 2]
+            sim = SimulatedJoyCon(product_id=product_id, reply_latency=latency)
+            sim.spi_flash[:] = flash
+            t0 = time.perf_counter()
+            jc = JoyCon(JOYCON_VENDOR_ID, product_id, serial=f"98:B6:E9:00:00:{n:02X}",
+                        transport=sim, calibration_cache=cache)
+            times.append(time.perf_counter() - t0)
+            joycons.append((jc, sim))
+        times = np.array(times) * 1e3
+        print(f"{label:24s}: 1台 平均 {times.mean():5.1f} ms / 最大 {times.max():5.1f} ms / {controllers} 台で {times.sum():6.1f} ms")
+        return joycons
+
+    print(f"シミュレーターの Joy-Con {controllers} 台, サブコマンドの応答 {latency * 1e3:.0f} ms")
+    with tempfile.TemporaryDirectory() as root:
+        cache = CalibrationCache(root)
+        cold = connect_all(cache, "キャッシュ無し (初回)")
+        time.sleep(0.1)
+        warm = connect_all(cache, "キャッシュ有り (2回目以降)")
+        time.sleep(0.1)  # バックグラウンドの再読み込みを待つ
+
+        jc, sim = warm[0]
+        t0 = time.perf_counter()
+        _legacy_connect_io(jc)
+        print(f"{'以前の接続手順 (参考)':24s}: 1台 {(time.perf_counter() - t0) * 1e3:5.1f} ms (SPI 3 回を順番に + 20 ms スリープ)")
+        for jc, sim in cold + warm:
+            sim.close()
+
+
+# ==========================================
+# デバイス列挙（多数のHIDデバイスがある環境を偽の enumerate で再現）
+# ==========================================
+def bench_registry(others: int = 500, n: int = 200):
+    from pyjoycon import DeviceRegistry
+    from pyjoycon.constants import JOYCON_L_PRODUCT_ID, JOYCON_R_PRODUCT_ID, JOYCON_PRO_PRODUCT_ID
+
+    bus = FakeHidBus(others)
+    bus.plug(JOYCON_L_PRODUCT_ID, "98:b6:e9:00:00:01")
+    bus.plug(JOYCON_R_PRODUCT_ID, "98:b6:e9:00:00:02")
+    bus.plug(JOYCON_PRO_PRODUCT_ID, "98:b6:e9:00:00:03")
+
+    def timed(fn):
+        fn()
+        t0 = time.perf_counter()
+        for _ in range(n):
+            fn()
+        return (time.perf_counter() - t0) / n * 1e3
+
+    def legacy_l_and_r():
+        # 以前の get_L_id() + get_R_id(): 全デバイスを返す列挙を2回
+        ids = legacy.get_device_ids(bus.enumerate)
+        l_id = [i for i in ids if i[1] == JOYCON_L_PRODUCT_ID][:1]
+        ids = legacy.get_device_ids(bus.enumerate)
+        r_id = [i for i in ids if i[1] == JOYCON_R_PRODUCT_ID][:1]
+        return l_id + r_id
+
+    registry = DeviceRegistry(enumerate=bus.enumerate)
+    registry.refresh()
+
+    print(f"HIDデバイス {len(bus.devices)} 台 (うちJoy-Con 3台), 1回あたり")
+    print(f"以前 (get_L_id + get_R_id)  : {timed(legacy_l_and_r):7.3f} ms")
+    print(f"DeviceRegistry.refresh()   : {timed(registry.refresh):7.3f} ms  (変化なし)")
+    scanned = bus.scanned
+    registry.refresh()
+    print(f"  1回の refresh で走査したデバイス: {bus.scanned - scanned} 台 / 列挙 1 回")
+
+    # 抜き差しの検出とコールバック
+    added, removed = [], []
+    registry.on_added(lambda ids, path: added.append(ids))
+    registry.on_removed(lambda ids, path: removed.append(ids))
+    bus.unplug("98:b6:e9:00:00:02")
+    bus.plug(JOYCON_R_PRODUCT_ID, "98:b6:e9:00:00:04")
+    registry.refresh()
+
+    interval = 0.05
+    registry.watch(interval=interval, use_udev=False)
+    t0 = time.perf_counter()
+    bus.plug(JOYCON_L_PRODUCT_ID, "98:b6:e9:00:00:05")
+    while len(added) < 2:
+        time.sleep(0.001)
+    detected = time.perf_counter() - t0
+    registry.stop()
+    print(f"抜き差しの検出: ポーリング間隔 {interval * 1e3:.0f} ms で {detected * 1e3:.1f} ms")
+
+    # 再生中の追加と切断: 他のデバイスは止まらずに最後まで鳴る
+    import threading
+    from fanout import Fanout
+
+    fps, num_frames = 66, 132
+    commands = random_commands(num_frames)
+    (first, first_sim), (late, late_sim) = (_simulated_audio_joycon(write_latency=0.001) for _ in range(2))
+    lost, lost_sim = _simulated_audio_joycon(write_latency=0.001, unplug_after=30)
+    fanout = Fanout(fps)
+    fanout.add(first, commands)
+    fanout.add(lost, commands)
+    threading.Timer(1.0, fanout.add, (late, commands)).start()
+    fanout.play(num_frames)
+    sent = [len(sim.rumble_reports()) for sim in (first_sim, late_sim, lost_sim)]
+    for sim in (first_sim, late_sim):
+        sim.close()
+    print(f"再生中の追加/切断: 最初から {sent[0]} / 1秒後に追加 {sent[1]} / "
+          f"切断 {sent[2]} フレーム (全 {num_frames})")
+
+
+# ==========================================
+# 骨格化（一括処理 vs ストリーミング）
+# ==========================================
+def bench_skeleton(minutes: float = 10.0, batch_minutes: float = 3.0):
+    import contextlib
+    import io
+    import processor
+
+    os.environ["JOYCON_CACHE"] = "0"
+
+    def measure(fn, path, out):
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            fn(path, out)
+        elapsed = time.perf_counter() - t0
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return elapsed, peak
+
+    with tempfile.TemporaryDirectory() as tmp:
+        out = str(Path(tmp) / "out.wav")
+        for label, fn, lengths in (
+            ("一括      ", processor.create_skeleton_audio, (batch_minutes,)),
+            ("ストリーム", processor.create_skeleton_audio_stream, (batch_minutes, minutes)),
+        ):
+            for length in lengths:
+                path = str(Path(tmp) / f"{length:g}min.wav")
+                if not os.path.exists(path):
+                    write_synthetic_wav(path, length * 60)
+                elapsed, peak = measure(fn, path, out)
+                print(f"{label} {length:4.0f} 分: {elapsed:6.1f} s (実時間の x{length * 60 / elapsed:5.1f}) "
+                      f"/ ピークメモリ {peak / 1e6:8.1f} MB")
+
+
+# ==========================================
+# 骨格化 + 解析（WAV を経由する2段階 vs パイプライン）
+# ==========================================
+def bench_pipeline(seconds: float = 120.0, fps: int = 66):
+    import contextlib
+    import io
+    import processor
+    import mp3_to_command_noize as engine
+    from pipeline import build_pipeline, print_timings
+
+    os.environ["JOYCON_CACHE"] = "0"
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "song.wav")
+        write_synthetic_wav(path, seconds)
+
+        # 以前: 骨格化した WAV を書き出し、解析で読み直して HPSS をもう一度かける
+        with contextlib.redirect_stdout(io.StringIO()):
+            t0 = time.perf_counter()
+            skeleton_path = str(Path(tmp) / "skeleton.wav")
+            processor.create_skeleton_audio(path, skeleton_path)
+            t_skeleton = time.perf_counter() - t0
+            two_step = engine.analyze_with_stft(skeleton_path, fps=fps)
+            t_analyze = time.perf_counter() - t0 - t_skeleton
+            two_step = engine.apply_median_filter(two_step, kernel_size=5)
+            jcr.save_commands_to_jcr(two_step, str(Path(tmp) / "legacy.jcr"), fps=fps, source_path=path)
+            t_legacy = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            buf = build_pipeline(path, str(Path(tmp) / "pipeline.jcr"), fps=fps).run(verbose=False)
+            t_pipeline = time.perf_counter() - t0
+
+    print(f"{seconds:.0f} 秒の音声 (中間ファイル・キャッシュ無し)")
+    print(f"以前 (WAV経由)   : {t_legacy:6.2f} s  (骨格化 {t_skeleton:.2f} s / 再読込+HPSS+STFT {t_analyze:.2f} s)")
+    print(f"パイプライン      : {t_pipeline:6.2f} s")
+    print_timings(buf.timings)
+
+    # 解析側の HPSS と WAV の量子化を省いた分だけ結果は変わる。どの程度かを示す
+    commands = buf.commands
+    same_hf = np.mean(commands[:, 0] == two_step[:, 0]) * 100
+    same_lf = np.mean(commands[:, 2] == two_step[:, 2]) * 100
+    amp_diff = np.abs(commands[:, [1, 3]] - two_step[:, [1, 3]])
+    print(f"以前の結果との比較: ピーク周波数の一致 HF {same_hf:.1f} % / LF {same_lf:.1f} %, "
+          f"振幅の差 平均 {amp_diff.mean():.4f} / 最大 {amp_diff.max():.4f}")
+
+
+# ==========================================
+# 計測（無効時のオーバーヘッドと出力）
+# ==========================================
+def bench_profiling(n: int = 200000, seconds: float = 30.0, fps: int = 66):
+    import contextlib
+    import io
+    import json
+    import profiling
+    from pipeline import build_pipeline
+
+    def per_call_ns(fn):
+        t0 = time.perf_counter()
+        for _ in range(n):
+            fn()
+        return (time.perf_counter() - t0) / n * 1e9
+
+    def bare():
+        pass
+
+    def with_span():
+        with profiling.span("x"):
+            pass
+
+    decorated = profiling.profiled("x", count=None)(bare)
+    base = per_call_ns(bare)
+    print(f"1回あたり (関数呼び出しのみ {base:.0f} ns を含む)")
+    print(f"無効: with span()   : {per_call_ns(with_span):7.0f} ns")
+    print(f"無効: @profiled     : {per_call_ns(decorated):7.0f} ns")
+    profiling.enable()
+    print(f"有効: with span()   : {per_call_ns(with_span):7.0f} ns")
+    print(f"有効: @profiled     : {per_call_ns(decorated):7.0f} ns")
+    profiling.disable()
+
+    # 再生ループ: 計測の有無でフレームの遅れが変わらないこと
+    num_frames = int(3.0 * fps)
+    commands = random_commands(num_frames)
+    for label, enabled in (("無効", False), ("有効", True)):
+        if enabled:
+            profiling.enable()
+        devices = [_simulated_audio_joycon(write_latency=lat) for lat in (0.001, 0.002)]
+        with contextlib.redirect_stdout(io.StringIO()):
+            writers = play_tracks_on_joycons([(jc, commands) for jc, _ in devices], fps=fps, telemetry=True)
+        for _, sim in devices:
+            sim.close()
+        # 書き込み間隔の目標 (1/fps) からのずれ
+        jitter = np.abs(np.diff(writers[0].telemetry.write_start, axis=1) - 1 / fps).ravel() * 1e3
+        profiler = profiling.disable()
+        spans = len(profiler.spans) if profiler else 0
+        print(f"再生 (計測{label}): 間隔のずれ p50 {np.median(jitter):.3f} ms / "
+              f"p99 {np.percentile(jitter, 99):.3f} ms / 記録した区間 {spans}")
+
+    # 変換パイプライン全体: JSON レポートと Chrome トレース
+    os.environ["JOYCON_CACHE"] = "0"
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "song.wav")
+        write_synthetic_wav(path, seconds)
+        with contextlib.redirect_stdout(io.StringIO()):
+            build_pipeline(path, str(Path(tmp) / "warmup.jcr"), fps=fps).run()  # 初回の JIT・FFT の準備を除く
+            t0 = time.perf_counter()
+            build_pipeline(path, str(Path(tmp) / "off.jcr"), fps=fps).run()
+            t_off = time.perf_counter() - t0
+            profiling.enable()
+            t0 = time.perf_counter()
+            build_pipeline(path, str(Path(tmp) / "on.jcr"), fps=fps).run()
+            t_on = time.perf_counter() - t0
+            profiler = profiling.finish(str(Path(tmp) / "report.json"), str(Path(tmp) / "trace.json"))
+        with open(Path(tmp) / "report.json", encoding='utf-8') as f:
+            report = json.load(f)
+        with open(Path(tmp) / "trace.json", encoding='utf-8') as f:
+            trace = json.load(f)
+    print(f"パイプライン {seconds:.0f} 秒分: 計測無効 {t_off:.2f} s / 有効 {t_on:.2f} s "
+          f"/ 区間 {len(report['spans'])} / トレースイベント {len(trace['traceEvents'])}")
+    profiler.print_summary()
+
+
+# ==========================================
+# 再生テレメトリ（記録のコストと、詰まったデバイスの検出）
+# ==========================================
+def bench_telemetry(n: int = 100000, seconds: float = 4.0, fps: int = 66):
+    import contextlib
+    import io
+    from telemetry import PlaybackTelemetry
+
+    # 1. 1フレーム分の記録（予定・開始・終了）のコストと、記録中に確保されるメモリ
+    def legacy_record():
+        # 以前の DeviceWriter: フレームごとに dict へ追加
+        write_start, write_end = {}, {}
+        for i in range(n):
+            t = time.perf_counter()
+            write_start[i] = t
+            write_end[i] = t
+
+    telemetry = PlaybackTelemetry(n, fps, max_devices=1)
+    device = telemetry.add_device()
+
+    def telemetry_record():
+        # DeviceWriter と同じく、デバイスの行に代入する
+        scheduled = telemetry.scheduled[device]
+        write_start = telemetry.write_start[device]
+        write_end = telemetry.write_end[device]
+        for i in range(n):
+            t = time.perf_counter()
+            scheduled[i] = t
+            write_start[i] = t
+            write_end[i] = t
+
+    for label, fn in (("以前 (dict)       ", legacy_record), ("PlaybackTelemetry ", telemetry_record)):
+        t0 = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - t0
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{label}: {elapsed / n * 1e9:5.0f} ns/フレーム / 記録中に確保したメモリ {peak / 1e3:8.1f} kB ({n} フレーム)")
+
+    # 2. 1台の書き込みが 0.2 秒詰まったときの記録
+    num_frames = int(seconds * fps)
+    commands = random_commands(num_frames)
+    devices = [_simulated_audio_joycon(write_latency=0.001),
+               _simulated_audio_joycon(write_latency=0.002, stall_at=(fps,), stall=0.2)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        writers = play_tracks_on_joycons([(jc, commands) for jc, _ in devices], fps=fps, telemetry=True)
+    for _, sim in devices:
+        sim.close()
+    telemetry = writers[0].telemetry
+    telemetry.print_summary()
+
+
+BENCHMARKS = {
+    "rumble": bench_rumble_encode,
+    "track_load": bench_track_load,
+    "frame_clock": bench_frame_clock,
+    "fanout": bench_fanout,
+    "stream": bench_stream_analysis,
+    "peaks": bench_peak_picking,
+    "cache": bench_analysis_cache,
+    "f0": bench_f0,
+    "live": bench_live,
+    "synth": bench_synthesize,
+    "report": bench_report,
+    "input_report": bench_input_report,
+    "imu": bench_imu,
+    "gyro": bench_gyro,
+    "events": bench_button_events,
+    "async": bench_async,
+    "subcommand": bench_subcommand,
+    "connect": bench_connect,
+    "registry": bench_registry,
+    "skeleton": bench_skeleton,
+    "pipeline": bench_pipeline,
+    "profiling": bench_profiling,
+    "telemetry": bench_telemetry,
+}
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print(f"--- {name} ---")
+        BENCHMARKS[name]()
@@ -1,13 +1,13 @@
 # csv_emulator.py
 import numpy as np
-import sounddevice as sd
 import csv
+import threading
 from pathlib import Path
 
-def synthesize_joycon_audio(csv_path: str, fps: int = 66, sample_rate: int = 44100):
-    """
-    CSVのモーター制御コマンドから、PC再生用のオーディオ波形（サイン波）を数学的に合成する
-    """
+from rumble import quantize
+
+def load_commands(csv_path: str) -> np.ndarray:
+    """CSVのモーター制御コマンドを (N, 4) の配列で読み込む"""
     commands = []
     with open(csv_path, 'r', encoding='utf-8') as f:
         reader = csv.reader(f)
@@ -15,73 +15,170 @@ def synthesize_joycon_audio(csv_path: str, fps: int = 66, sample_rate: int = 441
         for row in reader:
             if len(row) == 4:
                 commands.append((float(row[0]), float(row[1]), float(row[2]), float(row[3])))
+    return np.array(commands, dtype=np.float64).reshape(-1, 4)
 
-    print(f"CSV読み込み完了: {len(commands)} フレーム")
-    print("仮想Joy-Con波形を合成中... ")
+def _fill_inactive(freqs: np.ndarray, active: np.ndarray) -> np.ndarray:
+    """鳴っていないフレームの周波数を直前（先頭なら直後）の鳴っているフレームの値で埋める"""
+    if not active.any():
+        return np.zeros_like(freqs)
+    idx = np.where(active, np.arange(len(freqs)), 0)
+    np.maximum.accumulate(idx, out=idx)
+    filled = freqs[idx]
+    filled[:np.argmax(active)] = freqs[np.argmax(active)]
+    return filled
+
+def _upsample(values: np.ndarray, frac: np.ndarray, interpolate: bool) -> np.ndarray:
+    """フレームごとの値 (n+1,) をサンプルごとの値 (n, samples_per_frame) にする"""
+    if not interpolate:
+        return np.repeat(values[:-1, None], len(frac), axis=1)
+    return values[:-1, None] + np.diff(values)[:, None] * frac
+
+def synthesize_blocks(commands, fps: int = 66, sample_rate: int = 44100,
+                      interpolate: bool = False, block_frames: int = 64):
+    """
+    コマンド列を block_frames フレームずつ波形（正規化前の float32）にして返すジェネレータ。
+    メモリ使用量は曲の長さによらず一定になる。
 
+    位相アキュムレータ方式：サンプルごとの周波数から位相の増分を求め、np.cumsum で積算する。
+    波の切れ目で「ブチッ」というノイズ（ポップノイズ）が入るのを防ぐため、位相は次のフレーム・ブロックへ引き継ぐ。
+    位相はフレームごとに 2π で折り返してから float32 の sin を取る（float64 との差は 1e-5 程度）。
+
+    interpolate=False: 元の合成と同じく、フレーム内は一定の周波数・振幅。鳴っていないフレームでは位相を止める。
+    interpolate=True : 周波数と振幅をフレーム間で直線補間する。鳴っていないフレームは振幅 0 とし、
+                       周波数は前後の値を保つ（0Hz へのスイープを避ける）。
+    """
+    commands = np.asarray(commands, dtype=np.float64).reshape(-1, 4)
     # 1フレームあたりのサンプル数を計算（44100Hz / 66fps ≒ 668サンプル）
     samples_per_frame = int(sample_rate / fps)
-    total_samples = len(commands) * samples_per_frame
-    audio_data = np.zeros(total_samples, dtype=np.float32)
-
-    # 波の切れ目で「ブチッ」というノイズ（ポップノイズ）が入るのを防ぐため、
-    # 前のフレームからの波の角度（位相）を保持する
-    hf_phase = 0.0
-    lf_phase = 0.0
-
-    for i, cmd in enumerate(commands):
-        hf_f, hf_a, lf_f, lf_a = cmd
-        start_idx = i * samples_per_frame
-        end_idx = start_idx + samples_per_frame
-
-        # 時間軸の配列を作成
-        t = np.arange(samples_per_frame) / sample_rate
-
-        # 高周波（HF）モーターのサイン波合成
-        if hf_f > 0 and hf_a > 0:
-            hf_wave = hf_a * np.sin(2 * np.pi * hf_f * t + hf_phase)
-            hf_phase += 2 * np.pi * hf_f * (samples_per_frame / sample_rate)
-        else:
-            hf_wave = np.zeros(samples_per_frame)
+    num_frames = len(commands)
+    frac = np.arange(samples_per_frame) / samples_per_frame
 
-        # 低周波（LF）モーターのサイン波合成
-        if lf_f > 0 and lf_a > 0:
-            lf_wave = lf_a * np.sin(2 * np.pi * lf_f * t + lf_phase)
-            lf_phase += 2 * np.pi * lf_f * (samples_per_frame / sample_rate)
-        else:
-            lf_wave = np.zeros(samples_per_frame)
+    motors = []
+    for f_col, a_col in ((0, 1), (2, 3)):
+        freqs, amps = commands[:, f_col], commands[:, a_col]
+        active = (freqs > 0) & (amps > 0)
+        freqs = _fill_inactive(freqs, active) if interpolate else np.where(active, freqs, 0.0)
+        amps = np.where(active, amps, 0.0)
+        # 補間時の最後のフレームは振幅 0 へ向かって消えていく
+        motors.append((np.append(freqs, freqs[-1:]), np.append(amps, 0.0 if interpolate else amps[-1:])))
+
+    carry = [0.0, 0.0]
+    for a in range(0, num_frames, block_frames):
+        b = min(num_frames, a + block_frames)
+        wave = np.zeros((b - a, samples_per_frame), dtype=np.float32)
+        for m, (freqs, amps) in enumerate(motors):
+            increments = _upsample(freqs[a:b + 1], frac, interpolate) * (2 * np.pi / sample_rate)
+            within = np.cumsum(increments, axis=1)
+            frame_advance = within[:, -1].copy()
+            within -= increments
+            # フレーム先頭の位相（2π で折り返し済み）
+            start = np.mod(carry[m] + np.concatenate([[0.0], np.cumsum(frame_advance)[:-1]]), 2 * np.pi)
+            carry[m] = (start[-1] + frame_advance[-1]) % (2 * np.pi)
+            phase = (within + start[:, None]).astype(np.float32)
+            wave += _upsample(amps[a:b + 1], frac, interpolate).astype(np.float32) * np.sin(phase)
+        yield wave.ravel()
+
+def synthesize_joycon_audio(csv_path: str, fps: int = 66, sample_rate: int = 44100,
+                            interpolate: bool = False, quantized: bool = False):
+    """
+    CSVのモーター制御コマンドから、PC再生用のオーディオ波形（サイン波）を数学的に合成する
+    quantized=True なら、エンコードした振動データをデコードし直した値（実機が受け取る値）から合成する
+    """
+    commands = load_commands(csv_path)
 
+    print(f"CSV読み込み完了: {len(commands)} フレーム")
+    if quantized:
+        commands = quantize(commands)
+    print("仮想Joy-Con波形を合成中... ")
+
+    samples_per_frame = int(sample_rate / fps)
+    audio_data = np.zeros(len(commands) * samples_per_frame, dtype=np.float32)
+    pos = 0
+    for block in synthesize_blocks(commands, fps, sample_rate, interpolate):
         # 2つのモーターの波形をミックスして格納
-        audio_data[start_idx:end_idx] = hf_wave + lf_wave
+        audio_data[pos:pos + len(block)] = block
+        pos += len(block)
 
     # PCのスピーカーが音割れ（クリッピング）を起こさないように音量を正規化
-    max_val = np.max(np.abs(audio_data))
+    max_val = np.max(np.abs(audio_data)) if len(audio_data) else 0.0
     if max_val > 0:
         audio_data = (audio_data / max_val) * 0.5  # 音量50%に設定
 
     return audio_data, sample_rate
 
+def play_streaming(commands, fps: int = 66, sample_rate: int = 44100,
+                   interpolate: bool = False, quantized: bool = False, blocksize: int = 1024):
+    """
+    全体を合成せず、sounddevice.OutputStream のコールバックでブロックごとに合成しながら再生する。
+    すぐに再生が始まり、メモリ使用量も一定。
+    曲全体の最大値が分からないため、音量は2つのモーターの振幅の和の最大値で正規化する
+    （一括合成より僅かに小さくなることがあるが、音割れはしない）。
+    """
+    import sounddevice as sd
+
+    commands = np.asarray(commands, dtype=np.float64).reshape(-1, 4)
+    if quantized:
+        commands = quantize(commands)
+    hf = np.where((commands[:, 0] > 0) & (commands[:, 1] > 0), commands[:, 1], 0.0)
+    lf = np.where((commands[:, 2] > 0) & (commands[:, 3] > 0), commands[:, 3], 0.0)
+    peak = np.max(hf + lf) if len(commands) else 0.0
+    scale = 0.5 / peak if peak > 0 else 0.0
+
+    blocks = synthesize_blocks(commands, fps, sample_rate, interpolate)
+    pending = np.zeros(0)
+    finished = threading.Event()
+
+    def callback(outdata, frames, time_info, status):
+        nonlocal pending
+        while len(pending) < frames:
+            block = next(blocks, None)
+            if block is None:
+                break
+            pending = np.concatenate([pending, block])
+        n = min(frames, len(pending))
+        outdata[:n, 0] = pending[:n] * scale
+        outdata[n:, 0] = 0.0
+        pending = pending[n:]
+        if n < frames:
+            raise sd.CallbackStop
+
+    with sd.OutputStream(samplerate=sample_rate, channels=1, dtype='float32', blocksize=blocksize,
+                         callback=callback, finished_callback=finished.set):
+        finished.wait()
+
 if __name__ == '__main__':
+    import sounddevice as sd
+
     script_dir = Path(__file__).parent
     # 先ほどF0推定とダイナミックEQをかけて生成したCSVを指定
-    csv_path = script_dir / "shunkan_commands.csv" 
+    csv_path = script_dir / "shunkan_commands.csv"
+
+    # True = フレーム間で周波数と振幅を直線補間する（段差の無い滑らかな音）
+    INTERPOLATE = False
+    # True = エンコード後の振動データをデコードして合成する（量子化の影響を実機と同じように聞く）
+    QUANTIZED = False
+    # True = 合成しながら再生する（長い曲でもすぐに再生が始まる）
+    STREAMING = True
 
     if not csv_path.exists():
         print(f"エラー: {csv_path} が見つかりません。")
         exit()
 
     try:
-        # 音声の合成
-        audio, sr = synthesize_joycon_audio(str(csv_path))
-        
-        # PCスピーカーで再生
         print("\nPCスピーカーでの再生を開始します。")
         print("（終了するには Ctrl+C を押してください）")
-        sd.play(audio, sr)
-        sd.wait() # 再生が終わるまで待機
-        
+        if STREAMING:
+            play_streaming(load_commands(str(csv_path)), interpolate=INTERPOLATE, quantized=QUANTIZED)
+        else:
+            # 音声の合成
+            audio, sr = synthesize_joycon_audio(str(csv_path), interpolate=INTERPOLATE, quantized=QUANTIZED)
+
+            # PCスピーカーで再生
+            sd.play(audio, sr)
+            sd.wait() # 再生が終わるまで待機
+
     except KeyboardInterrupt:
         print("\n再生を強制停止しました。")
         sd.stop()
     except Exception as e:
-        print(f"予期せぬエラーが発生しました: {e}")
\ No newline at end of file
+        print(f"予期せぬエラーが発生しました: {e}")
@@ -0,0 +1,243 @@
+import threading
+import time
+from collections import deque
+
+from frameclock import FrameClock, POLICY_CATCHUP, wait_until
+from jcr import as_frames
+from profiling import span
+from telemetry import PlaybackTelemetry
+from rumble import encode_joycon_rumble
+
+# ==========================================
+# 複数Joy-Conへの並列送信（デバイスごとの送信スレッド）
+# ==========================================
+STOP_FRAME = encode_joycon_rumble(0.0, 0.0, 0.0, 0.0) * 2
+
+
+class DeviceWriter(threading.Thread):
+    """
+    1台のJoy-Con専用の送信スレッド。
+    マスタークロックから (フレーム番号, 予定時刻) を有界リングバッファで受け取り、
+    予定時刻からこのデバイスの遅延分だけ早めて書き込む。
+    バッファが一杯のときは最も古いフレームを捨てるため、
+    Bluetoothが詰まったデバイスがあっても他のデバイスやマスターは止まらない。
+
+    latency を None にすると、実測した書き込み時間の移動平均を遅延として補正する。
+    補正量は max_latency を上限とする。
+
+    attach() で PlaybackTelemetry を渡すと、フレームごとの予定時刻と書き込み時刻を記録する。
+    """
+
+    def __init__(self, joycon, commands, latency: float = None, max_latency: float = 0.005,
+                 buffer_frames: int = 8, spin: float = 0.0):
+        super().__init__(daemon=True)
+        self.joycon = joycon
+        self.frames = as_frames(commands)
+        self.num_frames = len(self.frames) // 8
+        self.max_latency = max_latency
+        self.adaptive = latency is None
+        self.latency = min(latency or 0.0, max_latency)
+        self.spin = spin
+
+        self._queue = deque(maxlen=buffer_frames)
+        self._ready = threading.Condition()
+        self._closed = False
+
+        self.overruns = 0
+        self.error = None  # 書き込みに失敗した場合の例外（切断など）
+        self.telemetry = None
+        self.device = None  # telemetry でのデバイス番号
+
+    def attach(self, telemetry: PlaybackTelemetry, name: str = None):
+        self.device = telemetry.add_device(name)
+        if self.device is not None:
+            # 送信ループでは、このデバイスの行に代入するだけにする
+            self._scheduled = telemetry.scheduled[self.device]
+            self._write_start = telemetry.write_start[self.device]
+            self._write_end = telemetry.write_end[self.device]
+            self.telemetry = telemetry
+
+    def push(self, i: int, target: float):
+        if self.error is not None:
+            return
+        if self.telemetry is not None and i < self.num_frames:
+            self._scheduled[i] = target
+        with self._ready:
+            if len(self._queue) == self._queue.maxlen:
+                self.overruns += 1
+            self._queue.append((i, target))
+            self._ready.notify()
+
+    def close(self):
+        with self._ready:
+            self._closed = True
+            self._ready.notify()
+
+    def _next(self):
+        with self._ready:
+            while not self._queue and not self._closed:
+                self._ready.wait()
+            return self._queue.popleft() if self._queue else None
+
+    def run(self):
+        while True:
+            item = self._next()
+            if item is None:
+                break
+            i, target = item
+            if i >= self.num_frames:
+                continue
+
+            wait_until(target - self.latency, self.spin)
+            start = time.perf_counter()
+            try:
+                self.joycon.send_rumble_data(self.frames[i * 8:(i + 1) * 8])
+            except OSError as e:
+                # デバイスが切断された。このスレッドだけ終了し、他のデバイスは鳴らし続ける
+                self.error = e
+                return
+            end = time.perf_counter()
+            if self.telemetry is not None:
+                self._write_start[i] = start
+                self._write_end[i] = end
+
+            if self.adaptive:
+                self.latency += 0.1 * (min(end - start, self.max_latency) - self.latency)
+
+        try:
+            self.joycon.send_rumble_data(STOP_FRAME)
+        except OSError as e:
+            # 抜かれて remove() で外されたデバイスなど。止める相手がもういない
+            self.error = e
+
+
+class Fanout:
+    """
+    マスタークロック1つで複数の DeviceWriter を同期して鳴らす。
+    add / remove は再生中に別スレッドから呼んでもよい（ホットプラグ用）。
+    途中で追加したデバイスは、曲の先頭からではなく現在のフレームから鳴り始める。
+
+    マスタークロックは各フレームを lead 秒前に全送信スレッドへ配り、
+    各スレッドは「予定時刻 - デバイス遅延」に書き込むことで到着時刻を揃える。
+    遅延の補正量は lead を上限とする。
+
+    telemetry=True なら、play() のたびに PlaybackTelemetry を作って self.telemetry に記録する。
+    """
+
+    def __init__(self, fps: int = 66, policy: str = POLICY_CATCHUP, lead: float = 0.005,
+                 telemetry: bool = False, max_devices: int = 8):
+        self.fps = fps
+        self.policy = policy
+        self.lead = lead
+        self.record_telemetry = telemetry
+        self.max_devices = max_devices
+        self.writers = []   # これまでに追加したすべての送信スレッド
+        self.clock = None
+        self.telemetry = None
+        # 再生ループはフレームごとにロックを取らず、このタプルを丸ごと読む
+        self._active = ()
+        self._lock = threading.Lock()
+
+    def add(self, joycon, commands, latency: float = None) -> DeviceWriter:
+        writer = DeviceWriter(joycon, commands, latency=latency, max_latency=self.lead)
+        writer.start()
+        with self._lock:
+            if self.telemetry is not None:
+                writer.attach(self.telemetry, getattr(joycon, "serial", None))
+            self.writers.append(writer)
+            self._active += (writer,)
+        return writer
+
+    def remove(self, joycon):
+        """joycon の送信スレッドを止める。切断済みのデバイスでもよい。"""
+        with self._lock:
+            removed = [w for w in self._active if w.joycon is joycon]
+            self._active = tuple(w for w in self._active if w.joycon is not joycon)
+        for w in removed:
+            w.close()
+            w.join()
+
+    def play(self, num_frames: int = None) -> FrameClock:
+        """num_frames を省略すると、追加済みのトラックのうち最長のものに合わせる。"""
+        if num_frames is None:
+            num_frames = max((w.num_frames for w in self._active), default=0)
+        if self.record_telemetry:
+            with self._lock:
+                self.telemetry = PlaybackTelemetry(num_frames, self.fps, self.max_devices)
+                for w in self._active:
+                    w.attach(self.telemetry, getattr(w.joycon, "serial", None))
+        clock = self.clock = FrameClock(self.fps, policy=self.policy)
+        try:
+            with span("playback", count=num_frames, devices=len(self._active)):
+                for i in clock.ticks(num_frames):
+                    # 起床の揺らぎを持ち込まないよう、実時刻ではなく予定時刻を基準にする
+                    target = clock.deadlines[i] + self.lead
+                    for w in self._active:
+                        w.push(i, target)
+        finally:
+            with self._lock:
+                writers, self._active = self._active, ()
+            for w in writers:
+                w.close()
+            for w in writers:
+                w.join()
+        return clock
+
+    def print_summary(self):
+        if self.clock is not None:
+            self.clock.print_summary()
+        if self.telemetry is not None:
+            self.telemetry.print_summary()
+        for n, w in enumerate(self.writers):
+            if w.overruns:
+                print(f"デバイス{n}: 送信が間に合わず {w.overruns} フレームを破棄しました。")
+            if w.error is not None:
+                print(f"デバイス{n}: 送信に失敗したため停止しました ({w.error})。")
+
+
+def play_tracks_on_joycons(assignments: list, fps: int = 66, policy: str = POLICY_CATCHUP,
+                           latencies: list = None, lead: float = 0.005, telemetry: bool = False) -> list:
+    """
+    assignments は (joycon, commands) のリスト。デバイスごとに別のトラックを鳴らせる
+    （例: Lにベース、Rにメロディ）。commands はコマンド列・RumbleTrack・as_frames でエンコード済みの振動データ。
+    telemetry=True なら、各送信スレッドの .telemetry に送信時刻が記録される（全スレッドで共通）。
+    """
+    if latencies is None:
+        latencies = [None] * len(assignments)
+    fanout = Fanout(fps, policy=policy, lead=lead, telemetry=telemetry, max_devices=max(len(assignments), 1))
+    for (jc, commands), lat in zip(assignments, latencies):
+        fanout.add(jc, commands, latency=lat)
+    fanout.play()
+    fanout.print_summary()
+    return fanout.writers
+
+
+# ==========================================
+# asyncio 版（1つのスレッドから全デバイスへ送信）
+# ==========================================
+async def play_tracks_async(assignments: list, fps: int = 66, policy: str = POLICY_CATCHUP) -> FrameClock:
+    """
+    assignments は (AsyncJoyCon, commands) のリスト。
+    書き込みはノンブロッキングなので、送信スレッドを作らずにイベントループの中で
+    全デバイスへ順に送る。書き込めなかったデバイスはそのフレームを破棄する。
+    待ち時間は他のタスクに譲るため、複数の再生を asyncio.gather で同時に動かせる。
+    """
+    tracks = [(jc, as_frames(commands)) for jc, commands in assignments]
+    num_frames = max((len(frames) // 8 for _, frames in tracks), default=0)
+    overruns = [0] * len(tracks)
+    clock = FrameClock(fps, policy=policy)
+
+    try:
+        async for i in clock.aticks(num_frames):
+            for n, (jc, frames) in enumerate(tracks):
+                if (i + 1) * 8 <= len(frames) and not jc.send_rumble_nowait(frames[i * 8:(i + 1) * 8]):
+                    overruns[n] += 1
+    finally:
+        for jc, _ in tracks:
+            await jc.send_rumble(STOP_FRAME)
+
+    clock.print_summary()
+    for n, count in enumerate(overruns):
+        if count:
+            print(f"デバイス{n}: 送信が間に合わず {count} フレームを破棄しました。")
+    return clock
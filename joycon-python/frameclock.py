@@ -0,0 +1,141 @@
+import asyncio
+import time
+import numpy as np
+
+# ==========================================
+# 再生用フレームクロック（スリープ + 直前スピン）
+# ==========================================
+POLICY_CATCHUP = "catchup"  # 遅れたフレームも待たずに順番に送り、予定時刻に追いつく
+POLICY_DROP = "drop"        # 1フレーム以上遅れたら、期限切れのフレームを飛ばす
+POLICY_STRETCH = "stretch"  # 遅れた分だけ以降の予定時刻を後ろへずらす（曲が伸びる）
+POLICIES = (POLICY_CATCHUP, POLICY_DROP, POLICY_STRETCH)
+
+
+def wait_until(deadline: float, spin: float = 0.001):
+    """deadline の spin 秒前まではスリープし、残りは perf_counter をスピンして待つ"""
+    remaining = deadline - time.perf_counter()
+    if remaining > spin:
+        time.sleep(remaining - spin)
+    while time.perf_counter() < deadline:
+        pass
+
+
+async def async_wait_until(deadline: float, spin: float = 0.001):
+    """wait_until の asyncio 版。スリープの間はイベントループが他のタスクを動かす"""
+    remaining = deadline - time.perf_counter()
+    if remaining > spin:
+        await asyncio.sleep(remaining - spin)
+    while time.perf_counter() < deadline:
+        pass
+
+
+class FrameClock:
+    """
+    開始時刻からの絶対時刻でフレームの予定時刻を決めるため、誤差が積み重ならない。
+    予定時刻の spin 秒前まではスリープし、残りだけ perf_counter をスピンして待つ。
+    各フレームの予定時刻・遅れ（実際の送信時刻 - 予定時刻）とスキップしたフレームを記録する。
+    deadlines は実際に待った予定時刻で、drop / stretch で予定がずれた後の値になる。
+    """
+
+    def __init__(self, fps: int = 66, policy: str = POLICY_CATCHUP, spin: float = 0.001):
+        if policy not in POLICIES:
+            raise ValueError(f"policy must be one of {POLICIES}: {policy!r}")
+        self.fps = fps
+        self.period = 1.0 / fps
+        self.policy = policy
+        self.spin = spin
+        self.start_time = None
+        self.deadlines = np.empty(0)
+        self.lateness = np.empty(0)
+        self.sent_at = np.empty(0)
+        self.skipped = 0
+
+    def ticks(self, num_frames: int):
+        """
+        送信すべきフレーム番号を、その予定時刻になった時点で順に返すジェネレータ。
+        最後のフレームの再生時間が終わるまで待ってから終了する。
+        """
+        for deadline, i in self._schedule(num_frames):
+            if i is None:
+                wait_until(deadline, self.spin)
+            else:
+                yield i
+
+    async def aticks(self, num_frames: int):
+        """ticks の asyncio 版。予定時刻までの待ち時間は他のタスクに譲る"""
+        for deadline, i in self._schedule(num_frames):
+            if i is None:
+                await async_wait_until(deadline, self.spin)
+            else:
+                yield i
+
+    def _schedule(self, num_frames: int):
+        """
+        ticks / aticks の共通部分。(待つ時刻, None) と (None, フレーム番号) を交互に返し、
+        待つのは呼び出し側に任せる。
+        """
+        self.deadlines = np.full(num_frames, np.nan)
+        self.lateness = np.full(num_frames, np.nan)
+        self.sent_at = np.full(num_frames, np.nan)
+        self.skipped = 0
+        self.start_time = start = time.perf_counter()
+
+        i = 0
+        while i < num_frames:
+            deadline = start + i * self.period
+            yield deadline, None
+            now = time.perf_counter()
+            late = now - deadline
+
+            if late >= self.period:
+                if self.policy == POLICY_DROP:
+                    # 今の時刻に該当するフレームまで飛ばす
+                    current = min(num_frames - 1, int((now - start) / self.period))
+                    self.skipped += current - i
+                    i = current
+                    deadline = start + i * self.period
+                    late = now - deadline
+                elif self.policy == POLICY_STRETCH:
+                    start += late
+                    deadline = now
+                    late = 0.0
+
+            self.deadlines[i] = deadline
+            self.lateness[i] = late
+            self.sent_at[i] = now
+            yield None, i
+            i += 1
+
+        yield start + num_frames * self.period, None
+
+    def stats(self) -> dict:
+        sent = self.lateness[~np.isnan(self.lateness)]
+        intervals = np.diff(self.sent_at[~np.isnan(self.sent_at)])
+        if len(sent) == 0:
+            return {"frames": len(self.lateness), "sent": 0, "skipped": self.skipped}
+        return {
+            "frames": len(self.lateness),
+            "sent": len(sent),
+            "skipped": self.skipped,
+            "late_mean_ms": float(np.mean(sent)) * 1e3,
+            "late_p99_ms": float(np.percentile(sent, 99)) * 1e3,
+            "late_max_ms": float(np.max(sent)) * 1e3,
+            "jitter_ms": float(np.std(intervals)) * 1e3 if len(intervals) else 0.0,
+        }
+
+    def histogram(self, bin_ms: float = 0.1, max_ms: float = 2.0) -> (np.ndarray, np.ndarray):
+        """遅れの分布。最後のビンには max_ms 以上の遅れをまとめる"""
+        sent = self.lateness[~np.isnan(self.lateness)] * 1e3
+        edges = np.append(np.arange(0.0, max_ms + bin_ms / 2, bin_ms), np.inf)
+        counts, _ = np.histogram(np.clip(sent, 0.0, None), bins=edges)
+        return counts, edges
+
+    def print_summary(self):
+        s = self.stats()
+        if not s["sent"]:
+            return
+        print(
+            f"タイミング: 平均遅れ {s['late_mean_ms']:.3f} ms / p99 {s['late_p99_ms']:.3f} ms / "
+            f"最大 {s['late_max_ms']:.3f} ms / ジッタ {s['jitter_ms']:.3f} ms / "
+            f"スキップ {s['skipped']} フレーム"
+        )
@@ -0,0 +1,227 @@
+import csv
+import hashlib
+import mmap
+import struct
+import numpy as np
+from pathlib import Path
+
+from rumble import encode_many
+from profiling import profiled
+
+# ==========================================
+# .jcr: エンコード済み振動トラックのバイナリ形式
+# ==========================================
+# ヘッダー（リトルエンディアン, 72バイト）
+#   magic(4) version(2) header_size(2) fps(4) frame_count(8)
+#   channels(1) flags(1) reserved(2) source_hash(32)
+#   payload_offset(8) raw_offset(8)
+# その後に 8バイト/フレームの振動ペイロードが frame_count 個連続し、
+# flags に RAW が立っていれば float32 の生コマンド (frame_count, 4 * channels) が続く。
+JCR_MAGIC = b'JCR1'
+JCR_VERSION = 1
+JCR_HEADER = struct.Struct('<4sHHIQBB2x32sQQ')
+JCR_FLAG_RAW = 0x01
+FRAME_SIZE = 8
+
+CHANNELS_MONO = 1    # 左右モーターに同じ4バイトを送る
+CHANNELS_STEREO = 2  # 左右モーターで別々のコマンドを持つ
+
+
+def file_sha256(path: str) -> bytes:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.digest()
+
+
+def _as_commands(commands) -> np.ndarray:
+    """(N, 4) または (N, 8) の float64 配列にする。それ以外の形は並びを推測せずにエラーにする"""
+    commands = np.asarray(commands, dtype=np.float64)
+    if commands.ndim != 2 or commands.shape[1] not in (4, 8):
+        raise ValueError(f"commands must have shape (N, 4) or (N, 8), got {commands.shape}")
+    return commands
+
+
+def _encode_channels(commands: np.ndarray) -> bytes:
+    if commands.shape[1] == 4:
+        return encode_many(commands)
+    left = np.frombuffer(encode_many(commands[:, :4]), dtype=np.uint8).reshape(-1, FRAME_SIZE)
+    right = np.frombuffer(encode_many(commands[:, 4:]), dtype=np.uint8).reshape(-1, FRAME_SIZE)
+    return np.concatenate([left[:, :4], right[:, 4:]], axis=1).tobytes()
+
+
+@profiled("encode", count=lambda payload: len(payload) // FRAME_SIZE)
+def encode_commands(commands) -> bytes:
+    """(N, 4) または (N, 8) のコマンド配列を .jcr のペイロード（8バイト/フレーム）にする"""
+    return _encode_channels(_as_commands(commands))
+
+
+@profiled("write_jcr", count=None)
+def save_commands_to_jcr(commands, output_path: str, fps: int = 66,
+                         source_path: str = None, include_raw: bool = True, payload: bytes = None):
+    """
+    コマンド配列をエンコード済みの .jcr トラックとして書き出す。
+    commands は (N, 4) でモノラル、(N, 8) で左右別々（L の4列 + R の4列）として扱う。
+    payload に encode_commands の結果を渡すと、エンコードをやり直さない。
+    """
+    # エンコードは元の精度で行い、生コマンドだけ float32 で保存する
+    commands = _as_commands(commands)
+    channels = commands.shape[1] // 4
+
+    if payload is None:
+        payload = _encode_channels(commands)
+    source_hash = file_sha256(source_path) if source_path else bytes(32)
+
+    payload_offset = JCR_HEADER.size
+    raw_offset = payload_offset + len(payload) if include_raw else 0
+    flags = JCR_FLAG_RAW if include_raw else 0
+
+    with open(output_path, 'wb') as f:
+        f.write(JCR_HEADER.pack(
+            JCR_MAGIC, JCR_VERSION, JCR_HEADER.size, fps, len(commands),
+            channels, flags, source_hash, payload_offset, raw_offset,
+        ))
+        f.write(payload)
+        if include_raw:
+            f.write(commands.astype('<f4').tobytes())
+    print(f"JCRファイルを出力しました: {output_path} ({len(commands)} フレーム)")
+
+
+class RumbleTrack:
+    """
+    mmap した .jcr ファイル。frames はエンコード済みペイロード全体の memoryview で、
+    再生時はここから8バイトずつ切り出してそのままデバイスへ送る。
+    """
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        self._file = open(self.path, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"not a jcr file: {self.path}")
+
+        if len(self._mmap) < JCR_HEADER.size:
+            self.close()
+            raise ValueError(f"not a jcr file: {self.path}")
+        (magic, version, header_size, self.fps, self.frame_count,
+         self.channels, self.flags, self.source_hash,
+         payload_offset, raw_offset) = JCR_HEADER.unpack_from(self._mmap)
+        if magic != JCR_MAGIC:
+            self.close()
+            raise ValueError(f"not a jcr file: {self.path}")
+        if version != JCR_VERSION:
+            self.close()
+            raise ValueError(f"unsupported jcr version: {version}")
+
+        # 途中で切れたファイルを短いトラックとして再生しないよう、ヘッダの範囲を確かめる
+        size = len(self._mmap)
+        payload_end = payload_offset + self.frame_count * FRAME_SIZE
+        if payload_offset < JCR_HEADER.size or payload_end > size:
+            self.close()
+            raise ValueError(f"truncated jcr file: {self.path} (payload needs {payload_end} bytes, file has {size})")
+        if self.flags & JCR_FLAG_RAW:
+            raw_end = raw_offset + self.frame_count * 4 * self.channels * 4
+            if raw_offset < JCR_HEADER.size or raw_end > size:
+                self.close()
+                raise ValueError(f"truncated jcr file: {self.path} (raw commands need {raw_end} bytes, file has {size})")
+        self._view = memoryview(self._mmap)
+        self.frames = self._view[payload_offset:payload_end]
+
+        self.raw = None
+        if self.flags & JCR_FLAG_RAW:
+            self.raw = np.frombuffer(
+                self._mmap, dtype='<f4', count=self.frame_count * 4 * self.channels,
+                offset=raw_offset,
+            ).reshape(self.frame_count, 4 * self.channels)
+
+    def __len__(self):
+        return self.frame_count
+
+    def frame(self, i: int) -> memoryview:
+        return self.frames[i * FRAME_SIZE:(i + 1) * FRAME_SIZE]
+
+    def close(self):
+        # memoryview / ndarray が残っていると mmap を閉じられないので先に解放する
+        self.raw = None
+        if hasattr(self, "frames"):
+            self.frames.release()
+            self._view.release()
+            del self.frames, self._view
+        if hasattr(self, "_mmap"):
+            self._mmap.close()
+            del self._mmap
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def as_frames(commands) -> memoryview:
+    """
+    コマンド列または RumbleTrack を、8バイト/フレームの振動データ列として返す。
+    エンコード済みの振動データ（bytes / memoryview）はそのまま返す
+    """
+    # .jcr トラックはエンコード済みなので mmap 上のペイロードをそのまま使う
+    if isinstance(commands, RumbleTrack):
+        return commands.frames
+    if isinstance(commands, (bytes, bytearray, memoryview)):
+        return memoryview(commands)
+    return memoryview(encode_many(commands))
+
+
+def load_track(jcr_path: str) -> RumbleTrack:
+    track = RumbleTrack(jcr_path)
+    print(f"JCR読み込み完了: {track.frame_count} フレーム ({track.fps} fps)")
+    return track
+
+
+# ==========================================
+# CSV との相互変換
+# ==========================================
+def load_commands_from_csv(csv_path: str) -> list:
+    commands = []
+    with open(csv_path, 'r', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader)  # ヘッダー行をスキップ
+        for row in reader:
+            if len(row) == 4:
+                commands.append((float(row[0]), float(row[1]), float(row[2]), float(row[3])))
+    print(f"CSV読み込み完了: {len(commands)} フレーム")
+    return commands
+
+
+def csv_to_jcr(csv_path: str, jcr_path: str, fps: int = 66, source_path: str = None):
+    # CSV再生と同じく、4列でない行（空行など）は読み飛ばす
+    commands = np.array(load_commands_from_csv(csv_path), dtype=np.float64).reshape(-1, 4)  # 0行でも (0, 4)
+    save_commands_to_jcr(commands, jcr_path, fps=fps, source_path=source_path)
+
+
+def jcr_to_csv(jcr_path: str, csv_path: str):
+    with RumbleTrack(jcr_path) as track:
+        if track.raw is None:
+            raise ValueError(f"{jcr_path} has no raw commands to export")
+        if track.channels != CHANNELS_MONO:
+            raise ValueError("only mono tracks can be exported to the 4-column csv")
+        np.savetxt(csv_path, track.raw, fmt='%.9g', delimiter=',',
+                   header='hf_freq,hf_amp,lf_freq,lf_amp', comments='', encoding='utf-8')
+    print(f"CSVファイルを出力しました: {csv_path}")
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) != 3:
+        print("使い方: python jcr.py <入力.csv|入力.jcr> <出力.jcr|出力.csv>")
+        exit()
+
+    src, dst = Path(sys.argv[1]), Path(sys.argv[2])
+    if src.suffix == '.csv':
+        csv_to_jcr(str(src), str(dst))
+    else:
+        jcr_to_csv(str(src), str(dst))
@@ -0,0 +1,182 @@
+import argparse
+import contextlib
+import glob
+import io
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+# ==========================================
+# 音楽ライブラリの一括変換（MP3 → 骨格化 → 解析 → メディアンフィルタ → .jcr）
+# ==========================================
+AUDIO_SUFFIXES = (".mp3", ".wav", ".flac", ".ogg", ".m4a")
+
+
+def find_inputs(patterns: list) -> list:
+    """ディレクトリ（再帰的に探索）・glob・ファイルを受け取り、音声ファイルの一覧を返す"""
+    found = []
+    for pattern in patterns:
+        p = Path(pattern)
+        if p.is_dir():
+            candidates = sorted(p.rglob("*"))
+        else:
+            candidates = sorted(Path(m) for m in glob.glob(pattern, recursive=True))
+        for c in candidates:
+            if c.is_file() and c.suffix.lower() in AUDIO_SUFFIXES and c not in found:
+                found.append(c)
+    return found
+
+
+def output_path_for(input_path: Path, out_dir: Path, skeletonize: bool) -> Path:
+    # 単体スクリプトと同じ命名（hakujitu.mp3 → hakujitu_skeleton_commands.jcr）
+    stem = f"{input_path.stem}_skeleton" if skeletonize else input_path.stem
+    return (out_dir or input_path.parent) / f"{stem}_commands.jcr"
+
+
+def is_up_to_date(input_path: Path, output_path: Path) -> bool:
+    return output_path.exists() and output_path.stat().st_mtime >= input_path.stat().st_mtime
+
+
+def _init_worker(memory_limit_mb: int, use_cache: bool):
+    # 1ワーカー1コアで動かし、BLAS/FFT のスレッドでコアを奪い合わないようにする
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "NUMBA_NUM_THREADS"):
+        os.environ[var] = "1"
+    if not use_cache:
+        os.environ["JOYCON_CACHE"] = "0"
+    if memory_limit_mb:
+        try:
+            import resource
+        except ImportError:  # Windows
+            return
+        limit = memory_limit_mb * 1024 ** 2
+        resource.setrlimit(resource.RLIMIT_DATA, (limit, limit))
+
+
+def convert_one(input_path: str, output_path: str, engine: str = "stft",
+                skeletonize: bool = True, median_kernel: int = 5, fps: int = 66,
+                f0_method: str = "pyin", profile_path: str = None) -> dict:
+    """
+    1曲を変換する。ProcessPoolExecutor のワーカーで実行される。
+    profile_path を指定すると、段階ごとの計測結果をその JSON に書き出す
+    """
+    t0 = time.perf_counter()
+    log = io.StringIO()
+    try:
+        # 各段階の進捗表示は並列実行すると混ざるので捨てる
+        # 骨格化から解析まで配列のまま受け渡し、WAV の中間ファイルは作らない
+        with contextlib.redirect_stdout(log):
+            from pipeline import build_pipeline
+            import profiling
+
+            if profile_path:
+                profiling.enable()
+            try:
+                buf = build_pipeline(input_path, output_path, engine=engine, skeletonize=skeletonize,
+                                     median_kernel=median_kernel, fps=fps, f0_method=f0_method).run()
+            finally:
+                profiling.finish(profile_path)
+            commands = buf.commands
+    except MemoryError:
+        return {"ok": False, "error": "メモリ上限を超えました", "elapsed": time.perf_counter() - t0}
+    except Exception as e:
+        return {"ok": False, "error": f"{type(e).__name__}: {e}", "elapsed": time.perf_counter() - t0}
+
+    return {
+        "ok": True,
+        "frames": len(commands),
+        "audio_seconds": len(commands) / fps,
+        "elapsed": time.perf_counter() - t0,
+        "timings": buf.timings,
+    }
+
+
+def main(argv: list = None) -> int:
+    from mp3_to_command_noize import F0_METHODS
+
+    parser = argparse.ArgumentParser(
+        prog="joycon-convert",
+        description="音声ファイルを一括でJoy-Con用の振動トラック(.jcr)に変換します。",
+    )
+    parser.add_argument("inputs", nargs="+", help="音声ファイル・ディレクトリ・glob（例: 'music/**/*.mp3'）")
+    parser.add_argument("-o", "--out-dir", type=Path, default=None, help="出力先（省略時は入力と同じ場所）")
+    parser.add_argument("--engine", choices=("stft", "f0"), default="stft", help="解析エンジン")
+    parser.add_argument("--f0-method", choices=F0_METHODS, default="pyin",
+                        help="--engine f0 のときのF0推定方式（yin / hps は pyin より大幅に高速）")
+    parser.add_argument("--no-skeleton", action="store_true", help="骨格化（create_skeleton_audio）を行わない")
+    parser.add_argument("--median", type=int, default=5, help="メディアンフィルタのカーネルサイズ（0で無効）")
+    parser.add_argument("--fps", type=int, default=66)
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="並列ワーカー数")
+    parser.add_argument("--memory-limit-mb", type=int, default=0, help="ワーカー1つあたりのメモリ上限（0で無制限）")
+    parser.add_argument("--max-tasks-per-child", type=int, default=None,
+                        help="この曲数ごとにワーカーを作り直す（メモリの断片化対策）")
+    parser.add_argument("--no-cache", action="store_true", help="解析キャッシュを使わない")
+    parser.add_argument("--profile-dir", type=Path, default=None,
+                        help="曲ごとの計測結果（実時間・CPU時間・RSSの増減）を <曲名>.profile.json として書き出す")
+    parser.add_argument("-f", "--force", action="store_true", help="変換済みでも作り直す")
+    args = parser.parse_args(argv)
+
+    skeletonize = not args.no_skeleton
+    inputs = find_inputs(args.inputs)
+    if args.out_dir:
+        args.out_dir.mkdir(parents=True, exist_ok=True)
+    if args.profile_dir:
+        args.profile_dir.mkdir(parents=True, exist_ok=True)
+
+    tasks, skipped = [], 0
+    for input_path in inputs:
+        output_path = output_path_for(input_path, args.out_dir, skeletonize)
+        if not args.force and is_up_to_date(input_path, output_path):
+            skipped += 1
+            continue
+        tasks.append((input_path, output_path))
+
+    print(f"対象 {len(inputs)} 曲 / 変換済みのためスキップ {skipped} 曲 / 変換 {len(tasks)} 曲 "
+          f"(ワーカー {args.jobs})")
+    if not tasks:
+        return 0
+
+    pool_kwargs = {
+        "max_workers": args.jobs,
+        "initializer": _init_worker,
+        "initargs": (args.memory_limit_mb, not args.no_cache),
+    }
+    if args.max_tasks_per_child and sys.version_info >= (3, 11):
+        pool_kwargs["max_tasks_per_child"] = args.max_tasks_per_child
+
+    t0 = time.perf_counter()
+    done = failed = 0
+    audio_seconds = 0.0
+    with ProcessPoolExecutor(**pool_kwargs) as pool:
+        futures = {
+            pool.submit(convert_one, str(i), str(o), args.engine, skeletonize, args.median, args.fps,
+                        args.f0_method,
+                        str(args.profile_dir / f"{o.stem}.profile.json") if args.profile_dir else None): i
+            for i, o in tasks
+        }
+        for future in as_completed(futures):
+            name = futures[future].name
+            try:
+                result = future.result()
+            except Exception as e:  # ワーカーごと落ちた場合（BrokenProcessPool など）
+                result = {"ok": False, "error": f"{type(e).__name__}: {e}", "elapsed": 0.0}
+            done += 1
+            wall = time.perf_counter() - t0
+            if result["ok"]:
+                audio_seconds += result["audio_seconds"]
+                print(f"[{done}/{len(tasks)}] {name}: {result['frames']} フレーム "
+                      f"({result['elapsed']:.1f} s) | 処理速度 {audio_seconds / wall:.1f} 秒音声/秒, "
+                      f"{done / wall * 60:.1f} 曲/分")
+            else:
+                failed += 1
+                print(f"[{done}/{len(tasks)}] {name}: 失敗 - {result['error']}")
+
+    wall = time.perf_counter() - t0
+    print(f"完了: 成功 {done - failed} 曲 / 失敗 {failed} 曲 / {wall:.1f} s "
+          f"(音声 {audio_seconds / 60:.1f} 分, 実時間の x{audio_seconds / wall if wall else 0:.1f})")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,306 @@
+import argparse
+import threading
+import time
+import numpy as np
+import librosa
+import scipy.signal
+
+from fanout import STOP_FRAME
+from frameclock import wait_until
+from mp3_to_command_noize import pick_stft_peaks
+from rumble import encode_many
+
+# ==========================================
+# ライブ入力モード（マイク・ループバック → 振動）
+# ==========================================
+# 音声コールバック内で hop ごとに STFT のピーク抽出とエンコードを行い、
+# ロックフリーのリングバッファ経由で送信スレッドへ渡す。
+# 送信スレッドは常に最新のフレームを送り、溜まった古いフレームは捨てる（遅延を溜めない）。
+# HPSS は未来のサンプルを必要とするため、ライブモードでは行わない。
+
+
+class FrameRing:
+    """
+    書き手1つ・読み手1つ専用のロックフリーなリングバッファ。
+    _head は書き手だけ、_tail は読み手だけが更新する。
+    書き手はデータを書いてから _head を進めるので、読み手が書きかけのスロットを読むことはない。
+    """
+
+    def __init__(self, capacity: int = 16):
+        self.capacity = capacity
+        self._frames = bytearray(capacity * 8)
+        self._stamps = np.zeros(capacity)
+        self._head = 0  # 書き込んだ総フレーム数
+        self._tail = 0  # 読み終えた総フレーム数
+        self.overflows = 0
+
+    def put(self, frame: bytes, stamp: float) -> bool:
+        """満杯なら書かずに False を返す（コールバックを待たせない）"""
+        head = self._head
+        if head - self._tail >= self.capacity:
+            self.overflows += 1
+            return False
+        slot = head % self.capacity
+        self._frames[slot * 8:(slot + 1) * 8] = frame
+        self._stamps[slot] = stamp
+        self._head = head + 1
+        return True
+
+    def take_latest(self):
+        """最新の未読フレームを (frame, stamp, 読み飛ばした数) で返す。無ければ None"""
+        head = self._head
+        if head == self._tail:
+            return None
+        slot = (head - 1) % self.capacity
+        frame = bytes(self._frames[slot * 8:(slot + 1) * 8])
+        stamp = self._stamps[slot]
+        skipped = head - 1 - self._tail
+        self._tail = head
+        return frame, stamp, skipped
+
+
+class SampleRing:
+    """
+    直近 capacity 個の計測値だけを残す固定長のバッファ。
+    配列は最初に確保し、append は要素への代入だけなので、長時間動かしても増えない。
+    """
+
+    def __init__(self, capacity: int):
+        self._values = np.zeros(capacity)
+        self.count = 0  # これまでに追加した総数
+
+    def append(self, value: float):
+        self._values[self.count % len(self._values)] = value
+        self.count += 1
+
+    def values(self) -> np.ndarray:
+        """残っている値（順序は問わない集計用）"""
+        return self._values[:min(self.count, len(self._values))]
+
+
+class StreamingSTFT:
+    """
+    入力ブロックを受け取り、hop_length サンプルごとに直近 n_fft サンプルの振幅スペクトルを返す。
+    ブロックの大きさは任意（hop の途中で区切れていてもよい）。
+    """
+
+    def __init__(self, hop_length: int, n_fft: int = 2048):
+        self.hop_length = hop_length
+        self.n_fft = n_fft
+        self.window = scipy.signal.get_window('hann', n_fft, fftbins=True)  # librosa.stft と同じ窓
+        self._history = np.zeros(n_fft, dtype=np.float32)
+        self._count = 0
+
+    def feed(self, block: np.ndarray) -> (np.ndarray, np.ndarray):
+        """(振幅スペクトル (ビン数, hop数), ブロック内で各hopが終わる位置) を返す"""
+        n = len(block)
+        data = np.concatenate([self._history, block])
+        first = -self._count % self.hop_length or self.hop_length
+        ends = np.arange(first, n + 1, self.hop_length)
+        self._history = data[-self.n_fft:]
+        self._count += n
+
+        if len(ends) == 0:
+            return np.zeros((self.n_fft // 2 + 1, 0)), ends
+        windows = np.lib.stride_tricks.sliding_window_view(data, self.n_fft)[ends]
+        magnitude = np.abs(np.fft.rfft(windows * self.window, axis=1)).T
+        return magnitude, ends
+
+
+class LiveRumble:
+    """
+    callback を sounddevice.InputStream のコールバックとして渡す。
+    WAVファイルを feed_wav で同じコールバックに流せば、実機やマイク無しで試せる。
+    送信に失敗したデバイス（切断など）は外し、残りのデバイスへの送信を続ける。
+    """
+
+    def __init__(self, joycons: list, samplerate: int, fps: int = 66, n_fft: int = 2048,
+                 gain: float = 1.0, ring_frames: int = 16, stats_samples: int = 8192):
+        self.joycons = joycons
+        self.samplerate = samplerate
+        self.fps = fps
+        self.gain = gain
+        self.stft = StreamingSTFT(int(samplerate / fps), n_fft)
+        self.frequencies = librosa.fft_frequencies(sr=samplerate, n_fft=n_fft)
+        self.ring = FrameRing(ring_frames)
+
+        self._wake = threading.Event()
+        self._running = False
+        self._sender = None
+
+        self.produced = 0
+        self.skipped = 0
+        self.input_overflows = 0
+        self.errors = []  # 外したデバイスと例外の (joycon, error)
+        # 遅延・コールバック時間は直近 stats_samples 回分だけ残す
+        self.latencies = SampleRing(stats_samples)
+        self.callback_times = SampleRing(stats_samples)
+
+    # --- 音声スレッド側 ---
+    def callback(self, indata, frames, time_info, status):
+        arrived = time.perf_counter()
+        if status:
+            self.input_overflows += 1
+        block = indata[:, 0] if indata.ndim == 2 else indata
+        magnitude, ends = self.stft.feed(np.asarray(block, dtype=np.float32) * self.gain)
+        if len(ends):
+            frames_bytes = encode_many(pick_stft_peaks(magnitude, self.frequencies))
+            for k, end in enumerate(ends):
+                # hop の最後のサンプルが届いた時刻（ブロックの到着時刻から逆算）
+                captured = arrived - (frames - end) / self.samplerate
+                self.ring.put(frames_bytes[k * 8:(k + 1) * 8], captured)
+            self.produced += len(ends)
+            self._wake.set()
+        self.callback_times.append(time.perf_counter() - arrived)
+
+    # --- 送信スレッド側 ---
+    def _send_loop(self):
+        while self._running:
+            self._wake.clear()
+            item = self.ring.take_latest()
+            if item is None:
+                self._wake.wait(0.05)
+                continue
+            frame, captured, skipped = item
+            self.skipped += skipped
+            self._send_all(frame)
+            self.latencies.append(time.perf_counter() - captured)
+        self._send_all(STOP_FRAME)
+
+    def _send_all(self, frame):
+        failed = []
+        for jc in self.joycons:
+            try:
+                jc.send_rumble_data(frame)
+            except OSError as e:
+                # デバイスが切断された。このデバイスだけ外し、他のデバイスは鳴らし続ける
+                self.errors.append((jc, e))
+                failed.append(jc)
+        if failed:
+            self.joycons = [jc for jc in self.joycons if not any(jc is f for f in failed)]
+
+    def start(self):
+        self._running = True
+        self._sender = threading.Thread(target=self._send_loop, daemon=True)
+        self._sender.start()
+
+    def stop(self):
+        self._running = False
+        self._wake.set()
+        if self._sender is not None:
+            self._sender.join()
+
+    def stats(self) -> dict:
+        latency = self.latencies.values() * 1000.0
+        callback = self.callback_times.values() * 1000.0
+        return {
+            "frames": self.produced,
+            "sent": self.latencies.count,
+            "dropped": self.skipped + self.ring.overflows,
+            "input_overflows": self.input_overflows,
+            "latency_mean_ms": float(latency.mean()) if len(latency) else 0.0,
+            "latency_p99_ms": float(np.percentile(latency, 99)) if len(latency) else 0.0,
+            "latency_max_ms": float(latency.max()) if len(latency) else 0.0,
+            "callback_p99_ms": float(np.percentile(callback, 99)) if len(callback) else 0.0,
+        }
+
+    def print_summary(self, input_latency: float = 0.0):
+        s = self.stats()
+        print(f"フレーム {s['frames']} / 送信 {s['sent']} / 破棄 {s['dropped']} / 入力オーバーフロー {s['input_overflows']}")
+        print(f"遅延(入力→送信完了): 平均 {s['latency_mean_ms']:.2f} ms / p99 {s['latency_p99_ms']:.2f} ms / "
+              f"最大 {s['latency_max_ms']:.2f} ms / コールバック処理 p99 {s['callback_p99_ms']:.3f} ms")
+        for jc, error in self.errors:
+            print(f"{getattr(jc, 'serial', None) or 'デバイス'}: 送信に失敗したため外しました ({error})。")
+        if input_latency:
+            print(f"（これに加えてオーディオ入力の遅延 {input_latency * 1000:.1f} ms）")
+
+
+def feed_wav(live: LiveRumble, path: str, block_size: int = 256, realtime: bool = True):
+    """WAVファイルを block_size サンプルずつ live.callback に流す（realtime なら実時間で）"""
+    import soundfile as sf
+
+    with sf.SoundFile(path) as f:
+        if f.samplerate != live.samplerate:
+            raise ValueError(f"サンプリング周波数が一致しません: {f.samplerate} != {live.samplerate}")
+        start = time.perf_counter()
+        done = 0
+        for block in f.blocks(blocksize=block_size, dtype='float32', always_2d=True):
+            done += len(block)
+            if realtime:
+                wait_until(start + done / live.samplerate)
+            live.callback(block.mean(axis=1, keepdims=True), len(block), None, None)
+
+
+def run_live(joycons: list, device=None, samplerate: int = None, fps: int = 66,
+             block_size: int = 256, gain: float = 1.0, seconds: float = None) -> LiveRumble:
+    """マイク（またはループバック/モニター入力）から振動させる。Ctrl+C か seconds 秒で終了"""
+    import sounddevice as sd
+
+    if samplerate is None:
+        samplerate = int(sd.query_devices(device, 'input')['default_samplerate'])
+    live = LiveRumble(joycons, samplerate, fps=fps, gain=gain)
+    live.start()
+    input_latency = 0.0
+    try:
+        with sd.InputStream(device=device, channels=1, samplerate=samplerate, blocksize=block_size,
+                            latency='low', dtype='float32', callback=live.callback) as stream:
+            print(f"ライブ入力を開始します（{samplerate} Hz, ブロック {block_size} サンプル）。Ctrl+C で終了。")
+            input_latency = stream.latency
+            if seconds:
+                time.sleep(seconds)
+            else:
+                while True:
+                    time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        live.stop()
+    live.print_summary(input_latency=input_latency)
+    return live
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="マイク・ループバック入力をリアルタイムにJoy-Conの振動へ変換します。")
+    parser.add_argument("--device", default=None, help="入力デバイス（番号または名前。省略時は既定の入力）")
+    parser.add_argument("--wav", default=None, help="入力の代わりにWAVファイルを流す（オフライン確認用）")
+    parser.add_argument("--fake", action="store_true", help="Joy-Conの代わりにシミュレーターへ送る")
+    parser.add_argument("--gain", type=float, default=1.0)
+    parser.add_argument("--block-size", type=int, default=256)
+    parser.add_argument("--seconds", type=float, default=None)
+    parser.add_argument("--fps", type=int, default=66)
+    args = parser.parse_args()
+
+    from main import AudioJoyCon
+    if args.fake:
+        from pyjoycon import SimulatedJoyCon
+        from pyjoycon.constants import JOYCON_VENDOR_ID
+        # hid.write に 2 ms かかる Joy-Con として振る舞う
+        sim = SimulatedJoyCon(write_latency=0.002)
+        joycons = [AudioJoyCon(JOYCON_VENDOR_ID, sim.product_id, transport=sim)]
+    else:
+        from pyjoycon import DeviceRegistry
+        from pyjoycon.constants import JOYCON_L_PRODUCT_ID, JOYCON_PRODUCT_IDS
+        registry = DeviceRegistry(product_ids=JOYCON_PRODUCT_IDS)
+        added, _ = registry.refresh()  # 列挙は1回だけ
+        # L を先に。パスで開くので、シリアルを返さないJoy-Conが複数あっても別々に開ける
+        added.sort(key=lambda device: device[0][1] != JOYCON_L_PRODUCT_ID)
+        joycons = [AudioJoyCon(*ids, path=path) for ids, path in added]
+        if not joycons:
+            print("エラー: Joy-Conが見つかりません。（--fake でシミュレーターを使えます）")
+            exit()
+
+    device = int(args.device) if args.device and args.device.isdigit() else args.device
+    if args.wav:
+        import soundfile as sf
+        live = LiveRumble(joycons, sf.info(args.wav).samplerate, fps=args.fps, gain=args.gain)
+        live.start()
+        try:
+            feed_wav(live, args.wav, block_size=args.block_size)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            live.stop()
+        live.print_summary()
+    else:
+        run_live(joycons, device=device, fps=args.fps, block_size=args.block_size,
+                 gain=args.gain, seconds=args.seconds)
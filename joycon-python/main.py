@@ -1,53 +1,17 @@
 import time
-import math
-import csv
 from pathlib import Path
 from pyjoycon import JoyCon
-from pyjoycon.device import get_L_id, get_R_id
+from pyjoycon import DeviceRegistry
+from pyjoycon.constants import JOYCON_L_PRODUCT_ID, JOYCON_PRODUCT_IDS
+from rumble import encode_joycon_rumble
+from jcr import RumbleTrack, as_frames, load_commands_from_csv, load_track
+from fanout import Fanout, play_tracks_on_joycons
+from frameclock import FrameClock, POLICY_CATCHUP
+import profiling
+from telemetry import PlaybackTelemetry
 
 # ==========================================
-# 1. データ変換ロジック
-# ==========================================
-def encode_joycon_rumble(hf_freq: float, hf_amp: float, lf_freq: float, lf_amp: float) -> bytes:
-    if hf_amp == 0.0 and lf_amp == 0.0:
-        return b'\x00\x01\x40\x40'
- 
-    hf_freq = max(0.0, min(1252.0, hf_freq))
-    lf_freq = max(0.0, min(1252.0, lf_freq))
-    hf_amp  = max(0.0, min(1.0, hf_amp))
-    lf_amp  = max(0.0, min(1.0, lf_amp))
-
-    encoded_hex_freq_hf = int(round(math.log2(hf_freq / 10.0) * 32.0)) if hf_freq >= 10.0 else 0
-    hf = (encoded_hex_freq_hf - 0x60) * 4
-
-    encoded_hex_amp_hf = _encode_amplitude(hf_amp)
-    hf_amp_byte = encoded_hex_amp_hf * 2
-
-    encoded_hex_freq_lf = int(round(math.log2(lf_freq / 10.0) * 32.0)) if lf_freq >= 10.0 else 0
-    lf = encoded_hex_freq_lf - 0x40
-
-    encoded_hex_amp_lf = _encode_amplitude(lf_amp)
-    lf_amp_byte = (encoded_hex_amp_lf // 2) + 64
-    byte0 = hf & 0xFF
-    byte1 = (hf_amp_byte + ((hf >> 8) & 0xFF)) & 0xFF
-    byte2 = (lf + ((lf_amp_byte >> 8) & 0xFF)) & 0xFF
-    byte3 = lf_amp_byte & 0xFF
-
-    return bytes([byte0, byte1, byte2, byte3])
-
-def _encode_amplitude(amp: float) -> int:
-    if amp == 0.0:
-        return 0
-    elif amp > 0.23:
-        return int(round(math.log2(amp * 8.7) * 32.0))
-    elif amp > 0.12:
-        return int(round(math.log2(amp * 17.0) * 16.0))
-    else:
-        val = int(round(math.log2(amp * 120.0) * 8.0))
-        return max(0, val)
-
-# ==========================================
-# 2. カスタムJoyConクラス
+# 1. カスタムJoyConクラス
 # ==========================================
 class AudioJoyCon(JoyCon):
     def send_rumble_data(self, rumble_bytes: bytes):
@@ -57,98 +21,138 @@ class AudioJoyCon(JoyCon):
         self._RUMBLE_DATA = rumble_bytes
         self._write_output_report(b'\x10', b'', b'')
 
-def load_commands_from_csv(csv_path: str) -> list:
-    commands = []
-    with open(csv_path, 'r', encoding='utf-8') as f:
-        reader = csv.reader(f)
-        next(reader) # ヘッダー行をスキップ
-        for row in reader:
-            if len(row) == 4:
-                commands.append((float(row[0]), float(row[1]), float(row[2]), float(row[3])))
-    print(f"CSV読み込み完了: {len(commands)} フレーム")
-    return commands
-
-def play_audio_on_joycon(joycon: AudioJoyCon, commands: list, fps: int = 66):
-    frame_duration = 1.0 / fps
-    
-    print("再生を開始します...")
-    start_time = time.perf_counter() 
-
-    for i, cmd in enumerate(commands):
-        hf_f, hf_a, lf_f, lf_a = cmd
-        single_motor_data = encode_joycon_rumble(hf_f, hf_a, lf_f, lf_a)
-        joycon.send_rumble_data(single_motor_data + single_motor_data)
+def play_audio_on_joycon(joycon: AudioJoyCon, commands: list, fps: int = 66,
+                         policy: str = POLICY_CATCHUP, telemetry: bool = False) -> PlaybackTelemetry:
+    """telemetry=True なら、フレームごとの予定時刻と書き込み時刻を記録して返す"""
+    frames = as_frames(commands)
+    num_frames = len(frames) // 8
+    clock = FrameClock(fps, policy=policy)
+
+    recorder = None
+    if telemetry:
+        recorder = PlaybackTelemetry(num_frames, fps, max_devices=1)
+        device = recorder.add_device(getattr(joycon, "serial", None))
+        # 送信ループでは確保済みの行に代入するだけ
+        scheduled = recorder.scheduled[device]
+        write_start = recorder.write_start[device]
+        write_end = recorder.write_end[device]
 
-        # 2. 次のフレームの開始予定時刻を計算
-        next_frame_time = start_time + (i + 1) * frame_duration
-        
-        # 3. 予定時刻が来るまで待機
-        while time.perf_counter() < next_frame_time:
-            pass
+    print("再生を開始します...")
+    # 予定時刻の直前まではスリープし、CPUを占有しないように待機
+    with profiling.span("playback", count=num_frames, devices=1):
+        for i in clock.ticks(num_frames):
+            start = time.perf_counter()
+            joycon.send_rumble_data(frames[i * 8:(i + 1) * 8])
+            end = time.perf_counter()
+            if recorder is not None:
+                scheduled[i] = clock.deadlines[i]
+                write_start[i] = start
+                write_end[i] = end
 
     print("再生完了。振動を停止します。")
+    clock.print_summary()
+    if recorder is not None:
+        recorder.print_summary()
     stop_data = encode_joycon_rumble(0.0, 0.0, 0.0, 0.0)
     joycon.send_rumble_data(stop_data + stop_data)
+    return recorder
 
-def play_audio_on_joycons(joycons: list, commands: list, fps: int = 66):
-    frame_duration = 1.0 / fps
-    
+def play_audio_on_joycons(joycons: list, commands: list, fps: int = 66,
+                          policy: str = POLICY_CATCHUP, telemetry: bool = False) -> PlaybackTelemetry:
+    """telemetry=True なら、全デバイス分の行を持つ PlaybackTelemetry を返す（行の順は joycons の順）"""
     print(f"再生を開始します... (同期デバイス数: {len(joycons)}台)")
-    start_time = time.perf_counter() 
-
-    for i, cmd in enumerate(commands):
-        hf_f, hf_a, lf_f, lf_a = cmd
-        single_motor_data = encode_joycon_rumble(hf_f, hf_a, lf_f, lf_a)
-        full_data = single_motor_data + single_motor_data
-
-        # 接続されているすべてのJoy-Conに、タイムラグを最小限に抑えて連続送信
-        for jc in joycons:
-            jc.send_rumble_data(full_data)
-
-        # 次のフレームの開始予定時刻を計算
-        next_frame_time = start_time + (i + 1) * frame_duration
-        
-        # 予定時刻が来るまでビジーウェイト
-        while time.perf_counter() < next_frame_time:
-            pass
-
-    print("再生完了。すべての振動を停止します。")
-    stop_data = encode_joycon_rumble(0.0, 0.0, 0.0, 0.0)
-    for jc in joycons:
-        jc.send_rumble_data(stop_data + stop_data)
+    # デバイスごとの送信スレッドへ同じトラックを配り、1台の遅れが他を巻き込まないようにする
+    # （エンコードは1回だけ）
+    frames = as_frames(commands)
+    writers = play_tracks_on_joycons([(jc, frames) for jc in joycons], fps=fps, policy=policy,
+                                     telemetry=telemetry)
+    print("再生完了。すべての振動を停止しました。")
+    # 送信スレッドはすべて同じ PlaybackTelemetry の、それぞれの行に記録している
+    return next((w.telemetry for w in writers if w.telemetry is not None), None)
 
 if __name__ == '__main__':
     script_dir = Path(__file__).parent
+    jcr_path = script_dir / "hakujitu_skeleton_commands.jcr"
     csv_path = script_dir / "hakujitu_skeleton_commands.csv"
 
-    if not csv_path.exists():
-        print(f"エラー: {csv_path} が見つかりません。")
+    # エンコード済みの .jcr があれば優先し、無ければ従来のCSVを読む
+    if jcr_path.exists():
+        audio_commands = load_track(str(jcr_path))
+    elif csv_path.exists():
+        audio_commands = load_commands_from_csv(str(csv_path))
+    else:
+        print(f"エラー: {jcr_path} / {csv_path} が見つかりません。")
         exit()
 
-    audio_commands = load_commands_from_csv(str(csv_path))
+    fps = audio_commands.fps if isinstance(audio_commands, RumbleTrack) else 66
 
-    # --- 論理的なデバイス検出と初期化 ---
-    active_joycons = []
-    
-    l_id = get_L_id()
-    if None not in l_id:
-        active_joycons.append(AudioJoyCon(*l_id))
-        print("左Joy-Con(L) の接続を確立しました。")
-        
-    r_id = get_R_id()
-    if None not in r_id:
-        active_joycons.append(AudioJoyCon(*r_id))
-        print("右Joy-Con(R) の接続を確立しました。")
+    # ★ Joy-Conごとに別のトラックを鳴らす場合はここで指定（None なら共通トラック）
+    TRACK_L = None  # 例: script_dir / "bass_commands.jcr"
+    TRACK_R = None  # 例: script_dir / "melody_commands.jcr"
+
+    # ★ 再生ループの計測結果の出力先（None なら計測しない）
+    PROFILE_REPORT = None  # 例: script_dir / "playback_profile.json"
+    PROFILE_TRACE = None   # 例: script_dir / "playback_trace.json"（chrome://tracing で開く）
+    if PROFILE_REPORT or PROFILE_TRACE:
+        profiling.enable()
+
+    # ★ フレームごとの送信時刻の保存先（None なら記録しない。python telemetry.py <ファイル> で集計）
+    TELEMETRY_PATH = None  # 例: script_dir / "playback_telemetry.npz"
 
+    # エンコードは1回だけ行い、各デバイスの送信スレッドには振動データをそのまま渡す
+    audio_frames = as_frames(audio_commands)
+    tracks = {
+        "L": as_frames(load_track(str(TRACK_L))) if TRACK_L else audio_frames,
+        "R": as_frames(load_track(str(TRACK_R))) if TRACK_R else audio_frames,
+    }
+
+    # --- 論理的なデバイス検出と初期化 ---
+    # 列挙は1回だけ行い、再生中の抜き差しは DeviceRegistry の監視スレッドで拾う
+    registry = DeviceRegistry(product_ids=JOYCON_PRODUCT_IDS)
+    fanout = Fanout(fps, telemetry=TELEMETRY_PATH is not None)
+    # HIDのパス -> AudioJoyCon（シリアルを返さないJoy-Conが複数あっても区別できる）
+    active_joycons = {}
+
+    @registry.on_added
+    def connect_joycon(ids, path):
+        side = "L" if ids[1] == JOYCON_L_PRODUCT_ID else "R"
+        try:
+            jc = AudioJoyCon(*ids, path=path)
+        except (OSError, IOError) as e:
+            print(f"Joy-Con({side}) {ids[2] or path} に接続できませんでした: {e}")
+            return
+        active_joycons[path] = jc
+        fanout.add(jc, tracks[side])
+        print(f"Joy-Con({side}) {ids[2] or path} の接続を確立しました。")
+
+    @registry.on_removed
+    def disconnect_joycon(ids, path):
+        jc = active_joycons.pop(path, None)
+        if jc is not None:
+            fanout.remove(jc)
+            print(f"Joy-Con {ids[2] or path} が切断されました。")
+
+    registry.refresh()
     if not active_joycons:
         print("エラー: 制御可能なJoy-Conが見つかりません。Bluetoothのペアリング状態を確認してください。")
         exit()
 
+    num_frames = max(len(frames) // 8 for frames in tracks.values())
+    registry.watch()
     try:
-        # 検出されたすべてのJoy-Conをリストとして渡す
-        play_audio_on_joycons(active_joycons, audio_commands, fps=66)
+        # 検出されたすべてのJoy-Conを、それぞれの送信スレッドから同期して鳴らす
+        print(f"再生を開始します... (同期デバイス数: {len(active_joycons)}台)")
+        fanout.play(num_frames)
+        registry.stop()
+        fanout.print_summary()
+        print("再生完了。すべての振動を停止しました。")
     except KeyboardInterrupt:
+        registry.stop()
         print("\nユーザーによって中断されました。すべての振動を強制停止します。")
         stop_data = encode_joycon_rumble(0.0, 0.0, 0.0, 0.0)
-        for jc in active_joycons:
-            jc.send_rumble_data(stop_data + stop_data)
\ No newline at end of file
+        for jc in list(active_joycons.values()):
+            jc.send_rumble_data(stop_data + stop_data)
+    finally:
+        profiling.finish(PROFILE_REPORT, PROFILE_TRACE)
+        if fanout.telemetry is not None:
+            fanout.telemetry.save(str(TELEMETRY_PATH))
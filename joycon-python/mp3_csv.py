@@ -2,52 +2,36 @@ import numpy as np
 import librosa
 import csv
 from pathlib import Path
- 
-def analyze_audio_for_joycon_dsp(file_path: str, fps: int = 66) -> list:
-    print(f"[{file_path}] の処理開始")
+from mp3_to_command_noize import _band, _band_peaks
+from analysis_cache import cached_stft_magnitude
 
-    y, sr = librosa.load(file_path, sr=None, mono=True)
-    
-    # 2. HPSS（調波・打楽器音分離）の実行
-    print("打楽器成分（ノイズ）の分離フィルターを適用中...")
-    y_harmonic, y_percussive = librosa.effects.hpss(y, margin=1.2)
-    
-    # 3. STFT解析（打楽器が除去されたクリーンな y_harmonic を使用）
-    print("純粋なメロディ成分のFFT解析を実行中...")
-    hop_length = int(sr / fps)
-    stft_matrix = np.abs(librosa.stft(y_harmonic, hop_length=hop_length))
-    frequencies = librosa.fft_frequencies(sr=sr)
-    
+def _pick_dsp_peaks(stft_matrix: np.ndarray, frequencies: np.ndarray) -> np.ndarray:
     # 余計な高音域はモーターの追従を妨げるため、上限を1000Hzに制限
-    lf_mask = (frequencies >= 40.0) & (frequencies < 160.0)
-    hf_mask = (frequencies >= 160.0) & (frequencies <= 1250.0)
-    
-    commands = []
+    lf_band = _band(frequencies, (frequencies >= 40.0) & (frequencies < 160.0))
+    hf_band = _band(frequencies, (frequencies >= 160.0) & (frequencies <= 1250.0))
     
-    for t in range(stft_matrix.shape[1]):
-        frame = stft_matrix[:, t]
-        lf_spectrum = frame[lf_mask]
-        if len(lf_spectrum) > 0 and np.max(lf_spectrum) > 0.05:
-            lf_idx = np.argmax(lf_spectrum)
-            lf_freq = frequencies[lf_mask][lf_idx]
-            lf_amp = float(np.max(lf_spectrum))
-        else:
-            lf_freq, lf_amp = 0.0, 0.0
+    # 帯域ごとのピーク抽出を全フレームまとめて行う
+    lf_freq, lf_amp = _band_peaks(stft_matrix, frequencies, lf_band)
+    hf_freq, hf_amp = _band_peaks(stft_matrix, frequencies, hf_band)
 
-        hf_spectrum = frame[hf_mask]
-        if len(hf_spectrum) > 0 and np.max(hf_spectrum) > 0.05:
-            hf_idx = np.argmax(hf_spectrum)
-            hf_freq = frequencies[hf_mask][hf_idx]
-            hf_amp = float(np.max(hf_spectrum))
-        else:
-            hf_freq, hf_amp = 0.0, 0.0
-            
-        lf_amp = min(1.0, lf_amp / 100.0) 
-        hf_amp = min(1.0, hf_amp / 5.0)
-        if hf_amp > 0.3:
-            lf_amp = lf_amp * 0.2
+    lf_amp = np.minimum(1.0, lf_amp / 100.0)
+    hf_amp = np.minimum(1.0, hf_amp / 5.0)
+    # 高音が大きいフレームでは低音を抑える
+    lf_amp = np.where(hf_amp > 0.3, lf_amp * 0.2, lf_amp)
 
-        commands.append((float(hf_freq), float(hf_amp), float(lf_freq), float(lf_amp)))
+    commands = np.stack([hf_freq, hf_amp, lf_freq, lf_amp], axis=1).astype(np.float32)
+    return commands
+
+def analyze_audio_for_joycon_dsp(file_path: str, fps: int = 66) -> np.ndarray:
+    print(f"[{file_path}] の処理開始")
+
+    # デコード・HPSS・STFT は解析キャッシュがあれば再計算しない（sr もキャッシュのメタデータから取る）
+    # 2. HPSS（調波・打楽器音分離）→ 3. STFT解析（打楽器が除去されたクリーンな調波成分を使用）
+    print("打楽器成分（ノイズ）の分離とメロディ成分のFFT解析を実行中...")
+    stft_matrix, sr = cached_stft_magnitude(file_path, margin=1.2, fps=fps)
+    frequencies = librosa.fft_frequencies(sr=sr)
+    
+    commands = _pick_dsp_peaks(stft_matrix, frequencies)
         
     print(f"解析終了: 合計 {len(commands)} frames")
     return commands
@@ -3,62 +3,121 @@ import librosa
 import csv
 import scipy.signal  # メディアンフィルタ用に追加
 from pathlib import Path
+from jcr import save_commands_to_jcr
+from audio_stream import audio_info, stream_harmonic
+from analysis_cache import cached_harmonic, cached_stft_magnitude, default_cache
+import pitch
+import profiling
+from profiling import profiled, span
 
 # ==========================================
 # エンジン1：STFT解析（旧方式・高速・全音域抽出）
 # ==========================================
-def analyze_with_stft(file_path: str, fps: int = 66) -> list:
+def _band(frequencies: np.ndarray, band_mask: np.ndarray) -> slice:
+    # fft_frequencies は昇順なので、帯域のマスクは連続した範囲になる
+    idx = np.flatnonzero(band_mask)
+    return slice(idx[0], idx[-1] + 1) if len(idx) else slice(0, 0)
+
+def _band_peaks(stft_matrix: np.ndarray, frequencies: np.ndarray, band: slice,
+                threshold: float = 0.05) -> (np.ndarray, np.ndarray):
+    """
+    帯域内のピーク周波数と振幅を全フレーム分まとめて求める。
+    ピークが閾値以下のフレームは周波数・振幅とも 0 になる。
+    """
+    num_frames = stft_matrix.shape[1]
+    band_spectrum = stft_matrix[band]
+    if band_spectrum.shape[0] == 0:
+        return np.zeros(num_frames), np.zeros(num_frames)
+    peak_idx = np.argmax(band_spectrum, axis=0)
+    peak_amp = band_spectrum[peak_idx, np.arange(num_frames)]
+    active = peak_amp > threshold
+    return (
+        np.where(active, frequencies[band][peak_idx], 0.0),
+        np.where(active, peak_amp.astype(np.float64), 0.0),
+    )
+
+@profiled("peaks")
+def pick_stft_peaks(stft_matrix: np.ndarray, frequencies: np.ndarray) -> np.ndarray:
+    """振幅スペクトル (ビン数, フレーム数) の各フレームから帯域ごとのピークを取り、コマンド列 (フレーム数, 4) を返す"""
+    lf_band = _band(frequencies, (frequencies >= 40.0) & (frequencies < 160.0))
+    hf_band = _band(frequencies, (frequencies >= 160.0) & (frequencies <= 1000.0))
+
+    lf_f, lf_a = _band_peaks(stft_matrix, frequencies, lf_band)
+    hf_f, hf_a = _band_peaks(stft_matrix, frequencies, hf_band)
+
+    commands = np.empty((stft_matrix.shape[1], 4), dtype=np.float32)
+    commands[:, 0] = hf_f
+    commands[:, 1] = np.minimum(1.0, hf_a / 10.0)
+    commands[:, 2] = lf_f
+    commands[:, 3] = np.minimum(1.0, lf_a / 80.0)
+    return commands
+
+@profiled("analyze_stft")
+def stft_commands(y_harmonic: np.ndarray, sr: int, fps: int = 66) -> np.ndarray:
+    """analyze_with_stft の配列版。y_harmonic は HPSS 済みの信号"""
+    stft_matrix = np.abs(librosa.stft(y_harmonic, hop_length=int(sr / fps)))
+    return pick_stft_peaks(stft_matrix, librosa.fft_frequencies(sr=sr))
+
+@profiled("analyze_stft")
+def analyze_with_stft(file_path: str, fps: int = 66) -> np.ndarray:
     print(f"[{file_path}] のSTFT解析(高速・ピーク抽出)を開始します...")
-    y, sr = librosa.load(file_path, sr=None, mono=True)
-    
-    y_harmonic, _ = librosa.effects.hpss(y, margin=1.2)
-    
-    hop_length = int(sr / fps)
-    stft_matrix = np.abs(librosa.stft(y_harmonic, hop_length=hop_length))
+    # デコード・HPSS・STFT はキャッシュがあれば再計算しない（sr もキャッシュのメタデータから取る）
+    stft_matrix, sr = cached_stft_magnitude(file_path, margin=1.2, fps=fps)
     frequencies = librosa.fft_frequencies(sr=sr)
     
-    lf_mask = (frequencies >= 40.0) & (frequencies < 160.0)
-    hf_mask = (frequencies >= 160.0) & (frequencies <= 1000.0)
-    
-    commands = []
-    for t in range(stft_matrix.shape[1]):
-        frame = stft_matrix[:, t]
-        
-        lf_spectrum = frame[lf_mask]
-        if len(lf_spectrum) > 0 and np.max(lf_spectrum) > 0.05:
-            lf_f = float(frequencies[lf_mask][np.argmax(lf_spectrum)])
-            lf_a = min(1.0, float(np.max(lf_spectrum)) / 80.0)
-        else:
-            lf_f, lf_a = 0.0, 0.0
-            
-        hf_spectrum = frame[hf_mask]
-        if len(hf_spectrum) > 0 and np.max(hf_spectrum) > 0.05:
-            hf_f = float(frequencies[hf_mask][np.argmax(hf_spectrum)])
-            hf_a = min(1.0, float(np.max(hf_spectrum)) / 10.0)
-        else:
-            hf_f, hf_a = 0.0, 0.0
-            
-        commands.append((hf_f, hf_a, lf_f, lf_a))
+    commands = pick_stft_peaks(stft_matrix, frequencies)
         
     print(f"STFT解析完了: {len(commands)} frames")
     return commands
 
 # ==========================================
-# エンジン2：F0推定（新方式・高精度・メロディ特化・オートスケーリング付き）
+# エンジン1'：STFT解析のストリーミング版（長時間の音声向け）
 # ==========================================
-def analyze_with_f0(file_path: str, fps: int = 66) -> list:
-    print(f"[{file_path}] のF0推定(高精度・メロディ抽出)を開始します...")
-    y, sr = librosa.load(file_path, sr=None, mono=True)
+def analyze_with_stft_stream(file_path: str, fps: int = 66, chunk_frames: int = 1024):
+    """
+    analyze_with_stft と同じ解析を chunk_frames フレームずつ行い、
+    ブロックごとのコマンド配列 (n, 4) を順に返すジェネレータ。
+    ファイル全体を読み込まないため、メモリ使用量は曲の長さによらず一定になる。
+
+    HPSS は一括処理と同じ STFT の格子に揃えた余白付きブロックで行うため、
+    結果は一括処理と一致する。許容誤差は振幅 1e-6 以内・ピーク周波数は完全一致とする
+    （benchmark.py の stream で確認）。
+    """
+    print(f"[{file_path}] のSTFT解析(ストリーミング)を開始します...")
+    total_samples, sr = audio_info(file_path)
     hop_length = int(sr / fps)
-    
-    y_harmonic, _ = librosa.effects.hpss(y, margin=1.2)
-    rms = librosa.feature.rms(y=y_harmonic, hop_length=hop_length)[0]
-    rms_normalized = rms / np.max(rms) if np.max(rms) > 0 else rms
-    
-    f0, voiced_flag, _ = librosa.pyin(
-        y_harmonic, fmin=40.0, fmax=1200.0, sr=sr, hop_length=hop_length, fill_na=0.0
+    n_fft = 2048
+    frequencies = librosa.fft_frequencies(sr=sr, n_fft=n_fft)
+    # librosa.stft(center=True) と同じく、フレーム t は t * hop_length を中心とする
+    num_frames = 1 + total_samples // hop_length
+    chunk_starts = range(0, num_frames, chunk_frames)
+    spans = (
+        (t0 * hop_length - n_fft // 2,
+         (min(num_frames, t0 + chunk_frames) - 1) * hop_length + n_fft // 2)
+        for t0 in chunk_starts
     )
-    
+
+    emitted = 0
+    for y_harmonic in stream_harmonic(file_path, spans, margin=1.2):
+        stft_matrix = np.abs(librosa.stft(y_harmonic, n_fft=n_fft, hop_length=hop_length, center=False))
+        commands = pick_stft_peaks(stft_matrix, frequencies)
+        emitted += len(commands)
+        yield commands
+
+    print(f"STFT解析完了: {emitted} frames")
+
+# ==========================================
+# エンジン2：F0推定（新方式・高精度・メロディ特化・オートスケーリング付き）
+# ==========================================
+# "pyin" = librosa.pyin（高精度・低速）
+# "yin"  = ベクトル化したYIN（pitch.yin。workers > 1 で複数プロセスに分割）
+# "hps"  = キャッシュ済みの振幅スペクトログラムに対する Harmonic Product Spectrum（最速）
+F0_METHODS = ("pyin", "yin", "hps")
+F0_FMIN = 40.0
+F0_FMAX = 1200.0
+
+def _f0_to_commands(f0: np.ndarray, voiced_flag: np.ndarray, rms_normalized: np.ndarray) -> np.ndarray:
+    """F0とRMSからコマンド列を作る（オートスケーリング + 帯域端のEQブースト）。推定方式によらず共通"""
     valid_f0 = f0[voiced_flag & (f0 > 0.0)]
     if len(valid_f0) > 0:
         p10_freq = np.percentile(valid_f0, 10)
@@ -93,41 +152,87 @@ def analyze_with_f0(file_path: str, fps: int = 66) -> list:
             lf_f, lf_a = 0.0, 0.0
 
         commands.append((hf_f, hf_a, lf_f, lf_a))
-        
+
+    return np.array(commands, dtype=np.float32).reshape(-1, 4)
+
+@profiled("f0", count=lambda result: len(result[0]))
+def estimate_f0_array(y_harmonic: np.ndarray, sr: int, fps: int = 66, method: str = "pyin",
+                      workers: int = 1, magnitude: np.ndarray = None) -> (np.ndarray, np.ndarray):
+    """
+    estimate_f0 の配列版。y_harmonic は HPSS 済みの信号。
+    magnitude は hps 用の振幅スペクトログラム（n_fft=4096。省略時はここで計算する）
+    """
+    if method not in F0_METHODS:
+        raise ValueError(f"未対応のF0推定方式です: {method} ({', '.join(F0_METHODS)})")
+    hop_length = int(sr / fps)
+
+    if method == "hps":
+        n_fft = 4096  # 低音域の分解能のため STFT エンジンより長い窓を使う
+        if magnitude is None:
+            magnitude = np.abs(librosa.stft(y_harmonic, n_fft=n_fft, hop_length=hop_length))
+        return pitch.hps(magnitude, librosa.fft_frequencies(sr=sr, n_fft=n_fft), F0_FMIN, F0_FMAX)
+    if method == "yin":
+        return pitch.yin(y_harmonic, sr, F0_FMIN, F0_FMAX, hop_length, workers=workers)
+
+    f0, voiced_flag, _ = librosa.pyin(
+        y_harmonic, fmin=F0_FMIN, fmax=F0_FMAX, sr=sr, hop_length=hop_length, fill_na=0.0
+    )
+    return f0, voiced_flag
+
+def _cached_hps_magnitude(file_path: str, method: str, fps: int):
+    """hps 用の振幅スペクトログラム（n_fft=4096）をキャッシュから取る。キャッシュが無効なら None"""
+    if method != "hps" or default_cache() is None:
+        return None
+    magnitude, _ = cached_stft_magnitude(file_path, margin=1.2, fps=fps, n_fft=4096)
+    return magnitude
+
+def estimate_f0(file_path: str, fps: int = 66, method: str = "pyin", workers: int = 1,
+                y_harmonic: np.ndarray = None, sr: int = None) -> (np.ndarray, np.ndarray):
+    """
+    調波成分の (f0, voiced_flag) を返す。無声フレームの f0 は 0。
+    調波成分を計算済みなら y_harmonic, sr で渡す（デコード・HPSS をやり直さない）
+    """
+    if y_harmonic is None:
+        y_harmonic, sr = cached_harmonic(file_path, margin=1.2)
+    # magnitude が None なら estimate_f0_array が y_harmonic から計算する
+    return estimate_f0_array(y_harmonic, sr, fps=fps, method=method, workers=workers,
+                             magnitude=_cached_hps_magnitude(file_path, method, fps))
+
+@profiled("analyze_f0")
+def f0_commands(y_harmonic: np.ndarray, sr: int, fps: int = 66, method: str = "pyin",
+                workers: int = 1, magnitude: np.ndarray = None) -> np.ndarray:
+    """analyze_with_f0 の配列版。y_harmonic は HPSS 済みの信号。magnitude は estimate_f0_array と同じ"""
+    rms = librosa.feature.rms(y=y_harmonic, hop_length=int(sr / fps))[0]
+    rms_normalized = rms / np.max(rms) if np.max(rms) > 0 else rms
+    f0, voiced_flag = estimate_f0_array(y_harmonic, sr, fps=fps, method=method, workers=workers,
+                                        magnitude=magnitude)
+    return _f0_to_commands(f0, voiced_flag, rms_normalized)
+
+def analyze_with_f0(file_path: str, fps: int = 66, method: str = "pyin", workers: int = 1) -> np.ndarray:
+    print(f"[{file_path}] のF0推定(高精度・メロディ抽出, {method})を開始します...")
+    y_harmonic, sr = cached_harmonic(file_path, margin=1.2)
+    commands = f0_commands(y_harmonic, sr, fps=fps, method=method, workers=workers,
+                           magnitude=_cached_hps_magnitude(file_path, method, fps))
     print(f"F0解析完了: {len(commands)} frames")
     return commands
 
 # ==========================================
 # 後処理：メディアンフィルタ（スパイクノイズ除去）
 # ==========================================
-def apply_median_filter(commands: list, kernel_size: int = 5) -> list:
+@profiled("median_filter")
+def apply_median_filter(commands, kernel_size: int = 5) -> np.ndarray:
     """
     配列データにメディアンフィルタを適用し、突発的な周波数・振幅のブレを平滑化する。
     kernel_size は必ず奇数（5フレーム = 約75msのノイズを無視する）
     """
     print(f"メディアンフィルタ（カーネルサイズ: {kernel_size}）を適用中...")
     
-    # データを列ごとに分解
-    hf_f_list = [c[0] for c in commands]
-    hf_a_list = [c[1] for c in commands]
-    lf_f_list = [c[2] for c in commands]
-    lf_a_list = [c[3] for c in commands]
-
-    # それぞれにフィルタをかける
-    hf_f_filtered = scipy.signal.medfilt(hf_f_list, kernel_size)
-    hf_a_filtered = scipy.signal.medfilt(hf_a_list, kernel_size)
-    lf_f_filtered = scipy.signal.medfilt(lf_f_list, kernel_size)
-    lf_a_filtered = scipy.signal.medfilt(lf_a_list, kernel_size)
-
-    # 再びタプルのリストに結合
-    filtered_commands = []
-    for i in range(len(commands)):
-        filtered_commands.append((
-            float(hf_f_filtered[i]),
-            float(hf_a_filtered[i]),
-            float(lf_f_filtered[i]),
-            float(lf_a_filtered[i])
-        ))
+    commands = np.asarray(commands, dtype=np.float64).reshape(-1, 4)
+
+    # 列（hf_freq, hf_amp, lf_freq, lf_amp）ごとにフィルタをかける
+    filtered_commands = np.empty(commands.shape, dtype=np.float32)
+    for col in range(4):
+        filtered_commands[:, col] = scipy.signal.medfilt(commands[:, col], kernel_size)
         
     print("平滑化処理が完了しました。")
     return filtered_commands
@@ -135,8 +240,8 @@ def apply_median_filter(commands: list, kernel_size: int = 5) -> list:
 # ==========================================
 # 共通ロジック：CSV保存
 # ==========================================
-def save_commands_to_csv(commands: list, output_path: str):
-    with open(output_path, 'w', newline='', encoding='utf-8') as f:
+def save_commands_to_csv(commands, output_path: str):
+    with span("write_csv", count=len(commands)), open(output_path, 'w', newline='', encoding='utf-8') as f:
         writer = csv.writer(f)
         writer.writerow(['hf_freq', 'hf_amp', 'lf_freq', 'lf_amp'])
         for cmd in commands:
@@ -152,7 +257,7 @@ if __name__ == '__main__':
     script_dir = Path(__file__).parent
     mp3_name = "hakujitu_skeleton.wav"
     mp3_path = script_dir / mp3_name
-    csv_path = script_dir / f"{mp3_name.split('.')[0]}_commands.csv"
+    jcr_path = script_dir / f"{mp3_name.split('.')[0]}_commands.jcr"
 
     if not mp3_path.exists():
         print(f"エラー: {mp3_path} が見つかりません。")
@@ -161,15 +266,29 @@ if __name__ == '__main__':
     # ★★★ ここでアルゴリズムと後処理を設計（選択）します ★★★
     # True = F0推定 (高精度)、False = STFT (高速)
     USE_F0_ALGORITHM = False 
+
+    # F0推定の方式（"pyin" = 高精度、"yin" / "hps" = 高速。F0_METHODS 参照）
+    F0_METHOD = "pyin"
+
+    # True = ブロック単位のストリーミング解析（長時間の音声でもメモリ一定。STFTのみ対応）
+    USE_STREAMING = False
     
     # True = メディアンフィルタを適用（STFTのノイズ除去に極めて有効）
     APPLY_MEDIAN_FILTER = True
+
+    # 段階ごとの計測結果の出力先（None なら計測しない）
+    PROFILE_REPORT = None  # 例: script_dir / "analysis_profile.json"
+    PROFILE_TRACE = None   # 例: script_dir / "analysis_trace.json"（chrome://tracing で開く）
+    if PROFILE_REPORT or PROFILE_TRACE:
+        profiling.enable()
     
     print("--- オーディオ解析パイプライン起動 ---")
     
     # 1. 解析フェーズ
     if USE_F0_ALGORITHM:
-        audio_commands = analyze_with_f0(str(mp3_path), fps=66)
+        audio_commands = analyze_with_f0(str(mp3_path), fps=66, method=F0_METHOD)
+    elif USE_STREAMING:
+        audio_commands = np.concatenate(list(analyze_with_stft_stream(str(mp3_path), fps=66)))
     else:
         audio_commands = analyze_with_stft(str(mp3_path), fps=66)
         
@@ -177,5 +296,6 @@ if __name__ == '__main__':
     if APPLY_MEDIAN_FILTER:
         audio_commands = apply_median_filter(audio_commands, kernel_size=5)
     
-    # 3. 出力フェーズ
-    save_commands_to_csv(audio_commands, str(csv_path))
\ No newline at end of file
+    # 3. 出力フェーズ（エンコード済みの .jcr として保存。CSVが必要なら jcr.py で変換）
+    save_commands_to_jcr(audio_commands, str(jcr_path), fps=66, source_path=str(mp3_path))
+    profiling.finish(PROFILE_REPORT, PROFILE_TRACE)
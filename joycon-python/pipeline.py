@@ -0,0 +1,241 @@
+import argparse
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+import processor
+import mp3_to_command_noize as analysis
+from analysis_cache import cached_load, cached_harmonic, default_cache
+from jcr import encode_commands, save_commands_to_jcr
+import profiling
+
+# ==========================================
+# 解析パイプライン（音声ファイル → .jcr を中間ファイル無しで）
+# ==========================================
+# 各ステージは Buffer を受け取り、NumPy 配列のまま次のステージへ渡す。
+# Buffer は適用済みのステージ名を覚えていて、同じ名前のステージは2回目以降スキップする
+# （例: 骨格化で HPSS 済みの信号に、解析側の HPSS をもう一度かけない）。
+
+
+class Buffer:
+    """ステージ間で受け渡す状態"""
+
+    def __init__(self, y: np.ndarray = None, sr: int = None, path: str = None):
+        self.y = y              # 音声（モノラル）
+        self.sr = sr
+        self.path = path        # 元の音声ファイル（.jcr の source_hash 用）
+        self.load_sr = None     # Source に指定したサンプリング周波数（None なら元のまま）
+        self.fps = None
+        self.commands = None    # 解析結果 (N, 4)
+        self.payload = None     # エンコード済みの振動データ（8バイト/フレーム）
+        self.applied = []       # 適用済みのステージ名
+        self.timings = []       # (ステージ名, 秒数)。スキップしたステージは秒数 None
+
+
+class Stage:
+    name = None
+
+    def __call__(self, buf: Buffer):
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"{type(self).__name__}()"
+
+
+# --- 入力 ---
+class Source(Stage):
+    """音声ファイルをモノラルで読む（解析キャッシュがあれば再デコードしない）"""
+    name = "source"
+
+    def __init__(self, path: str, sr: int = None):
+        self.path = str(path)
+        self.sr = sr
+
+    def __call__(self, buf):
+        buf.y, buf.sr = cached_load(self.path, sr=self.sr)
+        buf.path = self.path
+        buf.load_sr = self.sr
+
+
+# --- 前処理（骨格化） ---
+class HPSS(Stage):
+    name = "hpss"
+
+    def __init__(self, margin: float):
+        self.margin = margin
+
+    def __call__(self, buf):
+        if buf.applied == ["source"] and buf.path is not None and default_cache() is not None:
+            # デコード直後の信号なら、ファイル単位の解析キャッシュを使える
+            buf.y, _ = cached_harmonic(buf.path, margin=self.margin, sr=buf.load_sr)
+        else:
+            import librosa
+            buf.y, _ = librosa.effects.hpss(buf.y, margin=self.margin)
+
+
+class Bandpass(Stage):
+    name = "bandpass"
+
+    def __call__(self, buf):
+        buf.y = processor.bandpass(buf.y, buf.sr)
+
+
+class Gate(Stage):
+    name = "gate"
+
+    def __call__(self, buf):
+        buf.y = processor.noise_gate(buf.y)
+
+
+class Compress(Stage):
+    name = "compress"
+
+    def __call__(self, buf):
+        # WAV に書き出していた頃と同じく、最終正規化もここで行う
+        buf.y = processor.normalize(processor.compress(buf.y))
+
+
+# --- 解析 ---
+class STFTPeaks(Stage):
+    name = "analyze"
+
+    def __init__(self, fps: int = 66):
+        self.fps = fps
+
+    def __call__(self, buf):
+        buf.commands = analysis.stft_commands(buf.y, buf.sr, fps=self.fps)
+        buf.fps = self.fps
+
+
+class F0(Stage):
+    name = "analyze"
+
+    def __init__(self, fps: int = 66, method: str = "pyin", workers: int = 1):
+        self.fps = fps
+        self.method = method
+        self.workers = workers
+
+    def __call__(self, buf):
+        buf.commands = analysis.f0_commands(buf.y, buf.sr, fps=self.fps, method=self.method, workers=self.workers)
+        buf.fps = self.fps
+
+
+# --- 後処理・出力 ---
+class MedianFilter(Stage):
+    name = "median"
+
+    def __init__(self, kernel_size: int = 5):
+        self.kernel_size = kernel_size
+
+    def __call__(self, buf):
+        buf.commands = analysis.apply_median_filter(buf.commands, kernel_size=self.kernel_size)
+
+
+class Encode(Stage):
+    name = "encode"
+
+    def __call__(self, buf):
+        buf.payload = encode_commands(buf.commands)
+
+
+class JcrSink(Stage):
+    """.jcr として書き出す。途中で落ちても壊れたファイルが残らないよう、最後に置き換える"""
+    name = "sink"
+
+    def __init__(self, output_path: str):
+        self.output_path = str(output_path)
+
+    def __call__(self, buf):
+        tmp_path = f"{self.output_path}.{os.getpid()}.tmp"
+        try:
+            save_commands_to_jcr(buf.commands, tmp_path, fps=buf.fps, source_path=buf.path,
+                                 payload=buf.payload)
+            os.replace(tmp_path, self.output_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+class Pipeline:
+    """ステージのリスト。Pipeline 同士やステージのリストと + でつなげられる"""
+
+    def __init__(self, stages):
+        self.stages = list(stages)
+
+    def __add__(self, other):
+        return Pipeline(self.stages + list(other.stages if isinstance(other, Pipeline) else other))
+
+    def __repr__(self):
+        return " → ".join(stage.name for stage in self.stages)
+
+    def run(self, buf: Buffer = None, verbose: bool = True) -> Buffer:
+        buf = buf or Buffer()
+        for stage in self.stages:
+            if stage.name in buf.applied:
+                buf.timings.append((stage.name, None))
+                continue
+            t0 = time.perf_counter()
+            with profiling.span(f"stage.{stage.name}"):
+                stage(buf)
+            buf.timings.append((stage.name, time.perf_counter() - t0))
+            buf.applied.append(stage.name)
+        if verbose:
+            print_timings(buf.timings)
+        return buf
+
+
+def print_timings(timings: list):
+    print("ステージごとの処理時間:")
+    for name, seconds in timings:
+        print(f"  {name:10s} " + ("スキップ（適用済み）" if seconds is None else f"{seconds:8.3f} s"))
+    print(f"  {'合計':8s} {sum(s for _, s in timings if s is not None):8.3f} s")
+
+
+def skeleton_stages() -> list:
+    """processor.create_skeleton_audio と同じ骨格化"""
+    return [HPSS(processor.HPSS_MARGIN), Bandpass(), Gate(), Compress()]
+
+
+def build_pipeline(input_path: str, output_path: str = None, engine: str = "stft",
+                   skeletonize: bool = True, median_kernel: int = 5, fps: int = 66,
+                   f0_method: str = "pyin") -> Pipeline:
+    """joycon-convert と同じ設定で、音声ファイルから .jcr までのパイプラインを組む"""
+    stages = [Source(input_path)]
+    if skeletonize:
+        stages += skeleton_stages()
+    # 解析エンジンの HPSS。骨格化した場合は適用済みなのでスキップされる
+    stages.append(HPSS(1.2))
+    stages.append(F0(fps, method=f0_method) if engine == "f0" else STFTPeaks(fps))
+    if median_kernel:
+        stages.append(MedianFilter(median_kernel))
+    stages.append(Encode())
+    if output_path is not None:
+        stages.append(JcrSink(output_path))
+    return Pipeline(stages)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="音声ファイルを中間ファイル無しでJoy-Con用の振動トラック(.jcr)に変換します。")
+    parser.add_argument("input", type=Path)
+    parser.add_argument("-o", "--output", type=Path, default=None, help="出力先（省略時は <入力名>_commands.jcr）")
+    parser.add_argument("--engine", choices=("stft", "f0"), default="stft", help="解析エンジン")
+    parser.add_argument("--f0-method", choices=analysis.F0_METHODS, default="pyin")
+    parser.add_argument("--no-skeleton", action="store_true", help="骨格化を行わない")
+    parser.add_argument("--median", type=int, default=5, help="メディアンフィルタのカーネルサイズ（0で無効）")
+    parser.add_argument("--fps", type=int, default=66)
+    parser.add_argument("--profile", type=Path, default=None,
+                        help="ステージごとの実時間・CPU時間・RSSの増減を JSON で書き出す")
+    parser.add_argument("--trace", type=Path, default=None, help="Chromeトレース（chrome://tracing 用）を書き出す")
+    args = parser.parse_args()
+
+    output = args.output or args.input.with_name(f"{args.input.stem}_commands.jcr")
+    pipeline = build_pipeline(str(args.input), str(output), engine=args.engine,
+                              skeletonize=not args.no_skeleton, median_kernel=args.median,
+                              fps=args.fps, f0_method=args.f0_method)
+    print(f"パイプライン: {pipeline}")
+    if args.profile or args.trace:
+        profiling.enable()
+    pipeline.run()
+    profiling.finish(args.profile, args.trace)
@@ -0,0 +1,138 @@
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+# ==========================================
+# 高速なF0推定（librosa.pyin の代替）
+# ==========================================
+# どちらも (f0, voiced_flag) を返し、無声フレームの f0 は 0（pyin の fill_na=0.0 と同じ）。
+# フレーム t は t * hop_length を中心とする（librosa の center=True と同じ並び）。
+
+
+def _frame_length_for(sr: int, fmin: float) -> int:
+    # 最長周期の2倍以上の窓が必要（YINの差分関数の窓 + 最大ラグ）
+    n = 1024
+    while n < 2 * int(np.ceil(sr / fmin)) + 2:
+        n *= 2
+    return n
+
+
+def _yin_frames(frames: np.ndarray, sr: int, fmin: float, fmax: float,
+                threshold: float) -> (np.ndarray, np.ndarray):
+    """frames: (フレーム数, frame_length)。全フレームの YIN をまとめて計算する"""
+    num_frames, frame_length = frames.shape
+    max_lag = min(frame_length // 2, int(np.ceil(sr / fmin)) + 1)
+    min_lag = max(2, int(np.floor(sr / fmax)))
+    win = frame_length - max_lag
+
+    # 差分関数 d(τ) = Σ(x_j - x_{j+τ})² を FFT の相互相関とエネルギーの累積和で求める
+    n_fft = 1 << int(np.ceil(np.log2(frame_length + win)))
+    spec_head = np.fft.rfft(frames[:, :win], n_fft, axis=1)
+    spec_full = np.fft.rfft(frames, n_fft, axis=1)
+    corr = np.fft.irfft(np.conj(spec_head) * spec_full, n_fft, axis=1)[:, :max_lag + 1]
+
+    energy = np.cumsum(np.square(frames, dtype=np.float64), axis=1)
+    energy = np.concatenate([np.zeros((num_frames, 1)), energy], axis=1)
+    lags = np.arange(max_lag + 1)
+    e0 = energy[:, win][:, None]
+    e_tau = energy[:, lags + win] - energy[:, lags]
+    diff = np.maximum(e0 + e_tau - 2.0 * corr, 0.0)
+
+    # 累積平均で正規化した差分関数 (CMNDF)
+    cumsum = np.cumsum(diff[:, 1:], axis=1)
+    cmndf = np.ones_like(diff)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cmndf[:, 1:] = np.where(cumsum > 0, diff[:, 1:] * lags[1:] / cumsum, 1.0)
+
+    # 閾値を下回る最初の極小値を周期とする
+    search = cmndf[:, min_lag:max_lag]
+    is_min = np.zeros_like(search, dtype=bool)
+    is_min[:, 1:-1] = (search[:, 1:-1] <= search[:, :-2]) & (search[:, 1:-1] <= search[:, 2:])
+    candidates = is_min & (search < threshold)
+    voiced = candidates.any(axis=1)
+    idx = np.where(voiced, np.argmax(candidates, axis=1), 0)
+
+    # 放物線補間でラグを小数点以下まで求める
+    rows = np.arange(num_frames)
+    i = np.clip(idx, 1, search.shape[1] - 2)
+    left, center, right = search[rows, i - 1], search[rows, i], search[rows, i + 1]
+    denom = left - 2.0 * center + right
+    with np.errstate(divide='ignore', invalid='ignore'):
+        shift = np.where(np.abs(denom) > 1e-12, 0.5 * (left - right) / denom, 0.0)
+    period = min_lag + i + np.clip(shift, -0.5, 0.5)
+
+    f0 = np.where(voiced, sr / period, 0.0)
+    return f0, voiced
+
+
+def _yin_chunk(y_chunk: np.ndarray, sr: int, fmin: float, fmax: float, hop_length: int,
+               frame_length: int, threshold: float, block_frames: int = 1024):
+    frames = np.lib.stride_tricks.sliding_window_view(y_chunk, frame_length)[::hop_length]
+    f0s, voiced = [], []
+    # FFT の作業領域を抑えるため、フレームを block_frames ずつ処理する
+    for start in range(0, len(frames), block_frames):
+        f, v = _yin_frames(frames[start:start + block_frames].astype(np.float64), sr, fmin, fmax, threshold)
+        f0s.append(f)
+        voiced.append(v)
+    if not f0s:
+        return np.zeros(0), np.zeros(0, dtype=bool)
+    return np.concatenate(f0s), np.concatenate(voiced)
+
+
+def yin(y: np.ndarray, sr: int, fmin: float, fmax: float, hop_length: int,
+        threshold: float = 0.15, workers: int = 1, chunk_frames: int = 8192) -> (np.ndarray, np.ndarray):
+    """
+    ベクトル化した YIN。workers > 1 のときは chunk_frames フレームずつ別プロセスで計算する。
+    """
+    frame_length = _frame_length_for(sr, fmin)
+    y_padded = np.pad(np.asarray(y, dtype=np.float32), frame_length // 2)
+    num_frames = 1 + len(y) // hop_length
+
+    def chunk(t0):
+        t1 = min(num_frames, t0 + chunk_frames)
+        return y_padded[t0 * hop_length:(t1 - 1) * hop_length + frame_length]
+
+    starts = range(0, num_frames, chunk_frames)
+    args = (sr, fmin, fmax, hop_length, frame_length, threshold)
+    if workers > 1 and len(starts) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_yin_chunk, (chunk(t0) for t0 in starts), *([a] * len(starts) for a in args)))
+    else:
+        results = [_yin_chunk(chunk(t0), *args) for t0 in starts]
+
+    f0 = np.concatenate([r[0] for r in results])[:num_frames]
+    voiced = np.concatenate([r[1] for r in results])[:num_frames]
+    return f0, voiced
+
+
+def hps(magnitude: np.ndarray, frequencies: np.ndarray, fmin: float, fmax: float,
+        harmonics: int = 4, salience: float = 10.0) -> (np.ndarray, np.ndarray):
+    """
+    振幅スペクトログラムに対する Harmonic Product Spectrum。
+    基本周波数の整数倍のビンの振幅の積（対数では和）が最大になる周波数を選ぶ。
+    基本周波数のビンの振幅が帯域内の中央値の salience 倍以下のフレーム（雑音・無音）は無声とする。
+    """
+    num_bins = magnitude.shape[0] // harmonics
+    log_mag = np.log(np.asarray(magnitude, dtype=np.float64) + 1e-10)
+    product = np.zeros((num_bins, magnitude.shape[1]))
+    for h in range(1, harmonics + 1):
+        product += log_mag[::h][:num_bins]
+
+    band = np.flatnonzero((frequencies[:num_bins] >= fmin) & (frequencies[:num_bins] <= fmax))
+    if len(band) < 3:
+        return np.zeros(magnitude.shape[1]), np.zeros(magnitude.shape[1], dtype=bool)
+    band_product = product[band]
+    cols = np.arange(magnitude.shape[1])
+    k = np.argmax(band_product, axis=0)
+
+    # 放物線補間で周波数をビン幅より細かく求める
+    i = np.clip(k, 1, len(band) - 2)
+    left, center, right = band_product[i - 1, cols], band_product[i, cols], band_product[i + 1, cols]
+    denom = left - 2.0 * center + right
+    with np.errstate(divide='ignore', invalid='ignore'):
+        shift = np.where(np.abs(denom) > 1e-12, 0.5 * (left - right) / denom, 0.0)
+    bin_width = frequencies[1] - frequencies[0]
+    f0 = frequencies[band[i]] + np.clip(shift, -0.5, 0.5) * bin_width
+
+    band_mag = magnitude[band]
+    voiced = band_mag[k, cols] > salience * (np.median(band_mag, axis=0) + 1e-10)
+    return np.where(voiced, f0, 0.0), voiced
@@ -1,44 +1,165 @@
+import os
 import numpy as np
-import librosa
 import soundfile as sf
 import scipy.signal
 from pathlib import Path
+from analysis_cache import cached_harmonic
+from audio_stream import audio_info, stream_harmonic
+from profiling import profiled, span
 
+# 骨格化のパラメータ（一括版とストリーミング版で共通）
+HPSS_MARGIN = 2.0
+BAND = (300.0, 1200.0)
+GATE_THRESHOLD = 0.05
+COMPRESSION_GAIN = 5.0
+
+# 各段階は配列を受け取って配列を返す（pipeline.py からも使う）
+@profiled(unit="samples")
+def bandpass(y: np.ndarray, sr: int) -> np.ndarray:
+    """300Hz - 1200Hz のゼロ位相バンドパス"""
+    nyq = 0.5 * sr
+    low = BAND[0] / nyq
+    high = BAND[1] / nyq
+    b, a = scipy.signal.butter(4, [low, high], btype='band')
+    return scipy.signal.filtfilt(b, a, y)
+
+@profiled(unit="samples")
+def noise_gate(y: np.ndarray, threshold: float = GATE_THRESHOLD) -> np.ndarray:
+    return np.where(np.abs(y) > threshold, y, 0.0)
+
+@profiled(unit="samples")
+def compress(y: np.ndarray, gain: float = COMPRESSION_GAIN) -> np.ndarray:
+    return np.tanh(y * gain)  # tanhによるソフトクリッピングと増幅
+
+@profiled(unit="samples")
+def normalize(y: np.ndarray) -> np.ndarray:
+    return y / np.max(np.abs(y))
+
+@profiled("skeleton", count=None)
 def create_skeleton_audio(input_path: str, output_path: str):
     print(f"[{input_path}] の骨格化（解析用プレプロセス）を開始します...")
     
-    # 音声の読み込み
-    y, sr = librosa.load(input_path, sr=None, mono=True)
-    
     # 1. HPSS: ここで先に打楽器成分を完全に消し去る
+    # （デコード結果と調波成分は解析キャッシュがあれば再計算しない）
     print("打楽器・ノイズ成分を物理的に除去中...")
-    y_harmonic, _ = librosa.effects.hpss(y, margin=2.0) # marginを強めにして徹底的に分離
+    y_harmonic, sr = cached_harmonic(input_path, margin=HPSS_MARGIN) # marginを強めにして徹底的に分離
     
     # 2. バンドパスフィルタ (300Hz - 1200Hz)
     print("Joy-Conの再生可能帯域外の音を殺棄中...")
-    nyq = 0.5 * sr
-    low = 300.0 / nyq
-    high = 1200.0 / nyq
-    b, a = scipy.signal.butter(4, [low, high], btype='band')
-    y_filtered = scipy.signal.filtfilt(b, a, y_harmonic)
+    y_filtered = bandpass(y_harmonic, sr)
     
     # 3. ノイズゲート（閾値以下の音を無音化）
     print("ノイズゲート適用中...")
-    threshold = 0.05
-    y_gated = np.where(np.abs(y_filtered) > threshold, y_filtered, 0.0)
+    y_gated = noise_gate(y_filtered)
     
     # 4. ハードコンプレッション（音量の均一化）
     # 小さな音を持ち上げ、大きすぎる音を抑え込んで平坦にする
     print("ダイナミクスを破壊し、音圧を最大化中...")
-    y_compressed = np.tanh(y_gated * 5.0) # tanhによるソフトクリッピングと増幅
+    y_compressed = compress(y_gated)
     
     # 5. 音量の最終正規化
-    y_normalized = y_compressed / np.max(np.abs(y_compressed))
+    y_normalized = normalize(y_compressed)
     
     # WAVファイルとして書き出し
-    sf.write(output_path, y_normalized, sr)
+    with span("write_wav", count=len(y_normalized), unit="samples"):
+        sf.write(output_path, y_normalized, sr)
+    print(f"骨格化オーディオの生成完了: {output_path}")
+
+# ==========================================
+# 骨格化のストリーミング版（長時間の音声向け）
+# ==========================================
+CHUNK_SAMPLES = 1 << 18     # 1ブロックのサンプル数（44.1kHz で約6秒）
+BANDPASS_OVERLAP = 8192     # 逆方向フィルタの先読み。インパルス応答が十分に減衰する長さ
+FILTFILT_PADLEN = 27        # filtfilt(b, a) の既定の padlen = 3 * max(len(a), len(b))
+
+
+def _gate_and_compress(y: np.ndarray) -> np.ndarray:
+    """ノイズゲートと tanh 圧縮を float32 のまま y の上で行う"""
+    y[np.abs(y) <= GATE_THRESHOLD] = 0.0
+    y *= COMPRESSION_GAIN
+    return np.tanh(y, out=y)
+
+
+def stream_skeleton(input_path: str, chunk_samples: int = CHUNK_SAMPLES,
+                    overlap: int = BANDPASS_OVERLAP):
+    """
+    create_skeleton_audio の正規化前までの処理をブロックごとに行い、
+    float32 のブロックを順に返すジェネレータ。ファイル全体を読み込まない。
+
+    filtfilt の代わりに、順方向は状態を引き継ぐ sosfilt、逆方向は overlap サンプル
+    先から 0 の状態で始める sosfilt で処理する。先読みの打ち切りによる誤差は
+    インパルス応答の減衰で無視できる大きさになる。曲の両端は filtfilt と同じく
+    奇関数延長と定常状態の初期値で処理する。
+    """
+    total_samples, sr = audio_info(input_path)
+    if total_samples == 0:
+        return
+    sos = scipy.signal.butter(4, BAND, btype='band', fs=sr, output='sos')
+    zi = scipy.signal.sosfilt_zi(sos)
+    spans = ((a, min(a + chunk_samples, total_samples)) for a in range(0, total_samples, chunk_samples))
+
+    # pending: 順方向フィルタ済みで、まだ逆方向フィルタを掛けていないサンプル
+    pending = np.zeros(0)
+    tail = np.zeros(0)  # 終端の奇関数延長に使う、調波成分の末尾
+    state = None
+    for x in stream_harmonic(input_path, spans, margin=HPSS_MARGIN):
+        if state is None:
+            # 先頭の奇関数延長で順方向の状態を温めてから本体を流す
+            n = min(FILTFILT_PADLEN, len(x) - 1)
+            ext = 2 * x[0] - x[n:0:-1]
+            _, state = scipy.signal.sosfilt(sos, ext, zi=zi * (ext[0] if n else x[0]))
+        forward, state = scipy.signal.sosfilt(sos, x, zi=state)
+        pending = np.concatenate([pending, forward])
+        tail = np.concatenate([tail, x])[-(FILTFILT_PADLEN + 1):]
+
+        while len(pending) >= chunk_samples + overlap:
+            backward = scipy.signal.sosfilt(sos, pending[chunk_samples + overlap - 1::-1])
+            yield _gate_and_compress(backward[::-1][:chunk_samples].astype(np.float32))
+            pending = pending[chunk_samples:]
+
+    # 終端: 奇関数延長まで順方向に流し、その最後の値から逆方向を始める
+    n = min(FILTFILT_PADLEN, len(tail) - 1)
+    ext = 2 * tail[-1] - tail[-2:-(n + 2):-1]
+    forward_ext, _ = scipy.signal.sosfilt(sos, ext, zi=state)
+    rest = np.concatenate([pending, forward_ext])
+    backward, _ = scipy.signal.sosfilt(sos, rest[::-1], zi=zi * rest[-1])
+    yield _gate_and_compress(backward[::-1][:len(pending)].astype(np.float32))
+
+
+@profiled("skeleton_stream", count=None)
+def create_skeleton_audio_stream(input_path: str, output_path: str, chunk_samples: int = CHUNK_SAMPLES):
+    """
+    create_skeleton_audio と同じ骨格化を、ブロックごとに読み込み・書き出しながら行う。
+    メモリ使用量は曲の長さによらず一定になる。
+
+    最終正規化には全体の最大値が要るため、正規化前の結果をいったん float32 の
+    一時ファイルへ書き、2回目の走査で割って出力する。
+    結果は一括版と許容誤差内で一致する（benchmark.py の skeleton で確認）。
+    """
+    print(f"[{input_path}] の骨格化(ストリーミング)を開始します...")
+    _, sr = audio_info(input_path)
+    tmp_path = f"{output_path}.{os.getpid()}.tmp.wav"
+    peak = 0.0
+    try:
+        with sf.SoundFile(tmp_path, 'w', samplerate=sr, channels=1, subtype='FLOAT') as tmp:
+            for block in stream_skeleton(input_path, chunk_samples):
+                if len(block):
+                    peak = max(peak, float(np.max(np.abs(block))))
+                tmp.write(block)
+
+        print("音量の最終正規化中...")
+        scale = np.float32(1.0 / peak) if peak > 0 else np.float32(1.0)
+        with sf.SoundFile(tmp_path) as tmp, \
+                sf.SoundFile(output_path, 'w', samplerate=sr, channels=1) as out:
+            for block in tmp.blocks(chunk_samples, dtype='float32'):
+                block *= scale
+                out.write(block)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
     print(f"骨格化オーディオの生成完了: {output_path}")
 
+
 if __name__ == '__main__':
     script_dir = Path(__file__).parent
     mp3_name = "hakujitu.mp3"
@@ -51,4 +172,10 @@ if __name__ == '__main__':
         print(f"エラー: {input_path} が見つかりません。")
         exit()
         
-    create_skeleton_audio(str(input_path), str(output_path))
\ No newline at end of file
+    # True = ブロック単位のストリーミング処理（長時間の音声でもメモリ一定）
+    USE_STREAMING = False
+
+    if USE_STREAMING:
+        create_skeleton_audio_stream(str(input_path), str(output_path))
+    else:
+        create_skeleton_audio(str(input_path), str(output_path))
@@ -0,0 +1,257 @@
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# ==========================================
+# 計測（ステージごとの実時間・CPU時間・RSSの増減・処理速度）
+# ==========================================
+# 使い方:
+#   profiling.enable()
+#   with profiling.span("stft", count=len(frames)):
+#       ...
+#   profiling.disable().write_json("profile.json")
+# 関数全体を計測するときは @profiling.profiled("名前") を付ける。
+#
+# 無効なとき span() は何もしない共有オブジェクトを返すだけなので、
+# 計測を入れたままでも処理速度はほとんど変わらない（benchmark.py の profiling で確認）。
+# 有効なときは1区間に数十マイクロ秒かかるので、フレームごとの処理ではなくステージ単位で使う。
+
+
+class Span:
+    """1区間の計測結果。count は処理したフレーム数など（with の中で設定してもよい）"""
+    __slots__ = ("name", "parent", "thread", "start", "wall", "cpu", "rss", "rss_delta", "process_peak_rss",
+                 "count", "unit", "args")
+
+    def __init__(self, name, parent, count, unit, args):
+        self.name = name
+        self.parent = parent
+        self.thread = threading.current_thread().name
+        self.count = count
+        self.unit = unit
+        self.args = args
+        self.start = self.wall = self.cpu = 0.0
+        self.rss = self.rss_delta = self.process_peak_rss = None
+
+    @property
+    def rate(self):
+        """1秒あたりに処理した count"""
+        return self.count / self.wall if self.count is not None and self.wall > 0 else None
+
+    def as_dict(self) -> dict:
+        return {
+            "name": self.name, "parent": self.parent, "thread": self.thread,
+            "start": self.start, "wall": self.wall, "cpu": self.cpu,
+            "rss": self.rss, "rss_delta": self.rss_delta, "process_peak_rss": self.process_peak_rss,
+            "count": self.count, "unit": self.unit, "rate": self.rate, "args": self.args,
+        }
+
+
+class _NullSpan:
+    """計測が無効なときの span。属性の設定も含めて何もしない"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def _current_rss() -> int:
+    """今のRSS（バイト）。/proc の無い環境では None"""
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def _process_peak_rss() -> int:
+    """プロセス開始以来のピークRSS（バイト）。区間ごとの値ではない。取得できなければ None"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss * 1024 if sys.platform.startswith("linux") else rss  # Linux は KB 単位
+
+
+class Profiler:
+    """
+    span の記録先。区間はスレッドごとに入れ子になり、親の名前を覚える。
+    cpu はその区間を実行したスレッドのCPU時間（他のスレッドの分は含まない）。
+    rss は区間の終了時点のRSS、rss_delta は区間の開始から終了までのRSSの増減。
+    process_peak_rss はプロセス開始以来のピークRSSで、その区間だけの値ではない。
+    """
+
+    def __init__(self):
+        self.spans = []
+        self.origin = time.perf_counter()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, count: int = None, unit: str = "frames", **args):
+        stack = self._local.__dict__.setdefault("stack", [])
+        record = Span(name, stack[-1].name if stack else None, count, unit, args)
+        stack.append(record)
+        rss0 = _current_rss()
+        cpu0 = time.thread_time()
+        t0 = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record.wall = time.perf_counter() - t0
+            record.cpu = time.thread_time() - cpu0
+            record.start = t0 - self.origin
+            record.rss = _current_rss()
+            if rss0 is not None and record.rss is not None:
+                record.rss_delta = record.rss - rss0
+            record.process_peak_rss = _process_peak_rss()
+            stack.pop()
+            with self._lock:
+                self.spans.append(record)
+
+    def summary(self) -> dict:
+        """名前ごとの集計: 回数・合計実時間・合計CPU時間・終了時RSSの最大・RSSの増減の合計・処理速度"""
+        out = {}
+        for s in sorted(self.spans, key=lambda s: s.start):
+            entry = out.setdefault(s.name, {
+                "calls": 0, "wall": 0.0, "cpu": 0.0, "rss": None, "rss_delta": None,
+                "count": None, "unit": s.unit,
+            })
+            entry["calls"] += 1
+            entry["wall"] += s.wall
+            entry["cpu"] += s.cpu
+            if s.rss is not None:
+                entry["rss"] = max(entry["rss"] or 0, s.rss)
+            if s.rss_delta is not None:
+                entry["rss_delta"] = (entry["rss_delta"] or 0) + s.rss_delta
+            if s.count is not None:
+                entry["count"] = (entry["count"] or 0) + s.count
+        for entry in out.values():
+            entry["rate"] = entry["count"] / entry["wall"] if entry["count"] is not None and entry["wall"] > 0 else None
+        return out
+
+    def report(self) -> dict:
+        return {
+            "spans": [s.as_dict() for s in sorted(self.spans, key=lambda s: s.start)],
+            "summary": self.summary(),
+            "process_peak_rss": _process_peak_rss(),
+        }
+
+    def write_json(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=1)
+        print(f"計測結果を出力しました: {path}")
+
+    def write_chrome_trace(self, path: str):
+        """chrome://tracing や Perfetto で開ける形式（Trace Event Format の "X" イベント）"""
+        pid = os.getpid()
+        threads = {}
+        events = []
+        for s in self.spans:
+            tid = threads.setdefault(s.thread, len(threads))
+            args = {"cpu_ms": s.cpu * 1e3, **s.args}
+            if s.rss is not None:
+                args["rss_mb"] = s.rss / 1e6
+            if s.rss_delta is not None:
+                args["rss_delta_mb"] = s.rss_delta / 1e6
+            if s.count is not None:
+                args[s.unit] = s.count
+                args[f"{s.unit}_per_s"] = s.rate
+            events.append({
+                "name": s.name, "ph": "X", "pid": pid, "tid": tid,
+                "ts": s.start * 1e6, "dur": s.wall * 1e6, "args": args,
+            })
+        for name, tid in threads.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}})
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        print(f"Chromeトレースを出力しました: {path}")
+
+    def print_summary(self):
+        print("計測結果（名前ごとの合計）:")
+        for name, e in self.summary().items():
+            rss = f"{e['rss_delta'] / 1e6:+8.1f} MB" if e["rss_delta"] is not None else "       -   "
+            rate = f" / {e['rate']:10.1f} {e['unit']}/s" if e["rate"] is not None else ""
+            print(f"  {name:16s} x{e['calls']:<5d} 実時間 {e['wall']:8.3f} s / CPU {e['cpu']:8.3f} s "
+                  f"/ RSS増減 {rss}{rate}")
+        peak = _process_peak_rss()
+        if peak is not None:
+            print(f"  プロセスのピークRSS（開始以来） {peak / 1e6:.1f} MB")
+
+
+# --- モジュール全体で共有する計測先 ---
+_active = None
+
+
+def enable(profiler: Profiler = None) -> Profiler:
+    global _active
+    _active = profiler or Profiler()
+    return _active
+
+
+def disable() -> Profiler:
+    """計測を止め、それまでの記録を返す"""
+    global _active
+    profiler, _active = _active, None
+    return profiler
+
+
+def active() -> Profiler:
+    return _active
+
+
+def span(name: str, count: int = None, unit: str = "frames", **args):
+    """計測が有効なら区間を記録する context manager。無効なら何もしない"""
+    if _active is None:
+        return _NULL_SPAN
+    return _active.span(name, count=count, unit=unit, **args)
+
+
+def profiled(name: str = None, unit: str = "frames", count=len):
+    """
+    関数全体を1つの区間として記録するデコレータ。count(戻り値) を処理量とする
+    （count=None なら記録しない）。無効なときは関数をそのまま呼ぶだけ。
+    """
+    def decorate(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _active is None:
+                return fn(*args, **kwargs)
+            with _active.span(label, unit=unit) as s:
+                result = fn(*args, **kwargs)
+                if count is not None:
+                    s.count = count(result)
+            return result
+        return wrapper
+    return decorate
+
+
+def finish(report_path: str = None, trace_path: str = None):
+    """計測を止めて、指定されたファイルへ書き出し、集計を表示する"""
+    profiler = disable()
+    if profiler is None:
+        return None
+    if report_path:
+        profiler.write_json(str(report_path))
+    if trace_path:
+        profiler.write_chrome_trace(str(trace_path))
+    profiler.print_summary()
+    return profiler
@@ -2,7 +2,11 @@ from .joycon import JoyCon
 from .wrappers import PythonicJoyCon  # as JoyCon
 from .gyro import GyroTrackingJoyCon
 from .event import ButtonEventJoyCon
-from .device import get_device_ids, get_ids_of_type
+from .aio import AsyncJoyCon
+from .cache import CalibrationCache
+from .simulated import SimulatedJoyCon
+from .transport import FdTransport, Transport
+from .device import DeviceRegistry, get_device_ids, get_ids_of_type
 from .device import is_id_L
 from .device import get_R_ids, get_L_ids
 from .device import get_R_id, get_L_id
@@ -11,10 +15,16 @@ from .device import get_R_id, get_L_id
 __version__ = "0.2.4"
 
 __all__ = [
+    "AsyncJoyCon",
     "ButtonEventJoyCon",
+    "DeviceRegistry",
+    "CalibrationCache",
+    "FdTransport",
     "GyroTrackingJoyCon",
     "JoyCon",
     "PythonicJoyCon",
+    "SimulatedJoyCon",
+    "Transport",
     "get_L_id",
     "get_L_ids",
     "get_R_id",
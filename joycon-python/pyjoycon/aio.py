@@ -0,0 +1,243 @@
+import asyncio
+import os
+from collections import deque
+
+import numpy as np
+
+from .constants import JOYCON_VENDOR_ID, JOYCON_PRODUCT_IDS
+from .constants import JOYCON_L_PRODUCT_ID, JOYCON_R_PRODUCT_ID
+from .imu import decode_imu
+from .report import InputReport
+from .transport import open_hidraw
+
+
+class AsyncJoyCon:
+    """
+    A JoyCon driven by an asyncio event loop instead of a reader thread.
+
+    The device is a non-blocking file descriptor registered with
+    ``loop.add_reader``: a hidraw node by default, or any transport with
+    ``fileno()`` (e.g. an ``FdTransport`` served by ``SimulatedJoyCon.serve``).
+    Incoming 0x21 replies resolve the matching ``subcommand()`` call and
+    0x30 reports are queued for ``read_report()`` / ``reports()``; when the
+    consumer falls behind, the oldest queued report is dropped.
+
+    Create and connect it with ``jc = await AsyncJoyCon.open(vendor_id, product_id)``.
+    """
+    _INPUT_REPORT_SIZE = 49
+    _RUMBLE_DATA = b'\x00\x01\x40\x40\x00\x01\x40\x40'
+
+    def __init__(self, vendor_id: int, product_id: int, serial: str = None,
+                 transport=None, queue_size: int = 8):
+        if vendor_id != JOYCON_VENDOR_ID:
+            raise ValueError(f'vendor_id is invalid: {vendor_id!r}')
+
+        if product_id not in JOYCON_PRODUCT_IDS:
+            raise ValueError(f'product_id is invalid: {product_id!r}')
+
+        self.vendor_id  = vendor_id
+        self.product_id = product_id
+        self.serial     = serial
+
+        if transport is None:
+            transport = open_hidraw(vendor_id, product_id, serial, blocking=False)
+        self._device = transport
+        self._fd = transport.fileno()
+        os.set_blocking(self._fd, False)
+
+        self._loop = None
+        self._packet_number = 0
+        self._reports = deque(maxlen=queue_size)
+        self._report_waiter = None
+        self._pending = {}  # subcommand id -> future of (ack, data)
+        self._error = None
+
+        self.dropped_reports = 0
+        self.raw_report = bytes(self._INPUT_REPORT_SIZE)
+        self.report = InputReport(self.raw_report)
+        self._imu_offset = np.zeros(6)
+        self._imu_coeff = np.ones(6)
+
+    @classmethod
+    async def open(cls, *args, **kwargs) -> "AsyncJoyCon":
+        joycon = cls(*args, **kwargs)
+        await joycon.connect()
+        return joycon
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    async def connect(self):
+        self._loop = asyncio.get_running_loop()
+        self._loop.add_reader(self._fd, self._on_readable)
+
+        color_data = await self.spi_flash_read(0x6050, 6)
+        # user IME data, else factory IME data
+        if await self.spi_flash_read(0x8026, 2) == b"\xB2\xA1":
+            imu_cal = await self.spi_flash_read(0x8028, 24)
+        else:
+            imu_cal = await self.spi_flash_read(0x6020, 24)
+        self.color_body = tuple(color_data[:3])
+        self.color_btn  = tuple(color_data[3:])
+        self._set_imu_calibration(imu_cal)
+
+        # enable the 6 axis sensors, then switch to the standard full mode.
+        # Waiting for each ack replaces the fixed sleep of the threaded JoyCon
+        await self.subcommand(0x40, b'\x01')
+        await self.subcommand(0x03, b'\x30')
+
+    def close(self):
+        if self._loop is not None and self._fd is not None:
+            self._loop.remove_reader(self._fd)
+        self._fail(ConnectionError('joycon closed'))
+        if self._fd is not None:
+            self._device.close()
+            self._fd = None
+
+    def is_left(self):
+        return self.product_id == JOYCON_L_PRODUCT_ID
+
+    def is_right(self):
+        return self.product_id == JOYCON_R_PRODUCT_ID
+
+    # --- input ---
+
+    async def read_report(self) -> bytes:
+        """The oldest queued 0x30 report, waiting for one if none is queued."""
+        while not self._reports:
+            if self._error is not None:
+                raise self._error
+            self._report_waiter = self._loop.create_future()
+            await self._report_waiter
+        return self._reports.popleft()
+
+    async def reports(self):
+        while True:
+            yield await self.read_report()
+
+    def get_imu(self, scale=None, dtype=np.float32) -> np.ndarray:
+        """The 3 calibrated samples of the last report as a (3, 6) array, as ``JoyCon.get_imu``."""
+        imu = np.multiply(decode_imu(self.raw_report) - self._imu_offset, self._imu_coeff, dtype=dtype)
+        if scale is not None:
+            imu *= np.asarray(scale, dtype=dtype)
+        return imu
+
+    # --- output ---
+
+    async def send_rumble(self, rumble_bytes: bytes):
+        if len(rumble_bytes) != 8:
+            raise ValueError("not valid rumble data")
+        await self._write(b'\x10' + self._next_packet_number() + rumble_bytes)
+
+    def send_rumble_nowait(self, rumble_bytes: bytes) -> bool:
+        """Send without waiting; False if the device can't take the report right now."""
+        if len(rumble_bytes) != 8:
+            raise ValueError("not valid rumble data")
+        try:
+            os.write(self._fd, b'\x10' + self._next_packet_number() + rumble_bytes)
+        except BlockingIOError:
+            return False
+        return True
+
+    async def subcommand(self, subcommand: int, argument: bytes = b'', timeout: float = 1.0) -> (bool, bytes):
+        """Send a subcommand and wait for its 0x21 reply: (ack, data from byte 13 on)."""
+        if subcommand in self._pending:
+            raise RuntimeError(f'subcommand {subcommand:#04x} is already waiting for a reply')
+        if self._error is not None:
+            raise self._error
+        reply = self._pending[subcommand] = self._loop.create_future()
+        try:
+            await self._write(b''.join([
+                b'\x01',
+                self._next_packet_number(),
+                self._RUMBLE_DATA,
+                bytes([subcommand]),
+                argument,
+            ]))
+            return await asyncio.wait_for(reply, timeout)
+        finally:
+            if self._pending.get(subcommand) is reply:
+                del self._pending[subcommand]
+
+    async def spi_flash_read(self, address: int, size: int) -> bytes:
+        assert size <= 0x1d
+        argument = address.to_bytes(4, "little") + size.to_bytes(1, "little")
+        ack, report = await self.subcommand(0x10, argument)
+        if not ack:
+            raise IOError(f"After SPI read @ {address:#06x}: got NACK")
+        if report[:2] != b'\x90\x10':
+            raise IOError("Something else than the expected ACK was recieved!")
+        return report[7:size + 7]
+
+    # --- internals ---
+
+    def _next_packet_number(self) -> bytes:
+        number = self._packet_number
+        self._packet_number = (number + 1) & 0xF
+        return bytes([number])
+
+    async def _write(self, data: bytes):
+        while True:
+            try:
+                os.write(self._fd, data)
+                return
+            except BlockingIOError:
+                writable = self._loop.create_future()
+                self._loop.add_writer(self._fd, writable.set_result, None)
+                try:
+                    await writable
+                finally:
+                    self._loop.remove_writer(self._fd)
+
+    def _on_readable(self):
+        # one report per call: the reader is level-triggered, so the loop calls
+        # again while more are pending, and no read ends in BlockingIOError
+        try:
+            report = os.read(self._fd, 64)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            self._loop.remove_reader(self._fd)
+            self._fail(e)
+            return
+        if not report:
+            self._loop.remove_reader(self._fd)
+            self._fail(ConnectionError('joycon disconnected'))
+            return
+
+        if report[0] == 0x30:
+            try:
+                parsed = InputReport(report)
+            except ValueError:  # truncated read; keep the previous report
+                return
+            self.raw_report, self.report = report, parsed
+            if len(self._reports) == self._reports.maxlen:
+                self.dropped_reports += 1
+            self._reports.append(report)
+            waiter = self._report_waiter
+            if waiter is not None and not waiter.done():
+                waiter.set_result(None)
+        elif report[0] == 0x21:
+            reply = self._pending.get(report[14])
+            if reply is not None and not reply.done():
+                reply.set_result((bool(report[13] & 0x80), report[13:]))
+
+    def _fail(self, error: Exception):
+        self._error = error
+        for reply in self._pending.values():
+            if not reply.done():
+                reply.set_exception(error)
+        if self._report_waiter is not None and not self._report_waiter.done():
+            self._report_waiter.set_exception(error)
+
+    def _set_imu_calibration(self, imu_cal: bytes):
+        values = np.frombuffer(imu_cal, dtype='<i2', count=12).astype(np.float64)
+        accel_coeff, gyro_coeff = values[3:6], values[9:12]
+        self._imu_offset = np.concatenate([values[0:3], values[6:9]])
+        self._imu_coeff = np.concatenate([
+            np.where(accel_coeff != 0x4000, 0x4000 / accel_coeff, 1),
+            np.where(gyro_coeff != 0x343b, 0x343b / gyro_coeff, 1),
+        ])
@@ -0,0 +1,76 @@
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "pyjoycon"
+_CACHE_VERSION = 1
+
+
+class CalibrationCache:
+    """
+    Colors and IMU calibration of each controller, stored on disk so that a
+    reconnect doesn't have to read them from SPI flash again.
+
+    There is one JSON file per controller, keyed by product id and serial
+    (the Bluetooth MAC). An entry is only used if its version, product id,
+    serial, sizes and checksum all match; anything else is a miss.
+    """
+
+    def __init__(self, root=DEFAULT_CACHE_DIR):
+        self.root = Path(root)
+
+    def _path(self, product_id: int, serial: str) -> Path:
+        name = re.sub(r'[^0-9A-Za-z]+', '-', serial).strip('-').lower()
+        return self.root / f"{product_id:04x}-{name}.json"
+
+    @staticmethod
+    def _checksum(product_id: int, serial: str, color_data: bytes, imu_cal: bytes) -> str:
+        desc = f"{_CACHE_VERSION}:{product_id}:{serial}:".encode() + color_data + imu_cal
+        return hashlib.sha256(desc).hexdigest()[:32]
+
+    def load(self, product_id: int, serial: str):
+        """(color_data, imu_cal) on a valid hit, else None."""
+        try:
+            with open(self._path(product_id, serial), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            color_data = bytes.fromhex(entry["color"])
+            imu_cal = bytes.fromhex(entry["imu_cal"])
+            valid = (
+                entry["version"] == _CACHE_VERSION
+                and entry["product_id"] == product_id
+                and entry["serial"] == serial
+                and len(color_data) == 6 and len(imu_cal) == 24
+                and entry["checksum"] == self._checksum(product_id, serial, color_data, imu_cal)
+            )
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return (color_data, imu_cal) if valid else None
+
+    def store(self, product_id: int, serial: str, color_data: bytes, imu_cal: bytes):
+        """Write an entry; a cache that can't be written is not an error."""
+        path = self._path(product_id, serial)
+        entry = {
+            "version": _CACHE_VERSION,
+            "product_id": product_id,
+            "serial": serial,
+            "color": bytes(color_data).hex(),
+            "imu_cal": bytes(imu_cal).hex(),
+            "checksum": self._checksum(product_id, serial, bytes(color_data), bytes(imu_cal)),
+        }
+        # write a temporary file first, so a reader never sees half an entry
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            self.root.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+    def invalidate(self, product_id: int, serial: str):
+        try:
+            os.remove(self._path(product_id, serial))
+        except OSError:
+            pass
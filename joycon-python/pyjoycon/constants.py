@@ -1,4 +1,8 @@
 JOYCON_VENDOR_ID    = 0x057E
 JOYCON_L_PRODUCT_ID = 0x2006
 JOYCON_R_PRODUCT_ID = 0x2007
+JOYCON_PRO_PRODUCT_ID = 0x2009
 JOYCON_PRODUCT_IDS = (JOYCON_L_PRODUCT_ID, JOYCON_R_PRODUCT_ID)
+
+# every controller DeviceRegistry tracks; JoyCon itself only drives L and R
+CONTROLLER_PRODUCT_IDS = (JOYCON_L_PRODUCT_ID, JOYCON_R_PRODUCT_ID, JOYCON_PRO_PRODUCT_ID)
@@ -1,13 +1,25 @@
 import hid
-from .constants import JOYCON_VENDOR_ID, JOYCON_PRODUCT_IDS
-from .constants import JOYCON_L_PRODUCT_ID, JOYCON_R_PRODUCT_ID
+import logging
+import threading
+from .constants import JOYCON_VENDOR_ID, JOYCON_PRODUCT_IDS, CONTROLLER_PRODUCT_IDS
+from .constants import JOYCON_L_PRODUCT_ID, JOYCON_R_PRODUCT_ID, JOYCON_PRO_PRODUCT_ID
 
+logger = logging.getLogger(__name__)
 
-def get_device_ids(debug=False):
+
+def get_device_ids(debug=False, product_ids=JOYCON_PRODUCT_IDS, enumerate=None):
     """
     returns a list of tuples like `(vendor_id, product_id, serial_number)`
+
+    Only Nintendo devices are enumerated: hidapi filters by vendor id
+    itself instead of returning every HID device on the system.
     """
-    devices = hid.enumerate(0, 0)
+    return [ids for ids, _ in _enumerate_devices(debug, product_ids, enumerate)]
+
+
+def _enumerate_devices(debug=False, product_ids=JOYCON_PRODUCT_IDS, enumerate=None):
+    """returns a list of `((vendor_id, product_id, serial_number), path)`"""
+    devices = (enumerate or hid.enumerate)(JOYCON_VENDOR_ID, 0)
 
     out = []
     for device in devices:
@@ -18,12 +30,12 @@ def get_device_ids(debug=False):
 
         if vendor_id != JOYCON_VENDOR_ID:
             continue
-        if product_id not in JOYCON_PRODUCT_IDS:
+        if product_id not in product_ids:
             continue
         if not product_string:
             continue
 
-        out.append((vendor_id, product_id, serial))
+        out.append(((vendor_id, product_id, serial), device.get("path")))
 
         if debug:
             print(product_string)
@@ -75,3 +87,111 @@ def get_L_id(**kw):
     if not ids:
         return (None, None, None)
     return ids[0]
+
+
+class DeviceRegistry:
+    """
+    All connected L, R and Pro controllers, keyed by hid path, so two
+    controllers that report no serial are kept apart.
+
+    ``refresh()`` enumerates once and diffs against the previous result,
+    calling the ``on_added`` / ``on_removed`` callbacks with
+    `((vendor_id, product_id, serial_number), path)` for each change; pass
+    the path on to ``JoyCon(*ids, path=path)`` to open that very device.
+    An exception from a callback is logged and doesn't stop the other callbacks.
+    ``watch()`` refreshes from a daemon thread, on every udev hidraw event
+    when pyudev is installed, and every ``interval`` seconds in any case.
+    """
+
+    def __init__(self, product_ids=CONTROLLER_PRODUCT_IDS, enumerate=None):
+        self.product_ids = product_ids
+        self._enumerate = enumerate
+        self.devices = {}  # path -> (vendor_id, product_id, serial_number)
+        self._added_callbacks = []
+        self._removed_callbacks = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def on_added(self, callback):
+        self._added_callbacks.append(callback)
+        return callback  # this makes it so you could use it as a decorator
+
+    def on_removed(self, callback):
+        self._removed_callbacks.append(callback)
+        return callback
+
+    def refresh(self) -> (list, list):
+        """Enumerate once; returns the (ids, path) pairs (added, removed) since the last refresh."""
+        current = {
+            path: ids
+            for ids, path in _enumerate_devices(product_ids=self.product_ids, enumerate=self._enumerate)
+        }
+        with self._lock:
+            added = [(ids, path) for path, ids in current.items() if path not in self.devices]
+            removed = [(ids, path) for path, ids in self.devices.items() if path not in current]
+            self.devices = current
+        for ids, path in removed:
+            self._notify(self._removed_callbacks, ids, path)
+        for ids, path in added:
+            self._notify(self._added_callbacks, ids, path)
+        return added, removed
+
+    @staticmethod
+    def _notify(callbacks, ids, path):
+        for callback in callbacks:
+            try:
+                callback(ids, path)
+            except Exception:
+                # a broken callback mustn't kill the watch thread
+                logger.exception("DeviceRegistry callback %r failed for %r at %r", callback, ids, path)
+
+    def ids(self, product_id=None) -> list:
+        with self._lock:
+            return [ids for ids in self.devices.values() if product_id in (None, ids[1])]
+
+    def get_L_ids(self) -> list:
+        return self.ids(JOYCON_L_PRODUCT_ID)
+
+    def get_R_ids(self) -> list:
+        return self.ids(JOYCON_R_PRODUCT_ID)
+
+    def get_pro_ids(self) -> list:
+        return self.ids(JOYCON_PRO_PRODUCT_ID)
+
+    def watch(self, interval: float = 1.0, use_udev: bool = None):
+        """Start refreshing in a daemon thread until ``stop()``."""
+        if self._thread is not None:
+            return
+        monitor = None
+        if use_udev is not False:
+            try:
+                import pyudev
+                monitor = pyudev.Monitor.from_netlink(pyudev.Context())
+                monitor.filter_by('hidraw')
+                monitor.start()
+            except (ImportError, OSError):
+                if use_udev:
+                    raise
+                monitor = None
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, args=(interval, monitor), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _watch(self, interval, monitor):  # daemon thread
+        while not self._stop.is_set():
+            if monitor is not None:
+                # wake on the first hidraw event, then let the burst of events settle
+                if monitor.poll(timeout=interval) is not None:
+                    self._stop.wait(0.2)
+                    while monitor.poll(timeout=0) is not None:
+                        pass
+            elif self._stop.wait(interval):
+                return
+            self.refresh()
@@ -1,133 +1,91 @@
 from .wrappers import PythonicJoyCon
+from .report import BUTTON_BITS
+from collections import deque
+import asyncio
+import time
+
+# (event name, bit in the button mask) of the buttons tracked on each side,
+# in the order their events are emitted when several change in one report
+_RIGHT_EVENTS = (
+    ("r", BUTTON_BITS["r"]), ("zr", BUTTON_BITS["zr"]), ("plus", BUTTON_BITS["plus"]),
+    ("a", BUTTON_BITS["a"]), ("b", BUTTON_BITS["b"]), ("x", BUTTON_BITS["x"]),
+    ("y", BUTTON_BITS["y"]), ("home", BUTTON_BITS["home"]),
+    ("right_sr", BUTTON_BITS["right_sr"]), ("right_sl", BUTTON_BITS["right_sl"]),
+)
+_LEFT_EVENTS = (
+    ("l", BUTTON_BITS["l"]), ("zl", BUTTON_BITS["zl"]), ("minus", BUTTON_BITS["minus"]),
+    ("up", BUTTON_BITS["up"]), ("down", BUTTON_BITS["down"]), ("left", BUTTON_BITS["left"]),
+    ("right", BUTTON_BITS["right"]), ("capture", BUTTON_BITS["capture"]),
+    ("left_sr", BUTTON_BITS["left_sr"]), ("left_sl", BUTTON_BITS["left_sl"]),
+)
 
 
 class ButtonEventJoyCon(PythonicJoyCon):
-    def __init__(self, *args, track_sticks=False, **kwargs):
-        super().__init__(*args, **kwargs)
+    """
+    A PythonicJoyCon that turns button presses and releases into events.
 
-        self._events_buffer = []  # TODO: perhaps use a deque instead?
+    Events are ``(button, state)`` tuples, queued with the
+    ``time.perf_counter()`` time they were detected. Read them with
+    ``events()`` or, from asyncio code, ``async for event in joycon.aevents()``.
+    Both drain the same queue.
+    """
+    def __init__(self, *args, track_sticks=False, **kwargs):
+        self._events_buffer = deque()  # (timestamp, button, state)
+        self._event_waiters = []       # (loop, asyncio.Event) of running aevents()
 
         self._event_handlers = {}
         self._event_track_sticks = track_sticks
+        self._previous_buttons = 0
 
-        self._previous_stick_l_btn = 0
-        self._previous_stick_r_btn = 0
-        self._previous_stick_r  = self._previous_stick_l  = (0, 0)
-        self._previous_r        = self._previous_l        = 0
-        self._previous_zr       = self._previous_zl       = 0
-        self._previous_plus     = self._previous_minus    = 0
-        self._previous_a        = self._previous_right    = 0
-        self._previous_b        = self._previous_down     = 0
-        self._previous_x        = self._previous_up       = 0
-        self._previous_y        = self._previous_left     = 0
-        self._previous_home     = self._previous_capture  = 0
-        self._previous_right_sr = self._previous_left_sr  = 0
-        self._previous_right_sl = self._previous_left_sl  = 0
+        super().__init__(*args, **kwargs)
 
         if self.is_left():
-            self.register_update_hook(self._event_tracking_update_hook_left)
+            table = (("stick_l_btn", BUTTON_BITS["l_stick"]),) if track_sticks else ()
+            table += _LEFT_EVENTS
         else:
-            self.register_update_hook(self._event_tracking_update_hook_right)
+            table = (("stick_r_btn", BUTTON_BITS["r_stick"]),) if track_sticks else ()
+            table += _RIGHT_EVENTS
+        self._event_table = tuple((name, 1 << bit) for name, bit in table)
+        self._event_mask = sum(bit for _, bit in self._event_table)
+
+        self.register_update_hook(self._event_tracking_update_hook)
 
     def joycon_button_event(self, button, state):  # overridable
-        self._events_buffer.append((button, state))
+        self._events_buffer.append((time.perf_counter(), button, state))
+        for loop, wakeup in self._event_waiters:
+            loop.call_soon_threadsafe(wakeup.set)
 
-    def events(self):
+    def events(self, timestamps=False):
+        """
+        Yield the queued events, oldest first, until the queue is empty.
+        With ``timestamps=True`` the events are ``(timestamp, button, state)``.
+        """
         while self._events_buffer:
-            yield self._events_buffer.pop(0)
+            event = self._events_buffer.popleft()
+            yield event if timestamps else event[1:]
 
-    @staticmethod
-    def _event_tracking_update_hook_right(self):
-        if self._event_track_sticks:
-            pressed = self.stick_r_btn
-            if self._previous_stick_r_btn != pressed:
-                self._previous_stick_r_btn = pressed
-                self.joycon_button_event("stick_r_btn", pressed)
-        pressed = self.r
-        if self._previous_r != pressed:
-            self._previous_r = pressed
-            self.joycon_button_event("r", pressed)
-        pressed = self.zr
-        if self._previous_zr != pressed:
-            self._previous_zr = pressed
-            self.joycon_button_event("zr", pressed)
-        pressed = self.plus
-        if self._previous_plus != pressed:
-            self._previous_plus = pressed
-            self.joycon_button_event("plus", pressed)
-        pressed = self.a
-        if self._previous_a != pressed:
-            self._previous_a = pressed
-            self.joycon_button_event("a", pressed)
-        pressed = self.b
-        if self._previous_b != pressed:
-            self._previous_b = pressed
-            self.joycon_button_event("b", pressed)
-        pressed = self.x
-        if self._previous_x != pressed:
-            self._previous_x = pressed
-            self.joycon_button_event("x", pressed)
-        pressed = self.y
-        if self._previous_y != pressed:
-            self._previous_y = pressed
-            self.joycon_button_event("y", pressed)
-        pressed = self.home
-        if self._previous_home != pressed:
-            self._previous_home = pressed
-            self.joycon_button_event("home", pressed)
-        pressed = self.right_sr
-        if self._previous_right_sr != pressed:
-            self._previous_right_sr = pressed
-            self.joycon_button_event("right_sr", pressed)
-        pressed = self.right_sl
-        if self._previous_right_sl != pressed:
-            self._previous_right_sl = pressed
-            self.joycon_button_event("right_sl", pressed)
+    async def aevents(self, timestamps=False):
+        """Like ``events()``, but waits for new events instead of stopping."""
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        self._event_waiters.append(waiter)
+        try:
+            while True:
+                waiter[1].clear()
+                while self._events_buffer:
+                    event = self._events_buffer.popleft()
+                    yield event if timestamps else event[1:]
+                    waiter[1].clear()
+                await waiter[1].wait()
+        finally:
+            self._event_waiters.remove(waiter)
 
     @staticmethod
-    def _event_tracking_update_hook_left(self):
-        if self._event_track_sticks:
-            pressed = self.stick_l_btn
-            if self._previous_stick_l_btn != pressed:
-                self._previous_stick_l_btn = pressed
-                self.joycon_button_event("stick_l_btn", pressed)
-        pressed = self.l
-        if self._previous_l != pressed:
-            self._previous_l = pressed
-            self.joycon_button_event("l", pressed)
-        pressed = self.zl
-        if self._previous_zl != pressed:
-            self._previous_zl = pressed
-            self.joycon_button_event("zl", pressed)
-        pressed = self.minus
-        if self._previous_minus != pressed:
-            self._previous_minus = pressed
-            self.joycon_button_event("minus", pressed)
-        pressed = self.up
-        if self._previous_up != pressed:
-            self._previous_up = pressed
-            self.joycon_button_event("up", pressed)
-        pressed = self.down
-        if self._previous_down != pressed:
-            self._previous_down = pressed
-            self.joycon_button_event("down", pressed)
-        pressed = self.left
-        if self._previous_left != pressed:
-            self._previous_left = pressed
-            self.joycon_button_event("left", pressed)
-        pressed = self.right
-        if self._previous_right != pressed:
-            self._previous_right = pressed
-            self.joycon_button_event("right", pressed)
-        pressed = self.capture
-        if self._previous_capture != pressed:
-            self._previous_capture = pressed
-            self.joycon_button_event("capture", pressed)
-        pressed = self.left_sr
-        if self._previous_left_sr != pressed:
-            self._previous_left_sr = pressed
-            self.joycon_button_event("left_sr", pressed)
-        pressed = self.left_sl
-        if self._previous_left_sl != pressed:
-            self._previous_left_sl = pressed
-            self.joycon_button_event("left_sl", pressed)
+    def _event_tracking_update_hook(self):
+        buttons = self._report.buttons
+        changed = (buttons ^ self._previous_buttons) & self._event_mask
+        if not changed:
+            return
+        self._previous_buttons = buttons
+        for name, bit in self._event_table:
+            if changed & bit:
+                self.joycon_button_event(name, 1 if buttons & bit else 0)
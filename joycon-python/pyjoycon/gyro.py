@@ -1,6 +1,9 @@
 from .wrappers import PythonicJoyCon
-from glm import vec2, vec3, quat, angleAxis, eulerAngles
+from .imu import GYRO_IN_RAD
+from glm import vec2, vec3, quat, angleAxis, eulerAngles, length
 from typing import Optional
+import queue
+import threading
 import time
 
 
@@ -10,15 +13,27 @@ class GyroTrackingJoyCon(PythonicJoyCon):
     and deduces the current rotation of the JoyCon. Can be used to create a
     pointer rotate an object or pointin a direction. Comes with the need to be
     calibrated.
+
+    With ``integrate_in_thread=True`` the reader thread only queues the
+    reports, and the rotation is integrated in a separate daemon thread.
     """
-    def __init__(self, *args, **kwargs):
+    # TODO: find out why 1/86 works, and not 1/60 or 1/(60*30)
+    _GYRO_STEP = GYRO_IN_RAD * (-1 / 86)
+
+    def __init__(self, *args, integrate_in_thread=False, **kwargs):
         super().__init__(*args, simple_mode=False, **kwargs)
 
         # set internal state:
         self.reset_orientation()
 
         # register the update callback
-        self.register_update_hook(self._gyro_update_hook)
+        if integrate_in_thread:
+            self._gyro_queue = queue.SimpleQueue()
+            self._gyro_thread = threading.Thread(target=self._gyro_integration_thread, daemon=True)
+            self._gyro_thread.start()
+            self.register_update_hook(self._gyro_enqueue_hook)
+        else:
+            self.register_update_hook(self._gyro_update_hook)
 
     @property
     def pointer(self) -> Optional[vec2]:
@@ -44,16 +59,10 @@ class GyroTrackingJoyCon(PythonicJoyCon):
 
     def _set_calibration(self, gyro_offset=None):
         if not gyro_offset:
-            c = vec3(1, self._ime_yz_coeff, self._ime_yz_coeff)
-            gyro_offset = self.calibration_acumulator * c
-            gyro_offset /= self.calibration_acumulations
-            gyro_offset += vec3(
-                    self._GYRO_OFFSET_X,
-                    self._GYRO_OFFSET_Y,
-                    self._GYRO_OFFSET_Z,
-                )
+            # the accumulator holds raw samples, so their mean is the offset
+            gyro_offset = self.calibration_acumulator / self.calibration_acumulations
         self.is_calibrating = False
-        self.set_gyro_calibration(gyro_offset)
+        self.set_gyro_calibration(tuple(gyro_offset))
 
     def reset_orientation(self):
         self.direction_X = vec3(1, 0, 0)
@@ -63,22 +72,45 @@ class GyroTrackingJoyCon(PythonicJoyCon):
 
     @staticmethod
     def _gyro_update_hook(self):
+        self._integrate_gyro(self._report.imu)
+
+    @staticmethod
+    def _gyro_enqueue_hook(self):
+        # the decoded samples are an immutable tuple, safe to hand over as is
+        self._gyro_queue.put(self._report.imu)
+
+    def _gyro_integration_thread(self):  # daemon thread
+        while True:
+            self._integrate_gyro(self._gyro_queue.get())
+
+    def _integrate_gyro(self, imu):
+        # the 3 raw gyro samples of the report, summed per axis
+        gyro_sum = vec3(
+            imu[3] + imu[9] + imu[15],
+            imu[4] + imu[10] + imu[16],
+            imu[5] + imu[11] + imu[17],
+        )
+
         if self.is_calibrating:
             if self.is_calibrating < time.time():
                 self._set_calibration()
             else:
-                for xyz in self.gyro:
-                    self.calibration_acumulator += xyz
+                self.calibration_acumulator += gyro_sum
                 self.calibration_acumulations += 3
 
-        for gx, gy, gz in self.gyro_in_rad:
-            # TODO: find out why 1/86 works, and not 1/60 or 1/(60*30)
-            rotation \
-                = angleAxis(gx * (-1/86), self.direction_X) \
-                * angleAxis(gy * (-1/86), self.direction_Y) \
-                * angleAxis(gz * (-1/86), self.direction_Z)
-
-            self.direction_X *= rotation
-            self.direction_Y *= rotation
-            self.direction_Z *= rotation
-            self.direction_Q *= rotation
+        # the rotation of all 3 samples in one step: a rotation vector in the
+        # joycon's own axes, turned into a single quaternion by its magnitude
+        c = self._ime_yz_coeff
+        w = (gyro_sum - 3 * vec3(self._GYRO_OFFSET_X, self._GYRO_OFFSET_Y, self._GYRO_OFFSET_Z)) \
+            * vec3(self._GYRO_COEFF_X, self._GYRO_COEFF_Y * c, self._GYRO_COEFF_Z * c) \
+            * self._GYRO_STEP
+        axis = self.direction_X * w.x + self.direction_Y * w.y + self.direction_Z * w.z
+        angle = length(axis)
+        if angle == 0:
+            return
+        rotation = angleAxis(angle, axis / angle)
+
+        self.direction_X *= rotation
+        self.direction_Y *= rotation
+        self.direction_Z *= rotation
+        self.direction_Q *= rotation
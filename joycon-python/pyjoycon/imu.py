@@ -0,0 +1,75 @@
+import threading
+
+import numpy as np
+
+IMU_OFFSET = 13          # the 3 samples occupy bytes 13..48 of a 0x30 report
+IMU_SAMPLES = 3
+IMU_SAMPLE_PERIOD = 0.005
+
+# unit conversions of the calibrated values, as used by PythonicJoyCon
+ACCEL_IN_G  = 4.0 / 0x4000
+GYRO_IN_DEG = 0.06103
+GYRO_IN_RAD = 0.0001694 * 3.1415926536
+GYRO_IN_ROT = 0.0001694
+
+
+def decode_imu(report: bytes) -> np.ndarray:
+    """
+    The three raw 6-axis samples of an input report as a read-only (3, 6)
+    int16 view: row ``i`` is accel x/y/z followed by gyro x/y/z of sample ``i``.
+    """
+    return np.frombuffer(report, dtype='<i2', count=IMU_SAMPLES * 6, offset=IMU_OFFSET) \
+        .reshape(IMU_SAMPLES, 6)
+
+
+class IMUHistory:
+    """
+    A ring buffer of the last ``seconds`` of raw IMU samples.
+
+    The reader thread pushes the three samples of every report; consumers
+    take a chronological copy with ``get()`` whenever they need history,
+    instead of polling every report. Each sample is timestamped with the
+    ``time.perf_counter()`` arrival time of its report, minus 5 ms per
+    sample it precedes the last one.
+    """
+
+    def __init__(self, seconds: float = 2.0, sample_period: float = IMU_SAMPLE_PERIOD):
+        self.sample_period = sample_period
+        self.capacity = max(IMU_SAMPLES, int(round(seconds / sample_period)))
+        self._samples = np.zeros((self.capacity, 6), dtype=np.int16)
+        self._times = np.zeros(self.capacity, dtype=np.float64)
+        self._ages = sample_period * np.arange(IMU_SAMPLES - 1, -1, -1)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    def push(self, samples: np.ndarray, timestamp: float):
+        with self._lock:
+            pos = self._count % self.capacity
+            if pos + IMU_SAMPLES <= self.capacity:
+                self._samples[pos:pos + IMU_SAMPLES] = samples
+                self._times[pos:pos + IMU_SAMPLES] = timestamp - self._ages
+            else:
+                idx = (pos + np.arange(IMU_SAMPLES)) % self.capacity
+                self._samples[idx] = samples
+                self._times[idx] = timestamp - self._ages
+            self._count += IMU_SAMPLES
+
+    def get(self, seconds: float = None) -> (np.ndarray, np.ndarray):
+        """(timestamps (n,), raw samples (n, 6) int16) of the last ``seconds``, oldest first."""
+        with self._lock:
+            n = len(self)
+            if seconds is not None:
+                n = min(n, int(round(seconds / self.sample_period)))
+            start = (self._count - n) % self.capacity
+            if start + n <= self.capacity:
+                return self._times[start:start + n].copy(), self._samples[start:start + n].copy()
+            wrap = start + n - self.capacity
+            return (np.concatenate([self._times[start:], self._times[:wrap]]),
+                    np.concatenate([self._samples[start:], self._samples[:wrap]]))
+
+    def clear(self):
+        with self._lock:
+            self._count = 0
@@ -1,16 +1,25 @@
 from .constants import JOYCON_VENDOR_ID, JOYCON_PRODUCT_IDS
 from .constants import JOYCON_L_PRODUCT_ID, JOYCON_R_PRODUCT_ID
-import hid
+from .cache import CalibrationCache
+from .imu import IMU_SAMPLE_PERIOD, IMUHistory, decode_imu
+from .report import STATUS_BUTTONS, InputReport
+from .transport import open_hid_device
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 import time
 import threading
 from typing import Optional
 
+import numpy as np
+
 # TODO: disconnect, power off sequence
 
 
 class JoyCon:
     _INPUT_REPORT_SIZE = 49
     _INPUT_REPORT_PERIOD = 0.015
+    _SUBCOMMAND_TIMEOUT = 0.5
+    _SUBCOMMAND_RETRIES = 2
     _RUMBLE_DATA = b'\x00\x01\x40\x40\x00\x01\x40\x40'
 
     vendor_id  : int
@@ -20,7 +29,18 @@ class JoyCon:
     color_body : (int, int, int)
     color_btn  : (int, int, int)
 
-    def __init__(self, vendor_id: int, product_id: int, serial: str = None, simple_mode=False):
+    def __init__(self, vendor_id: int, product_id: int, serial: str = None, simple_mode=False,
+                 transport=None, calibration_cache=True, path: bytes = None):
+        """
+        ``calibration_cache``: True for the default ``CalibrationCache``, a
+        ``CalibrationCache`` instance, or False to always read colors and
+        calibration from the controller. Only used when ``serial`` is known.
+
+        ``path``: the hid path of the controller, as passed to the
+        ``DeviceRegistry`` callbacks. Without it the first controller with
+        ``product_id`` is opened, which can't tell apart two controllers
+        that report no serial.
+        """
         if vendor_id != JOYCON_VENDOR_ID:
             raise ValueError(f'vendor_id is invalid: {vendor_id!r}')
 
@@ -36,109 +56,226 @@ class JoyCon:
         self._input_hooks = []
         self._input_report = bytes(self._INPUT_REPORT_SIZE)
         self._packet_number = 0
+        self._write_lock = threading.Lock()
+        self._pending_replies = {}  # reply key -> deque of Futures, oldest first
+        self._pending_lock = threading.Lock()
+        self._imu_history = None
+        if calibration_cache is True:
+            calibration_cache = CalibrationCache()
+        self._calibration_cache = calibration_cache if serial else None
+        self._imu_sign = self._imu_axis_sign()
+        self._imu_offset = np.zeros(6)
+        self._imu_coeff = np.ones(6)
         self.set_accel_calibration((0, 0, 0), (1, 1, 1))
         self.set_gyro_calibration((0, 0, 0), (1, 1, 1))
 
-        # connect to joycon
-        self._joycon_device = self._open(vendor_id, product_id, serial=None)
-        self._read_joycon_data()
-        self._setup_sensors()
+        # connect to joycon, or talk to the given transport (e.g. a SimulatedJoyCon)
+        if transport is not None:
+            self._joycon_device = transport
+        else:
+            self._joycon_device = self._open(vendor_id, product_id, serial=None, path=path)
 
-        # start talking with the joycon in a daemon thread
+        # start talking with the joycon in a daemon thread, which also
+        # delivers the subcommand replies the setup below waits for
         self._update_input_report_thread \
             = threading.Thread(target=self._update_input_report)
         self._update_input_report_thread.setDaemon(True)
         self._update_input_report_thread.start()
 
-    def _open(self, vendor_id, product_id, serial):
-        try:
-            if hasattr(hid, "device"):  # hidapi
-                _joycon_device = hid.device()
-                _joycon_device.open(vendor_id, product_id, serial)
-            elif hasattr(hid, "Device"):  # hid
-                _joycon_device = hid.Device(vendor_id, product_id, serial)
-            else:
-                raise Exception("Implementation of hid is not recognized!")
-        except IOError as e:
-            raise IOError('joycon connect failed') from e
-        return _joycon_device
+        self._read_joycon_data()
+        self._setup_sensors()
+
+    def _open(self, vendor_id, product_id, serial, path=None):
+        return open_hid_device(vendor_id, product_id, serial, path)
 
     def _close(self):
         if hasattr(self, "_joycon_device"):
             self._joycon_device.close()
             del self._joycon_device
 
+    @property
+    def _input_report(self) -> bytes:
+        return self._report.raw
+
+    @_input_report.setter
+    def _input_report(self, report: bytes):
+        # decode once per report; getters read the decoded fields. Parsing comes
+        # first, so a short report raises ValueError before anything is replaced,
+        # and the raw bytes and fields are published together as one object
+        self._report = InputReport(report)
+
     def _read_input_report(self) -> bytes:
         return bytes(self._joycon_device.read(self._INPUT_REPORT_SIZE))
 
     def _write_output_report(self, command, subcommand, argument):
         # TODO: add documentation
-        self._joycon_device.write(b''.join([
-            command,
-            self._packet_number.to_bytes(1, byteorder='little'),
-            self._RUMBLE_DATA,
-            subcommand,
-            argument,
-        ]))
-        self._packet_number = (self._packet_number + 1) & 0xF
-
-    def _send_subcmd_get_response(self, subcommand, argument) -> (bool, bytes):
-        # TODO: handle subcmd when daemon is running
-        self._write_output_report(b'\x01', subcommand, argument)
-
-        report = self._read_input_report()
-        while report[0] != 0x21:  # TODO, avoid this, await daemon instead
-            report = self._read_input_report()
-
-        # TODO, remove, see the todo above
-        assert report[1:2] != subcommand, "THREAD carefully"
+        with self._write_lock:
+            self._joycon_device.write(b''.join([
+                command,
+                self._packet_number.to_bytes(1, byteorder='little'),
+                self._RUMBLE_DATA,
+                subcommand,
+                argument,
+            ]))
+            self._packet_number = (self._packet_number + 1) & 0xF
 
-        # TODO: determine if the cut bytes are worth anything
-
-        return report[13] & 0x80, report[13:]  # (ack, data)
+    @staticmethod
+    def _reply_key(subcommand: int, argument: bytes):
+        # SPI reads are told apart by the address and size echoed in the reply,
+        # so several of them can be in flight at once
+        if subcommand == 0x10:
+            return (subcommand, bytes(argument[:5]))
+        return subcommand
+
+    def _send_subcommand(self, subcommand, argument) -> Future:
+        """
+        Send a subcommand without waiting for its reply. The returned Future
+        resolves to ``(ack, data)`` once the reader thread receives the 0x21
+        reply; replies with the same key are handed out in the order sent.
+        A cancelled Future gives up its place in the queue.
+        """
+        reply = Future()
+        reply.key = self._reply_key(subcommand[0], argument)
+        with self._pending_lock:
+            self._pending_replies.setdefault(reply.key, deque()).append(reply)
+        reply.add_done_callback(self._forget_reply)
+        self._write_output_report(b'\x01', subcommand, argument)
+        return reply
+
+    def _forget_reply(self, reply: Future):
+        with self._pending_lock:
+            waiting = self._pending_replies.get(reply.key)
+            if waiting is not None and reply in waiting:
+                waiting.remove(reply)
+                if not waiting:
+                    del self._pending_replies[reply.key]
+
+    def _wait_reply(self, reply: Future, subcommand, argument, timeout=None, retries=None) -> (bool, bytes):
+        """
+        Wait for a reply from ``_send_subcommand``. On timeout the Future is
+        cancelled and the subcommand is sent again with a new one, so a reply
+        that never comes doesn't leave a stale waiter behind.
+        """
+        timeout = self._SUBCOMMAND_TIMEOUT if timeout is None else timeout
+        retries = self._SUBCOMMAND_RETRIES if retries is None else retries
+        for attempt in range(retries + 1):
+            if attempt:
+                reply = self._send_subcommand(subcommand, argument)
+            try:
+                return reply.result(timeout)
+            except FutureTimeoutError:
+                if not reply.cancel():
+                    return reply.result()  # the reply came in just now
+        raise TimeoutError(f"No reply to subcommand {subcommand[0]:#04x} after {retries + 1} attempts")
+
+    def _send_subcmd_get_response(self, subcommand, argument, timeout=None, retries=None) -> (bool, bytes):
+        reply = self._send_subcommand(subcommand, argument)
+        return self._wait_reply(reply, subcommand, argument, timeout, retries)
+
+    def _dispatch_reply(self, report: bytes):
+        key = self._reply_key(report[14], report[15:20])
+        with self._pending_lock:
+            waiting = self._pending_replies.get(key)
+            reply = None
+            while waiting:
+                candidate = waiting.popleft()
+                # claim the Future so it can no longer be cancelled; skip cancelled ones
+                if candidate.set_running_or_notify_cancel():
+                    reply = candidate
+                    break
+            if waiting is not None and not waiting:
+                del self._pending_replies[key]
+        if reply is not None:  # otherwise a duplicate reply to a resent subcommand, or nobody asked
+            reply.set_result((report[13] & 0x80, report[13:]))
+
+    def _spi_flash_read_many(self, ranges) -> list:
+        """Read several (address, size) ranges, with all requests in flight at once."""
+        requests = []
+        for address, size in ranges:
+            assert size <= 0x1d
+            argument = address.to_bytes(4, "little") + size.to_bytes(1, "little")
+            requests.append((address, size, argument, self._send_subcommand(b'\x10', argument)))
+
+        out = []
+        for address, size, argument, reply in requests:
+            ack, report = self._wait_reply(reply, b'\x10', argument)
+            if not ack:
+                raise IOError(f"After SPI read @ {address:#06x}: got NACK")
+
+            if report[:2] != b'\x90\x10':
+                raise IOError("Something else than the expected ACK was recieved!")
+            assert report[2:7] == argument, (report[2:5], argument)
+
+            out.append(report[7:size+7])
+        return out
 
     def _spi_flash_read(self, address, size) -> bytes:
-        assert size <= 0x1d
-        argument = address.to_bytes(4, "little") + size.to_bytes(1, "little")
-        ack, report = self._send_subcmd_get_response(b'\x10', argument)
-        if not ack:
-            raise IOError("After SPI read @ {address:#06x}: got NACK")
-
-        if report[:2] != b'\x90\x10':
-            raise IOError("Something else than the expected ACK was recieved!")
-        assert report[2:7] == argument, (report[2:5], argument)
-
-        return report[7:size+7]
+        return self._spi_flash_read_many([(address, size)])[0]
 
     def _update_input_report(self):  # daemon thread
         while True:
             report = self._read_input_report()
-            # TODO, handle input reports of type 0x21 and 0x3f
-            while report[0] != 0x30:
-                report = self._read_input_report()
-
-            self._input_report = report
+            if report[0] == 0x21:
+                self._dispatch_reply(report)
+                continue
+            # TODO, handle input reports of type 0x3f
+            if report[0] != 0x30:
+                continue
+
+            try:
+                self._input_report = report
+            except ValueError:  # truncated read; keep the previous report
+                continue
+            if self._imu_history is not None:
+                self._imu_history.push(decode_imu(report), time.perf_counter())
 
             for callback in self._input_hooks:
                 callback(self)
 
     def _read_joycon_data(self):
-        color_data = self._spi_flash_read(0x6050, 6)
+        cached = None
+        if self._calibration_cache:
+            cached = self._calibration_cache.load(self.product_id, self.serial)
+        if cached is not None:
+            # use the cached data now and check it against the controller in the background
+            self._apply_joycon_data(*cached)
+            threading.Thread(target=self._refresh_joycon_data, args=cached, daemon=True).start()
+            return
+
+        color_data, imu_cal = self._read_spi_joycon_data()
+        self._apply_joycon_data(color_data, imu_cal)
+        if self._calibration_cache:
+            self._calibration_cache.store(self.product_id, self.serial, color_data, imu_cal)
+
+    def _refresh_joycon_data(self, cached_color_data, cached_imu_cal):
+        try:
+            color_data, imu_cal = self._read_spi_joycon_data()
+        except (IOError, AssertionError):
+            return  # keep the cached data, and try again on the next connect
+        if (color_data, imu_cal) != (cached_color_data, cached_imu_cal):
+            self._apply_joycon_data(color_data, imu_cal)
+            self._calibration_cache.store(self.product_id, self.serial, color_data, imu_cal)
+
+    def _read_spi_joycon_data(self) -> (bytes, bytes):
+        # colors, user IME magic, user and factory IME data in one batch
+        color_data, user_magic, user_imu_cal, factory_imu_cal = self._spi_flash_read_many([
+            (0x6050, 6), (0x8026, 2), (0x8028, 24), (0x6020, 24),
+        ])
 
         # TODO: use this
         # stick_cal_addr = 0x8012 if self.is_left else 0x801D
         # stick_cal  = self._spi_flash_read(stick_cal_addr, 8)
 
         # user IME data
-        if self._spi_flash_read(0x8026, 2) == b"\xB2\xA1":
+        if user_magic == b"\xB2\xA1":
             # print(f"Calibrate {self.serial} IME with user data")
-            imu_cal = self._spi_flash_read(0x8028, 24)
+            return color_data, user_imu_cal
 
         # factory IME data
-        else:
-            # print(f"Calibrate {self.serial} IME with factory data")
-            imu_cal = self._spi_flash_read(0x6020, 24)
+        # print(f"Calibrate {self.serial} IME with factory data")
+        return color_data, factory_imu_cal
 
+    def _apply_joycon_data(self, color_data: bytes, imu_cal: bytes):
         self.color_body = tuple(color_data[:3])
         self.color_btn  = tuple(color_data[3:])
 
@@ -164,11 +301,10 @@ class JoyCon:
         )
 
     def _setup_sensors(self):
-        # Enable 6 axis sensors
-        self._write_output_report(b'\x01', b'\x40', b'\x01')
-        # It needs delta time to update the setting
-        time.sleep(0.02)
-        # Change format of input report
+        # Enable 6 axis sensors, and wait until the controller has applied it
+        self._send_subcmd_get_response(b'\x40', b'\x01')
+        # Change format of input report. Nobody waits for this reply, so don't
+        # queue a waiter that would take the reply meant for a later 0x03
         self._write_output_report(b'\x01', b'\x03', b'\x30')
 
     @staticmethod
@@ -194,6 +330,10 @@ class JoyCon:
             self._GYRO_COEFF_X = 0x343b / cx if cx != 0x343b else 1
             self._GYRO_COEFF_Y = 0x343b / cy if cy != 0x343b else 1
             self._GYRO_COEFF_Z = 0x343b / cz if cz != 0x343b else 1
+        self._set_imu_calibration(
+            slice(3, 6),
+            (self._GYRO_OFFSET_X, self._GYRO_OFFSET_Y, self._GYRO_OFFSET_Z),
+            (self._GYRO_COEFF_X, self._GYRO_COEFF_Y, self._GYRO_COEFF_Z))
 
     def set_accel_calibration(self, offset_xyz=None, coeff_xyz=None):
         if offset_xyz:
@@ -205,6 +345,25 @@ class JoyCon:
             self._ACCEL_COEFF_X = 0x4000 / cx if cx != 0x4000 else 1
             self._ACCEL_COEFF_Y = 0x4000 / cy if cy != 0x4000 else 1
             self._ACCEL_COEFF_Z = 0x4000 / cz if cz != 0x4000 else 1
+        self._set_imu_calibration(
+            slice(0, 3),
+            (self._ACCEL_OFFSET_X, self._ACCEL_OFFSET_Y, self._ACCEL_OFFSET_Z),
+            (self._ACCEL_COEFF_X, self._ACCEL_COEFF_Y, self._ACCEL_COEFF_Z))
+
+    def _imu_axis_sign(self) -> np.ndarray:
+        # per-axis sign folded into the calibration (accel xyz, gyro xyz). Set once
+        # in __init__, before the first calibration is applied, so a background
+        # calibration refresh always sees it
+        return np.ones(6)
+
+    def _set_imu_calibration(self, axes: slice, offset, coeff):
+        # kept as (6,) arrays so get_imu calibrates all samples in one broadcast.
+        # The arrays are replaced, not modified, so a reader never sees half an update
+        imu_offset = self._imu_offset.copy()
+        imu_coeff = self._imu_coeff.copy()
+        imu_offset[axes] = offset
+        imu_coeff[axes] = np.multiply(coeff, self._imu_sign[axes])
+        self._imu_offset, self._imu_coeff = imu_offset, imu_coeff
 
     def register_update_hook(self, callback):
         self._input_hooks.append(callback)
@@ -217,217 +376,226 @@ class JoyCon:
         return self.product_id == JOYCON_R_PRODUCT_ID
 
     def get_battery_charging(self):
-        return self._get_nbit_from_input_report(2, 4, 1)
+        return self._report.battery_charging
 
     def get_battery_level(self):
-        return self._get_nbit_from_input_report(2, 5, 3)
+        return self._report.battery_level
 
     def get_button_y(self):
-        return self._get_nbit_from_input_report(3, 0, 1)
+        return (self._report.buttons >> 0) & 1
 
     def get_button_x(self):
-        return self._get_nbit_from_input_report(3, 1, 1)
+        return (self._report.buttons >> 1) & 1
 
     def get_button_b(self):
-        return self._get_nbit_from_input_report(3, 2, 1)
+        return (self._report.buttons >> 2) & 1
 
     def get_button_a(self):
-        return self._get_nbit_from_input_report(3, 3, 1)
+        return (self._report.buttons >> 3) & 1
 
     def get_button_right_sr(self):
-        return self._get_nbit_from_input_report(3, 4, 1)
+        return (self._report.buttons >> 4) & 1
 
     def get_button_right_sl(self):
-        return self._get_nbit_from_input_report(3, 5, 1)
+        return (self._report.buttons >> 5) & 1
 
     def get_button_r(self):
-        return self._get_nbit_from_input_report(3, 6, 1)
+        return (self._report.buttons >> 6) & 1
 
     def get_button_zr(self):
-        return self._get_nbit_from_input_report(3, 7, 1)
+        return (self._report.buttons >> 7) & 1
 
     def get_button_minus(self):
-        return self._get_nbit_from_input_report(4, 0, 1)
+        return (self._report.buttons >> 8) & 1
 
     def get_button_plus(self):
-        return self._get_nbit_from_input_report(4, 1, 1)
+        return (self._report.buttons >> 9) & 1
 
     def get_button_r_stick(self):
-        return self._get_nbit_from_input_report(4, 2, 1)
+        return (self._report.buttons >> 10) & 1
 
     def get_button_l_stick(self):
-        return self._get_nbit_from_input_report(4, 3, 1)
+        return (self._report.buttons >> 11) & 1
 
     def get_button_home(self):
-        return self._get_nbit_from_input_report(4, 4, 1)
+        return (self._report.buttons >> 12) & 1
 
     def get_button_capture(self):
-        return self._get_nbit_from_input_report(4, 5, 1)
+        return (self._report.buttons >> 13) & 1
 
     def get_button_charging_grip(self):
-        return self._get_nbit_from_input_report(4, 7, 1)
+        return (self._report.buttons >> 15) & 1
 
     def get_button_down(self):
-        return self._get_nbit_from_input_report(5, 0, 1)
+        return (self._report.buttons >> 16) & 1
 
     def get_button_up(self):
-        return self._get_nbit_from_input_report(5, 1, 1)
+        return (self._report.buttons >> 17) & 1
 
     def get_button_right(self):
-        return self._get_nbit_from_input_report(5, 2, 1)
+        return (self._report.buttons >> 18) & 1
 
     def get_button_left(self):
-        return self._get_nbit_from_input_report(5, 3, 1)
+        return (self._report.buttons >> 19) & 1
 
     def get_button_left_sr(self):
-        return self._get_nbit_from_input_report(5, 4, 1)
+        return (self._report.buttons >> 20) & 1
 
     def get_button_left_sl(self):
-        return self._get_nbit_from_input_report(5, 5, 1)
+        return (self._report.buttons >> 21) & 1
 
     def get_button_l(self):
-        return self._get_nbit_from_input_report(5, 6, 1)
+        return (self._report.buttons >> 22) & 1
 
     def get_button_zl(self):
-        return self._get_nbit_from_input_report(5, 7, 1)
+        return (self._report.buttons >> 23) & 1
 
     def get_stick_left_horizontal(self):
-        return self._get_nbit_from_input_report(6, 0, 8) \
-            | (self._get_nbit_from_input_report(7, 0, 4) << 8)
+        return self._report.stick_left[0]
 
     def get_stick_left_vertical(self):
-        return self._get_nbit_from_input_report(7, 4, 4) \
-            | (self._get_nbit_from_input_report(8, 0, 8) << 4)
+        return self._report.stick_left[1]
 
     def get_stick_right_horizontal(self):
-        return self._get_nbit_from_input_report(9, 0, 8) \
-            | (self._get_nbit_from_input_report(10, 0, 4) << 8)
+        return self._report.stick_right[0]
 
     def get_stick_right_vertical(self):
-        return self._get_nbit_from_input_report(10, 4, 4) \
-            | (self._get_nbit_from_input_report(11, 0, 8) << 4)
+        return self._report.stick_right[1]
 
     def get_accel_x(self, sample_idx=0):
         if sample_idx not in (0, 1, 2):
             raise IndexError('sample_idx should be between 0 and 2')
-        data = self._to_int16le_from_2bytes(
-            self._input_report[13 + sample_idx * 12],
-            self._input_report[14 + sample_idx * 12])
+        data = self._report.imu[sample_idx * 6 + 0]
         return (data - self._ACCEL_OFFSET_X) * self._ACCEL_COEFF_X
 
     def get_accel_y(self, sample_idx=0):
         if sample_idx not in (0, 1, 2):
             raise IndexError('sample_idx should be between 0 and 2')
-        data = self._to_int16le_from_2bytes(
-            self._input_report[15 + sample_idx * 12],
-            self._input_report[16 + sample_idx * 12])
+        data = self._report.imu[sample_idx * 6 + 1]
         return (data - self._ACCEL_OFFSET_Y) * self._ACCEL_COEFF_Y
 
     def get_accel_z(self, sample_idx=0):
         if sample_idx not in (0, 1, 2):
             raise IndexError('sample_idx should be between 0 and 2')
-        data = self._to_int16le_from_2bytes(
-            self._input_report[17 + sample_idx * 12],
-            self._input_report[18 + sample_idx * 12])
+        data = self._report.imu[sample_idx * 6 + 2]
         return (data - self._ACCEL_OFFSET_Z) * self._ACCEL_COEFF_Z
 
     def get_gyro_x(self, sample_idx=0):
         if sample_idx not in (0, 1, 2):
             raise IndexError('sample_idx should be between 0 and 2')
-        data = self._to_int16le_from_2bytes(
-            self._input_report[19 + sample_idx * 12],
-            self._input_report[20 + sample_idx * 12])
+        data = self._report.imu[sample_idx * 6 + 3]
         return (data - self._GYRO_OFFSET_X) * self._GYRO_COEFF_X
 
     def get_gyro_y(self, sample_idx=0):
         if sample_idx not in (0, 1, 2):
             raise IndexError('sample_idx should be between 0 and 2')
-        data = self._to_int16le_from_2bytes(
-            self._input_report[21 + sample_idx * 12],
-            self._input_report[22 + sample_idx * 12])
+        data = self._report.imu[sample_idx * 6 + 4]
         return (data - self._GYRO_OFFSET_Y) * self._GYRO_COEFF_Y
 
     def get_gyro_z(self, sample_idx=0):
         if sample_idx not in (0, 1, 2):
             raise IndexError('sample_idx should be between 0 and 2')
-        data = self._to_int16le_from_2bytes(
-            self._input_report[23 + sample_idx * 12],
-            self._input_report[24 + sample_idx * 12])
+        data = self._report.imu[sample_idx * 6 + 5]
         return (data - self._GYRO_OFFSET_Z) * self._GYRO_COEFF_Z
 
+    def get_imu_raw(self) -> np.ndarray:
+        """The 3 samples of the last report as a (3, 6) int16 array (accel xyz, gyro xyz)."""
+        return decode_imu(self._report.raw)
+
+    def get_imu(self, scale=None, dtype=np.float32) -> np.ndarray:
+        """
+        The 3 calibrated samples of the last report as a (3, 6) array.
+        ``scale`` (a scalar or one factor per column) converts to other units,
+        e.g. ``imu.ACCEL_IN_G`` for the first three columns.
+        """
+        return self._calibrate_imu(decode_imu(self._report.raw), scale, dtype)
+
+    def enable_imu_history(self, seconds: float = 2.0) -> IMUHistory:
+        """Keep the raw IMU samples of the last ``seconds`` in a ring buffer."""
+        if self._imu_history is None or self._imu_history.capacity * IMU_SAMPLE_PERIOD < seconds:
+            self._imu_history = IMUHistory(seconds)
+        return self._imu_history
+
+    def disable_imu_history(self):
+        self._imu_history = None
+
+    def get_imu_history(self, seconds: float = None, scale=None, dtype=np.float32):
+        """
+        (timestamps (n,), samples (n, 6)) of the last ``seconds``, oldest first,
+        calibrated like ``get_imu``. Needs ``enable_imu_history`` first.
+        """
+        if self._imu_history is None:
+            raise RuntimeError('IMU history is not enabled, call enable_imu_history() first')
+        times, raw = self._imu_history.get(seconds)
+        return times, self._calibrate_imu(raw, scale, dtype)
+
+    def _calibrate_imu(self, raw: np.ndarray, scale, dtype) -> np.ndarray:
+        imu = np.multiply(raw - self._imu_offset, self._imu_coeff, dtype=dtype)
+        if scale is not None:
+            imu *= np.asarray(scale, dtype=dtype)
+        return imu
+
     def get_status(self) -> dict:
+        # read every field from the same report, even if a new one arrives meanwhile
+        r = self._report
+        buttons = r.buttons
+        imu = r.imu
         return {
             "battery": {
-                "charging": self.get_battery_charging(),
-                "level": self.get_battery_level(),
+                "charging": r.battery_charging,
+                "level": r.battery_level,
             },
             "buttons": {
-                "right": {
-                    "y": self.get_button_y(),
-                    "x": self.get_button_x(),
-                    "b": self.get_button_b(),
-                    "a": self.get_button_a(),
-                    "sr": self.get_button_right_sr(),
-                    "sl": self.get_button_right_sl(),
-                    "r": self.get_button_r(),
-                    "zr": self.get_button_zr(),
-                },
-                "shared": {
-                    "minus": self.get_button_minus(),
-                    "plus": self.get_button_plus(),
-                    "r-stick": self.get_button_r_stick(),
-                    "l-stick": self.get_button_l_stick(),
-                    "home": self.get_button_home(),
-                    "capture": self.get_button_capture(),
-                    "charging-grip": self.get_button_charging_grip(),
-                },
-                "left": {
-                    "down": self.get_button_down(),
-                    "up": self.get_button_up(),
-                    "right": self.get_button_right(),
-                    "left": self.get_button_left(),
-                    "sr": self.get_button_left_sr(),
-                    "sl": self.get_button_left_sl(),
-                    "l": self.get_button_l(),
-                    "zl": self.get_button_zl(),
-                }
+                group: {name: (buttons >> bit) & 1 for name, bit in bits}
+                for group, bits in STATUS_BUTTONS
             },
             "analog-sticks": {
                 "left": {
-                    "horizontal": self.get_stick_left_horizontal(),
-                    "vertical": self.get_stick_left_vertical(),
+                    "horizontal": r.stick_left[0],
+                    "vertical": r.stick_left[1],
                 },
                 "right": {
-                    "horizontal": self.get_stick_right_horizontal(),
-                    "vertical": self.get_stick_right_vertical(),
+                    "horizontal": r.stick_right[0],
+                    "vertical": r.stick_right[1],
                 },
             },
             "accel": {
-                "x": self.get_accel_x(),
-                "y": self.get_accel_y(),
-                "z": self.get_accel_z(),
+                "x": (imu[0] - self._ACCEL_OFFSET_X) * self._ACCEL_COEFF_X,
+                "y": (imu[1] - self._ACCEL_OFFSET_Y) * self._ACCEL_COEFF_Y,
+                "z": (imu[2] - self._ACCEL_OFFSET_Z) * self._ACCEL_COEFF_Z,
             },
             "gyro": {
-                "x": self.get_gyro_x(),
-                "y": self.get_gyro_y(),
-                "z": self.get_gyro_z(),
+                "x": (imu[3] - self._GYRO_OFFSET_X) * self._GYRO_COEFF_X,
+                "y": (imu[4] - self._GYRO_OFFSET_Y) * self._GYRO_COEFF_Y,
+                "z": (imu[5] - self._GYRO_OFFSET_Z) * self._GYRO_COEFF_Z,
             },
         }
 
-    def set_player_lamp_on(self, on_pattern: int):
-        self._write_output_report(
-            b'\x01', b'\x30',
-            (on_pattern & 0xF).to_bytes(1, byteorder='little'))
+    # The subcommands below don't wait for the reply by default; pass
+    # wait=True to block until the controller answers and get (ack, data).
+
+    def _run_subcommand(self, subcommand, argument, wait: bool):
+        if wait:
+            return self._send_subcmd_get_response(subcommand, argument)
+        self._write_output_report(b'\x01', subcommand, argument)
+
+    def set_player_lamp_on(self, on_pattern: int, wait: bool = False):
+        return self._run_subcommand(
+            b'\x30',
+            (on_pattern & 0xF).to_bytes(1, byteorder='little'), wait)
+
+    def set_player_lamp_flashing(self, flashing_pattern: int, wait: bool = False):
+        return self._run_subcommand(
+            b'\x30',
+            ((flashing_pattern & 0xF) << 4).to_bytes(1, byteorder='little'), wait)
 
-    def set_player_lamp_flashing(self, flashing_pattern: int):
-        self._write_output_report(
-            b'\x01', b'\x30',
-            ((flashing_pattern & 0xF) << 4).to_bytes(1, byteorder='little'))
+    def set_player_lamp(self, pattern: int, wait: bool = False):
+        return self._run_subcommand(
+            b'\x30',
+            pattern.to_bytes(1, byteorder='little'), wait)
 
-    def set_player_lamp(self, pattern: int):
-        self._write_output_report(
-            b'\x01', b'\x30',
-            pattern.to_bytes(1, byteorder='little'))
+    def enable_vibration(self, enable: bool = True, wait: bool = False):
+        return self._run_subcommand(b'\x48', b'\x01' if enable else b'\x00', wait)
 
     def disconnect_device(self):
         self._write_output_report(b'\x01', b'\x06', b'\x00')
@@ -0,0 +1,58 @@
+import struct
+
+# bit index of every button in the 24-bit mask made of input report bytes 3..5
+BUTTON_BITS = {
+    # byte 3: right joycon
+    "y": 0, "x": 1, "b": 2, "a": 3, "right_sr": 4, "right_sl": 5, "r": 6, "zr": 7,
+    # byte 4: shared
+    "minus": 8, "plus": 9, "r_stick": 10, "l_stick": 11, "home": 12, "capture": 13,
+    "charging_grip": 15,
+    # byte 5: left joycon
+    "down": 16, "up": 17, "right": 18, "left": 19, "left_sr": 20, "left_sl": 21, "l": 22, "zl": 23,
+}
+
+# the layout of the "buttons" section of JoyCon.get_status()
+STATUS_BUTTONS = (
+    ("right", (("y", 0), ("x", 1), ("b", 2), ("a", 3), ("sr", 4), ("sl", 5), ("r", 6), ("zr", 7))),
+    ("shared", (("minus", 8), ("plus", 9), ("r-stick", 10), ("l-stick", 11), ("home", 12),
+                ("capture", 13), ("charging-grip", 15))),
+    ("left", (("down", 16), ("up", 17), ("right", 18), ("left", 19), ("sr", 20), ("sl", 21),
+              ("l", 22), ("zl", 23))),
+)
+
+_HEADER = struct.Struct('<BBB3s6B')  # id, timer, battery, buttons, left and right sticks
+_IMU = struct.Struct('<18h')         # 3 samples of accel xyz + gyro xyz
+_IMU_OFFSET = 13
+INPUT_REPORT_SIZE = _IMU_OFFSET + _IMU.size  # 49
+
+
+class InputReport:
+    """
+    A standard input report decoded once, so the getters don't have to
+    re-parse the raw bytes on every call.
+
+    ``raw`` is the report itself and ``imu`` holds the raw int16 samples:
+    ``imu[6 * i + k]`` is accel x/y/z for k = 0..2 and gyro x/y/z for k = 3..5
+    of sample ``i``. Reports shorter than ``INPUT_REPORT_SIZE`` raise ValueError.
+    """
+
+    __slots__ = (
+        "raw", "report_id", "timer", "battery_charging", "battery_level",
+        "buttons", "stick_left", "stick_right", "imu",
+    )
+
+    def __init__(self, report: bytes):
+        if len(report) < INPUT_REPORT_SIZE:
+            raise ValueError(f'input report is too short: {len(report)} < {INPUT_REPORT_SIZE} bytes')
+        self.raw = report
+        (self.report_id, self.timer, battery, buttons,
+         l0, l1, l2, r0, r1, r2) = _HEADER.unpack_from(report)
+        self.battery_charging = (battery >> 4) & 1
+        self.battery_level = (battery >> 5) & 7
+        self.buttons = int.from_bytes(buttons, 'little')
+        self.stick_left = (l0 | ((l1 & 0xF) << 8), (l1 >> 4) | (l2 << 4))
+        self.stick_right = (r0 | ((r1 & 0xF) << 8), (r1 >> 4) | (r2 << 4))
+        self.imu = _IMU.unpack_from(report, _IMU_OFFSET)
+
+    def button(self, name: str) -> int:
+        return (self.buttons >> BUTTON_BITS[name]) & 1
@@ -0,0 +1,212 @@
+import os
+import struct
+import threading
+import time
+from collections import deque
+
+from .constants import JOYCON_L_PRODUCT_ID
+from .transport import Transport
+
+
+class SimulatedJoyCon(Transport):
+    """
+    An in-process Joy-Con that can be passed to ``JoyCon(..., transport=...)``.
+
+    It answers SPI flash reads from an in-memory flash image, acknowledges
+    every other subcommand, streams 0x30 input reports every
+    ``report_period`` seconds once the host selects that mode, and records
+    every output report together with its ``time.perf_counter()`` timestamp.
+
+    Subcommand replies are delivered ``reply_latency`` seconds after the
+    subcommand was written (a real controller over Bluetooth answers in the
+    next report slot or two).
+
+    Every write blocks for ``write_latency`` seconds, like a busy Bluetooth
+    link, and is timestamped when it completes. The rumble writes (0x10)
+    whose index is in ``stall_at`` take ``stall`` seconds longer. After
+    ``unplug_after`` rumble writes the device is unplugged: see ``unplug``.
+    """
+
+    INPUT_REPORT_SIZE = 49
+    SPI_FLASH_SIZE = 0x80000
+
+    def __init__(self, product_id: int = JOYCON_L_PRODUCT_ID,
+                 report_period: float = 0.015, reply_latency: float = 0.0,
+                 write_latency: float = 0.0, stall_at=(), stall: float = 0.0, unplug_after: int = None,
+                 color_body=(0x0A, 0xB9, 0xE6), color_btn=(0x00, 0x1E, 0x1E),
+                 accel_offset=(0, 0, 0), accel_coeff=(0x4000, 0x4000, 0x4000),
+                 gyro_offset=(0, 0, 0), gyro_coeff=(0x343B, 0x343B, 0x343B)):
+        self.product_id = product_id
+        self.report_period = report_period
+        self.reply_latency = reply_latency
+        self.write_latency = write_latency
+        self.stall_at = stall_at
+        self.stall = stall
+        self.unplug_after = unplug_after
+
+        # unwritten flash reads back as 0xFF, so there is no user calibration
+        self.spi_flash = bytearray(b'\xFF' * self.SPI_FLASH_SIZE)
+        self.spi_flash[0x6050:0x6056] = bytes(color_body) + bytes(color_btn)
+        self.spi_flash[0x6020:0x6038] = struct.pack(
+            '<12h', *accel_offset, *accel_coeff, *gyro_offset, *gyro_coeff)
+
+        # input state, editable by the test while the device is running
+        self.battery = 0x8E  # full, not charging, joy-con powered
+        self.buttons = bytearray(3)
+        self.stick_left = (0x800, 0x800)
+        self.stick_right = (0x800, 0x800)
+        self.imu = [(0, 0, 4096, 0, 0, 0)] * 3  # accel xyz, gyro xyz per sample
+
+        self.output_reports = []  # (timestamp, report)
+        self.reports_sent = 0
+        self.rumble_writes = 0
+        self.unplugged = False
+        self.input_mode = None
+        self.imu_enabled = False
+
+        self._timer = 0
+        self._replies = deque()  # (due, report)
+        self._cond = threading.Condition()
+        self._next_report = None
+        self._closed = False
+
+    # --- Transport ---
+
+    def write(self, data: bytes) -> int:
+        data = bytes(data)
+        if self.unplugged or data[0] == 0x10 and self.rumble_writes == self.unplug_after:
+            self.unplug()
+            raise OSError("write error")
+        delay = self.write_latency
+        if data[0] == 0x10:
+            if self.rumble_writes in self.stall_at:
+                delay += self.stall
+            self.rumble_writes += 1
+        if delay > 0:
+            time.sleep(delay)
+        self.output_reports.append((time.perf_counter(), data))
+        if data[0] == 0x01 and len(data) > 10:
+            self._handle_subcommand(data[10], data[11:])
+        return len(data)
+
+    def read(self, size: int) -> bytes:
+        report = self._next_input_report()
+        if report is None:
+            # a closed device never delivers another report
+            with self._cond:
+                while True:
+                    self._cond.wait()
+        return report[:size]
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def unplug(self):
+        """Every later write raises OSError, as hidapi does for a removed device, and no more reports arrive."""
+        self.unplugged = True
+        self.close()
+
+    def serve(self, fd: int):
+        """
+        Act as the device at the other end of ``fd``, e.g. a socketpair
+        given to ``FdTransport``: output reports read from ``fd`` are handled
+        as by ``write``, and input reports are written to it. Returns once
+        the host closes its end.
+        """
+        def host_to_device():
+            while True:
+                try:
+                    data = os.read(fd, 64)
+                except OSError:
+                    data = b''
+                if not data:
+                    self.close()
+                    return
+                self.write(data)
+
+        threading.Thread(target=host_to_device, daemon=True).start()
+        while True:
+            report = self._next_input_report()
+            if report is None:
+                return
+            try:
+                os.write(fd, report)
+            except OSError:
+                self.close()
+                return
+
+    # --- recorded output ---
+
+    def rumble_reports(self) -> list:
+        """(timestamp, 8 rumble bytes) of every output report that carried rumble data."""
+        return [(t, r[2:10]) for t, r in self.output_reports if r[0] in (0x01, 0x10)]
+
+    # --- device behaviour ---
+
+    def _next_input_report(self):
+        """Block until the next reply or 0x30 report is due; None once closed."""
+        with self._cond:
+            while True:
+                if self._closed:
+                    return None
+                now = time.perf_counter()
+                if self._replies and self._replies[0][0] <= now:
+                    return self._replies.popleft()[1]
+                due = self._next_report if self.input_mode == 0x30 else None
+                if self._replies and (due is None or self._replies[0][0] < due):
+                    # a reply is due before the next 0x30 report
+                    self._cond.wait(self._replies[0][0] - now)
+                    continue
+                if due is not None:
+                    break
+                self._cond.wait()
+
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        with self._cond:
+            # a host that falls behind gets the next report immediately, not a burst
+            self._next_report = max(due + self.report_period, time.perf_counter())
+            return self._standard_report(0x30)
+
+    def _handle_subcommand(self, subcommand: int, argument: bytes):
+        reply = b''
+        if subcommand == 0x10:  # SPI flash read
+            address = int.from_bytes(argument[:4], 'little')
+            size = argument[4]
+            reply = argument[:5] + bytes(self.spi_flash[address:address + size])
+            ack = 0x90
+        else:
+            if subcommand == 0x03:  # set input report mode
+                self.input_mode = argument[0]
+                self._next_report = time.perf_counter()
+            elif subcommand == 0x40:  # enable IMU
+                self.imu_enabled = bool(argument[0])
+            ack = 0x80
+
+        with self._cond:
+            report = bytearray(self._standard_report(0x21))
+            report[13] = ack
+            report[14] = subcommand
+            report[15:15 + len(reply)] = reply
+            self._replies.append((time.perf_counter() + self.reply_latency, bytes(report)))
+            self._cond.notify_all()
+
+    def _standard_report(self, report_id: int) -> bytes:
+        report = bytearray(self.INPUT_REPORT_SIZE)
+        report[0] = report_id
+        report[1] = self._timer
+        self._timer = (self._timer + 1) & 0xFF
+        report[2] = self.battery
+        report[3:6] = self.buttons
+        for offset, (h, v) in ((6, self.stick_left), (9, self.stick_right)):
+            report[offset] = h & 0xFF
+            report[offset + 1] = ((h >> 8) & 0x0F) | ((v & 0x0F) << 4)
+            report[offset + 2] = (v >> 4) & 0xFF
+        if report_id == 0x30 and self.imu_enabled:
+            for i, sample in enumerate(self.imu):
+                struct.pack_into('<6h', report, 13 + i * 12, *sample)
+        self.reports_sent += report_id == 0x30
+        return bytes(report)
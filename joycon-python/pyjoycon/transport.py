@@ -0,0 +1,100 @@
+import os
+
+import hid
+
+
+class Transport:
+    """
+    The interface JoyCon uses to talk to a device.
+
+    Anything with these three methods can be passed as ``JoyCon(..., transport=...)``,
+    e.g. an already opened hid device or a ``SimulatedJoyCon``.
+    """
+
+    def read(self, size: int) -> bytes:
+        """Block until the next input report arrives and return it."""
+        raise NotImplementedError
+
+    def write(self, data: bytes) -> int:
+        """Send one output report."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+def open_hid_device(vendor_id: int, product_id: int, serial: str = None, path: bytes = None):
+    """
+    Open a physical device with whichever hid binding is installed: the one
+    at ``path`` (as returned by ``hid.enumerate``) if given, otherwise the
+    first one matching the ids.
+    """
+    try:
+        if hasattr(hid, "device"):  # hidapi
+            device = hid.device()
+            if path is not None:
+                device.open_path(path)
+            else:
+                device.open(vendor_id, product_id, serial)
+        elif hasattr(hid, "Device"):  # hid
+            if path is not None:
+                device = hid.Device(path=path)
+            else:
+                device = hid.Device(vendor_id, product_id, serial)
+        else:
+            raise Exception("Implementation of hid is not recognized!")
+    except IOError as e:
+        raise IOError('joycon connect failed') from e
+    return device
+
+
+class FdTransport(Transport):
+    """
+    A device opened as a file descriptor: a hidraw node, or one end of a
+    socketpair whose other end is served by ``SimulatedJoyCon.serve``.
+    Every read and write is one whole report.
+    """
+
+    def __init__(self, fd: int):
+        self.fd = fd
+
+    def fileno(self) -> int:
+        return self.fd
+
+    def read(self, size: int) -> bytes:
+        return os.read(self.fd, size)
+
+    def write(self, data: bytes) -> int:
+        return os.write(self.fd, data)
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+def find_hidraw(vendor_id: int, product_id: int, serial: str = None,
+                root: str = '/sys/class/hidraw') -> str:
+    """The /dev/hidrawN node of a device, matched by the HID_ID and HID_UNIQ in its uevent."""
+    for node in sorted(os.listdir(root) if os.path.isdir(root) else ()):
+        try:
+            with open(os.path.join(root, node, 'device', 'uevent')) as f:
+                fields = dict(line.rstrip('\n').split('=', 1) for line in f if '=' in line)
+            _, vid, pid = fields['HID_ID'].split(':')
+        except (OSError, KeyError, ValueError):
+            continue
+        if int(vid, 16) != vendor_id or int(pid, 16) != product_id:
+            continue
+        if serial is not None and fields.get('HID_UNIQ', '').lower() != serial.lower():
+            continue
+        return os.path.join('/dev', node)
+    raise IOError('joycon connect failed')
+
+
+def open_hidraw(vendor_id: int, product_id: int, serial: str = None, blocking: bool = True) -> FdTransport:
+    """Open a physical device through its Linux hidraw node, bypassing the hid binding."""
+    flags = os.O_RDWR | (0 if blocking else os.O_NONBLOCK)
+    try:
+        return FdTransport(os.open(find_hidraw(vendor_id, product_id, serial), flags))
+    except OSError as e:
+        raise IOError('joycon connect failed') from e
@@ -1,4 +1,7 @@
 from .joycon import JoyCon
+from .imu import ACCEL_IN_G, GYRO_IN_DEG, GYRO_IN_RAD, GYRO_IN_ROT
+
+import numpy as np
 
 
 # Preferably, this class gets merged into the
@@ -16,8 +19,13 @@ class PythonicJoyCon(JoyCon):
     """
 
     def __init__(self, *a, invert_left_ime_yz=True, **kw):
+        self._invert_left_ime_yz = invert_left_ime_yz
         super().__init__(*a, **kw)
-        self._ime_yz_coeff = -1 if invert_left_ime_yz and self.is_left() else 1
+
+    def _imu_axis_sign(self) -> np.ndarray:
+        # fold the inversion into the calibration used by get_imu
+        self._ime_yz_coeff = -1 if self._invert_left_ime_yz and self.is_left() else 1
+        return np.array([1, self._ime_yz_coeff, self._ime_yz_coeff] * 2, dtype=np.float64)
 
     is_charging   = property(JoyCon.get_battery_charging)
     battery_level = property(JoyCon.get_battery_level)
@@ -65,6 +73,11 @@ class PythonicJoyCon(JoyCon):
             self.get_stick_right_vertical(),
         )
 
+    @property
+    def imu(self):
+        """All 3 samples as one (3, 6) float32 array of accel xyz and gyro xyz."""
+        return self.get_imu()
+
     @property
     def accel(self):
         c = self._ime_yz_coeff
@@ -79,7 +92,7 @@ class PythonicJoyCon(JoyCon):
 
     @property
     def accel_in_g(self):
-        c = 4.0 / 0x4000
+        c = ACCEL_IN_G
         c2 = c * self._ime_yz_coeff
         return [
             (
@@ -104,7 +117,7 @@ class PythonicJoyCon(JoyCon):
 
     @property
     def gyro_in_deg(self):
-        c = 0.06103
+        c = GYRO_IN_DEG
         c2 = c * self._ime_yz_coeff
         return [
             (
@@ -117,7 +130,7 @@ class PythonicJoyCon(JoyCon):
 
     @property
     def gyro_in_rad(self):
-        c = 0.0001694 * 3.1415926536
+        c = GYRO_IN_RAD
         c2 = c * self._ime_yz_coeff
         return [
             (
@@ -130,7 +143,7 @@ class PythonicJoyCon(JoyCon):
 
     @property
     def gyro_in_rot(self):
-        c = 0.0001694
+        c = GYRO_IN_ROT
         c2 = c * self._ime_yz_coeff
         return [
             (
@@ -0,0 +1,267 @@
+import math
+import struct
+from bisect import bisect_right
+from functools import lru_cache
+
+import numpy as np
+
+# ==========================================
+# Joy-Con HD振動フォーマットへのエンコード
+# ==========================================
+FREQ_MAX = 1252.0
+NEUTRAL_RUMBLE = b'\x00\x01\x40\x40'
+FRAME_SIZE = 8  # 左右モーター分の4バイト x 2
+
+
+def _encode_frequency(freq: float) -> int:
+    return int(round(math.log2(freq / 10.0) * 32.0)) if freq >= 10.0 else 0
+
+
+def _encode_amplitude(amp: float) -> int:
+    if amp == 0.0:
+        return 0
+    elif amp > 0.23:
+        return int(round(math.log2(amp * 8.7) * 32.0))
+    elif amp > 0.12:
+        return int(round(math.log2(amp * 17.0) * 16.0))
+    else:
+        val = int(round(math.log2(amp * 120.0) * 8.0))
+        return max(0, val)
+
+
+def _pack_codes(hf_code: int, hf_amp_code: int, lf_code: int, lf_amp_code: int) -> bytes:
+    hf = (hf_code - 0x60) * 4
+    hf_amp_byte = hf_amp_code * 2
+    lf = lf_code - 0x40
+    lf_amp_byte = (lf_amp_code // 2) + 64
+
+    byte0 = hf & 0xFF
+    byte1 = (hf_amp_byte + ((hf >> 8) & 0xFF)) & 0xFF
+    byte2 = (lf + ((lf_amp_byte >> 8) & 0xFF)) & 0xFF
+    byte3 = lf_amp_byte & 0xFF
+    return bytes([byte0, byte1, byte2, byte3])
+
+
+def _encode_joycon_rumble_formula(hf_freq: float, hf_amp: float, lf_freq: float, lf_amp: float) -> bytes:
+    """
+    テーブルを使わない元の計算式によるエンコード。
+    ルックアップテーブルの構築元であり、一致確認の基準でもある。
+    """
+    if hf_amp == 0.0 and lf_amp == 0.0:
+        return NEUTRAL_RUMBLE
+
+    hf_freq = max(0.0, min(FREQ_MAX, hf_freq))
+    lf_freq = max(0.0, min(FREQ_MAX, lf_freq))
+    hf_amp  = max(0.0, min(1.0, hf_amp))
+    lf_amp  = max(0.0, min(1.0, lf_amp))
+
+    return _pack_codes(
+        _encode_frequency(hf_freq), _encode_amplitude(hf_amp),
+        _encode_frequency(lf_freq), _encode_amplitude(lf_amp),
+    )
+
+
+# ==========================================
+# 量子化ルックアップテーブル
+# ==========================================
+def _float_to_ordinal(x: float) -> int:
+    # 非負のfloatはビット列を整数として見ると大小関係が保たれる
+    return struct.unpack('<q', struct.pack('<d', x))[0]
+
+
+def _ordinal_to_float(n: int) -> float:
+    return struct.unpack('<d', struct.pack('<q', n))[0]
+
+
+def _find_steps(func, lo: float, hi: float) -> (list, list):
+    """
+    [lo, hi] で単調非減少な func について、値が切り替わる最小のfloatを二分探索で列挙する。
+    float表現の隣接値単位で探索するため、丸めの境界も元の式と完全に一致する。
+    """
+    a = _float_to_ordinal(lo)
+    hi_n = _float_to_ordinal(hi)
+    edges, codes = [lo], [func(lo)]
+    last = func(hi)
+
+    while codes[-1] != last:
+        value = codes[-1]
+        left, right = a, hi_n  # func(left) == value, func(right) > value
+        while right - left > 1:
+            mid = (left + right) // 2
+            if func(_ordinal_to_float(mid)) > value:
+                right = mid
+            else:
+                left = mid
+        a = right
+        edges.append(_ordinal_to_float(right))
+        codes.append(func(edges[-1]))
+    return edges, codes
+
+
+def _build_table(func, segments) -> (list, list):
+    edges, codes = [], []
+    for lo, hi in segments:
+        seg_edges, seg_codes = _find_steps(func, lo, hi)
+        edges.extend(seg_edges)
+        codes.extend(seg_codes)
+    return edges, codes
+
+
+def _next_float(x: float) -> float:
+    return _ordinal_to_float(_float_to_ordinal(x) + 1)
+
+
+def _prev_float(x: float) -> float:
+    return _ordinal_to_float(_float_to_ordinal(x) - 1)
+
+
+@lru_cache(maxsize=None)
+def _tables() -> dict:
+    """初回使用時に一度だけ周波数・振幅の量子化テーブルを構築する"""
+    freq_edges, freq_codes = _build_table(_encode_frequency, [
+        (0.0, _prev_float(10.0)),
+        (10.0, FREQ_MAX),
+    ])
+    # 振幅は区間ごとに式が変わり、境界で値が下がるため区間別に探索する
+    amp_edges, amp_codes = _build_table(_encode_amplitude, [
+        (0.0, 0.0),
+        (_next_float(0.0), 0.12),
+        (_next_float(0.12), 0.23),
+        (_next_float(0.23), 1.0),
+    ])
+    return {
+        "freq_edges": freq_edges,
+        "freq_codes": freq_codes,
+        "amp_edges": amp_edges,
+        "amp_codes": amp_codes,
+        "freq_edges_np": np.array(freq_edges, dtype=np.float64),
+        "freq_codes_np": np.array(freq_codes, dtype=np.int64),
+        "amp_edges_np": np.array(amp_edges, dtype=np.float64),
+        "amp_codes_np": np.array(amp_codes, dtype=np.int64),
+    }
+
+
+def encode_joycon_rumble(hf_freq: float, hf_amp: float, lf_freq: float, lf_amp: float) -> bytes:
+    if hf_amp == 0.0 and lf_amp == 0.0:
+        return NEUTRAL_RUMBLE
+
+    hf_freq = max(0.0, min(FREQ_MAX, hf_freq))
+    lf_freq = max(0.0, min(FREQ_MAX, lf_freq))
+    hf_amp  = max(0.0, min(1.0, hf_amp))
+    lf_amp  = max(0.0, min(1.0, lf_amp))
+
+    t = _tables()
+    freq_edges, freq_codes = t["freq_edges"], t["freq_codes"]
+    amp_edges, amp_codes = t["amp_edges"], t["amp_codes"]
+    return _pack_codes(
+        freq_codes[bisect_right(freq_edges, hf_freq) - 1],
+        amp_codes[bisect_right(amp_edges, hf_amp) - 1],
+        freq_codes[bisect_right(freq_edges, lf_freq) - 1],
+        amp_codes[bisect_right(amp_edges, lf_amp) - 1],
+    )
+
+
+def _clamp(values: np.ndarray, upper: float) -> np.ndarray:
+    # min/max による元の実装と同じく、NaN は上限値として扱う
+    clamped = np.clip(values, 0.0, upper)
+    clamped[np.isnan(clamped)] = upper
+    return clamped
+
+
+def encode_many(commands) -> bytes:
+    """
+    (N, 4) のコマンド配列 [hf_freq, hf_amp, lf_freq, lf_amp] をまとめてエンコードし、
+    左右モーター分を連結した8バイトの振動フレーム N 個を詰めたバイト列を返す。
+    各フレームは encode_joycon_rumble の結果を2回並べたものと一致する。
+    """
+    cmds = np.asarray(commands, dtype=np.float64).reshape(-1, 4)
+    t = _tables()
+
+    def freq_code(col):
+        x = _clamp(cmds[:, col], FREQ_MAX)
+        return t["freq_codes_np"][np.searchsorted(t["freq_edges_np"], x, side='right') - 1]
+
+    def amp_code(col):
+        x = _clamp(cmds[:, col], 1.0)
+        return t["amp_codes_np"][np.searchsorted(t["amp_edges_np"], x, side='right') - 1]
+
+    hf = (freq_code(0) - 0x60) * 4
+    hf_amp_byte = amp_code(1) * 2
+    lf = freq_code(2) - 0x40
+    lf_amp_byte = (amp_code(3) // 2) + 64
+
+    frames = np.empty((len(cmds), FRAME_SIZE), dtype=np.uint8)
+    frames[:, 0] = hf & 0xFF
+    frames[:, 1] = (hf_amp_byte + ((hf >> 8) & 0xFF)) & 0xFF
+    frames[:, 2] = (lf + ((lf_amp_byte >> 8) & 0xFF)) & 0xFF
+    frames[:, 3] = lf_amp_byte & 0xFF
+
+    silent = (cmds[:, 1] == 0.0) & (cmds[:, 3] == 0.0)
+    frames[silent, :4] = np.frombuffer(NEUTRAL_RUMBLE, dtype=np.uint8)
+    frames[:, 4:] = frames[:, :4]
+    return frames.tobytes()
+
+
+# ==========================================
+# HD振動フォーマットのデコード（実機が受け取る値の復元）
+# ==========================================
+# バイト配置（エンコードの逆）:
+#   byte0 + byte1 の bit0 : HF周波数 9bit（下位2bitは未使用）
+#   byte1 の bit1-7       : HF振幅コード
+#   byte2 の bit0-6       : LF周波数 7bit
+#   byte2 の bit7 + byte3 : LF振幅 9bit（= コード // 2 + 64。コードの最下位ビットは失われる）
+AMP_CODE_MAX = 100  # _encode_amplitude(1.0)
+
+
+def decode_codes(frames, motor: int = 0, frame_size: int = FRAME_SIZE) -> np.ndarray:
+    """
+    frame_size バイト/フレームの振動データから、実機が読み取るコード
+    [hf_code, hf_amp_code, lf_code, lf_amp_code] を (N, 4) の int64 で返す。
+    8バイトのフレームでは motor=0 が左（前半4バイト）、1 が右（後半4バイト）。
+    振幅コードは範囲外（0 未満や AMP_CODE_MAX 超え）のままで返す。
+    """
+    data = np.frombuffer(frames, dtype=np.uint8)
+    b = data.reshape(-1, frame_size)[:, motor * 4:motor * 4 + 4].astype(np.int64)
+    codes = np.empty((len(b), 4), dtype=np.int64)
+    codes[:, 0] = ((b[:, 0] | ((b[:, 1] & 0x01) << 8)) >> 2) + 0x60
+    codes[:, 1] = b[:, 1] >> 1
+    codes[:, 2] = (b[:, 2] & 0x7F) + 0x40
+    codes[:, 3] = ((b[:, 3] | ((b[:, 2] & 0x80) << 1)) - 64) * 2
+    return codes
+
+
+def _decode_frequency(codes: np.ndarray) -> np.ndarray:
+    return 10.0 * np.exp2(codes / 32.0)
+
+
+def _decode_amplitude(codes: np.ndarray) -> np.ndarray:
+    """
+    _encode_amplitude の逆。コード 16〜31 は低振幅の式と中振幅の式の両方から出てくるが、
+    中・高振幅の式とつながる（コードに対して単調な）中振幅の式として読む。
+    範囲外のコードは 0〜AMP_CODE_MAX に丸める。
+    """
+    c = np.clip(codes, 0, AMP_CODE_MAX).astype(np.float64)
+    amps = np.where(c >= 32, np.exp2(c / 32.0) / 8.7,
+                    np.where(c >= 16, np.exp2(c / 16.0) / 17.0, np.exp2(c / 8.0) / 120.0))
+    return np.where(c == 0, 0.0, amps)
+
+
+def decode_many(frames, motor: int = 0, frame_size: int = FRAME_SIZE) -> np.ndarray:
+    """振動データを [hf_freq, hf_amp, lf_freq, lf_amp] の (N, 4) float64 に戻す"""
+    codes = decode_codes(frames, motor, frame_size)
+    commands = np.empty(codes.shape, dtype=np.float64)
+    commands[:, 0] = _decode_frequency(codes[:, 0])
+    commands[:, 1] = _decode_amplitude(codes[:, 1])
+    commands[:, 2] = _decode_frequency(codes[:, 2])
+    commands[:, 3] = _decode_amplitude(codes[:, 3])
+    return commands
+
+
+def decode_joycon_rumble(rumble_bytes: bytes) -> (float, float, float, float):
+    """4バイトの振動データ1つを (hf_freq, hf_amp, lf_freq, lf_amp) に戻す"""
+    return tuple(float(v) for v in decode_many(bytes(rumble_bytes[:4]), frame_size=4)[0])
+
+
+def quantize(commands) -> np.ndarray:
+    """コマンド列をエンコードしてデコードし直す（実機が実際に鳴らす値）"""
+    return decode_many(encode_many(commands))
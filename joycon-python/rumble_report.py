@@ -0,0 +1,157 @@
+import argparse
+import csv
+import glob
+import sys
+import time
+import numpy as np
+from pathlib import Path
+
+from csv_emu import synthesize_blocks
+from jcr import RumbleTrack, load_commands_from_csv
+from rumble import AMP_CODE_MAX, decode_codes, decode_many, encode_many
+
+# ==========================================
+# 量子化レポート（元のコマンド vs 実機が受け取る振動データ）
+# ==========================================
+# 両方を波形に合成し、フレームごとの振幅スペクトルの相対誤差 (dB) を求める。
+# モーターの周波数は最大 1252Hz なので、解析は 8kHz で十分。
+ANALYSIS_RATE = 8000
+N_FFT = 512
+ERROR_FLOOR_DB = -120.0
+REPORT_SUFFIXES = (".jcr", ".csv")
+
+
+def _frame_spectra(commands: np.ndarray, fps: int, sample_rate: int, block_frames: int):
+    """フレームごとの振幅スペクトル (n, N_FFT // 2 + 1) をブロック単位で返すジェネレータ"""
+    samples_per_frame = int(sample_rate / fps)
+    window = np.hanning(samples_per_frame).astype(np.float32)
+    for block in synthesize_blocks(commands, fps, sample_rate, block_frames=block_frames):
+        frames = block.reshape(-1, samples_per_frame) * window
+        yield np.abs(np.fft.rfft(frames, n=N_FFT, axis=1))
+
+
+def spectral_error_db(ideal: np.ndarray, quantized: np.ndarray, fps: int = 66,
+                      sample_rate: int = ANALYSIS_RATE, block_frames: int = 4096) -> np.ndarray:
+    """
+    フレームごとのスペクトル誤差 10*log10(Σ|Sq - Si|² / Σ|Si|²) を返す。
+    元のコマンドが無音のフレームは NaN（そこで鳴ってしまうフレームは別に数える）。
+    """
+    errors = np.full(len(ideal), np.nan)
+    pos = 0
+    for s_ideal, s_quant in zip(_frame_spectra(ideal, fps, sample_rate, block_frames),
+                                _frame_spectra(quantized, fps, sample_rate, block_frames)):
+        power = np.sum(s_ideal ** 2, axis=1)
+        diff = np.sum((s_quant - s_ideal) ** 2, axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            db = 10.0 * np.log10(np.maximum(diff / power, 10 ** (ERROR_FLOOR_DB / 10)))
+        errors[pos:pos + len(power)] = np.where(power > 0, db, np.nan)
+        pos += len(power)
+    return errors
+
+
+def _active(commands: np.ndarray, f_col: int, a_col: int) -> np.ndarray:
+    return (commands[:, f_col] > 0) & (commands[:, a_col] > 0)
+
+
+def compare(ideal, frames: bytes, motor: int = 0, fps: int = 66) -> dict:
+    """元のコマンド (N, 4) と、実際に送る8バイト/フレームの振動データを比較する"""
+    ideal = np.asarray(ideal, dtype=np.float64).reshape(-1, 4)
+    codes = decode_codes(frames, motor)
+    quantized = decode_many(frames, motor)
+
+    errors = spectral_error_db(ideal, quantized, fps)
+    voiced = ~np.isnan(errors)
+    ideal_on = _active(ideal, 0, 1) | _active(ideal, 2, 3)
+    quant_on = (quantized[:, 1] > 0) | (quantized[:, 3] > 0)
+
+    result = {
+        "frames": len(ideal),
+        "active": int(voiced.sum()),
+        "err_mean_db": float(np.mean(errors[voiced])) if voiced.any() else ERROR_FLOOR_DB,
+        "err_p95_db": float(np.percentile(errors[voiced], 95)) if voiced.any() else ERROR_FLOOR_DB,
+        "err_max_db": float(np.max(errors[voiced])) if voiced.any() else ERROR_FLOOR_DB,
+        "worst_frame": int(np.nanargmax(errors)) if voiced.any() else -1,
+        # 無音のはずのフレームで鳴ってしまう数
+        "spurious": int(np.sum(~ideal_on & quant_on)),
+        # 実機の振幅コードの範囲 (0〜AMP_CODE_MAX) を外れたフレーム数
+        "invalid_hf_amp": int(np.sum((codes[:, 1] < 0) | (codes[:, 1] > AMP_CODE_MAX))),
+        "invalid_lf_amp": int(np.sum((codes[:, 3] < 0) | (codes[:, 3] > AMP_CODE_MAX))),
+    }
+    for name, f_col, a_col in (("hf", 0, 1), ("lf", 2, 3)):
+        on = _active(ideal, f_col, a_col) & (quantized[:, a_col] > 0)
+        cents = 1200.0 * np.abs(np.log2(quantized[on, f_col] / ideal[on, f_col]))
+        amp_db = 20.0 * np.abs(np.log10(quantized[on, a_col] / ideal[on, a_col]))
+        result[f"{name}_cents_max"] = float(cents.max()) if on.any() else 0.0
+        result[f"{name}_amp_db_max"] = float(amp_db.max()) if on.any() else 0.0
+    return result
+
+
+def load_for_report(path: Path) -> list:
+    """[(ラベル, 元のコマンド, 振動データ, モーター番号, fps)] を返す"""
+    if path.suffix.lower() == ".csv":
+        commands = np.array(load_commands_from_csv(str(path)), dtype=np.float64).reshape(-1, 4)  # 0行でも (0, 4)
+        return [(path.name, commands, encode_many(commands), 0, 66)]
+
+    with RumbleTrack(str(path)) as track:
+        if track.raw is None:
+            raise ValueError(f"{path} has no raw commands to compare")
+        raw = np.array(track.raw, dtype=np.float64)
+        frames = bytes(track.frames)
+        fps, channels = track.fps, track.channels
+    if channels == 1:
+        return [(path.name, raw, frames, 0, fps)]
+    return [(f"{path.name}[{'LR'[ch]}]", raw[:, ch * 4:(ch + 1) * 4], frames, ch, fps) for ch in range(channels)]
+
+
+def find_reports(patterns: list) -> list:
+    found = []
+    for pattern in patterns:
+        p = Path(pattern)
+        candidates = sorted(p.rglob("*")) if p.is_dir() else sorted(Path(m) for m in glob.glob(pattern, recursive=True))
+        found.extend(c for c in candidates if c.is_file() and c.suffix.lower() in REPORT_SUFFIXES and c not in found)
+    return found
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="振動トラックの量子化誤差（元のコマンド vs 実機が受け取る値）をフレームごとに集計します。",
+    )
+    parser.add_argument("inputs", nargs="+", help=".jcr / .csv ファイル・ディレクトリ・glob")
+    parser.add_argument("--csv", type=Path, default=None, help="結果をCSVに書き出す")
+    parser.add_argument("--fail-above", type=float, default=None,
+                        help="p95 誤差がこの dB を超える、または範囲外コードがあるトラックがあれば終了コード 1")
+    args = parser.parse_args(argv)
+
+    rows, failed = [], 0
+    t0 = time.perf_counter()
+    for path in find_reports(args.inputs):
+        try:
+            entries = load_for_report(path)
+        except ValueError as e:
+            print(f"{path.name}: スキップ - {e}")
+            continue
+        for label, ideal, frames, motor, fps in entries:
+            r = compare(ideal, frames, motor, fps)
+            bad = r["invalid_hf_amp"] + r["invalid_lf_amp"]
+            if args.fail_above is not None and (r["err_p95_db"] > args.fail_above or bad):
+                failed += 1
+            print(f"{label}: {r['frames']} フレーム | 誤差 平均 {r['err_mean_db']:6.1f} dB / p95 {r['err_p95_db']:6.1f} dB / "
+                  f"最大 {r['err_max_db']:6.1f} dB (フレーム {r['worst_frame']}) | "
+                  f"周波数 最大 HF {r['hf_cents_max']:.0f} / LF {r['lf_cents_max']:.0f} セント | "
+                  f"余計な振動 {r['spurious']} | 範囲外コード HF {r['invalid_hf_amp']} / LF {r['invalid_lf_amp']}")
+            rows.append({"track": label, **r})
+
+    wall = time.perf_counter() - t0
+    total = sum(r["frames"] for r in rows)
+    print(f"{len(rows)} トラック / {total} フレーム ({total / 66 / 60:.1f} 分) を {wall:.1f} s で集計しました。")
+    if args.csv and rows:
+        with open(args.csv, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"CSVファイルを出力しました: {args.csv}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,9 +1,11 @@
+from pathlib import Path
 from setuptools import setup, find_packages
 
 version = "0.2.4"
 
-with open('README.md') as f:
-    readme = f.read()
+# the README lives at the repository root, one level up, when building from a checkout
+readme_path = Path('README.md')
+readme = readme_path.read_text(encoding='utf-8') if readme_path.exists() else ''
 
 with open('LICENSE') as f:
     license = f.read()
@@ -25,8 +27,40 @@ setup(
     ]),
     url='https://github.com/tokoroten-lab/joycon-python',
     license=license,
-    packages=find_packages(),
-    # install_requires=requirements,
+    packages=find_packages(exclude=['tests', 'tests.*']),
+    # every top-level module imported by another one must be listed here,
+    # or the installed scripts fail with ImportError
+    py_modules=[
+        'analysis_cache',
+        'audio_stream',
+        'csv_emu',
+        'fanout',
+        'frameclock',
+        'jcr',
+        'joycon_convert',
+        'live',
+        'main',
+        'mp3_csv',
+        'mp3_to_command_noize',
+        'pipeline',
+        'pitch',
+        'processor',
+        'profiling',
+        'rumble',
+        'rumble_report',
+        'telemetry',
+    ],
+    entry_points={
+        'console_scripts': [
+            'joycon-convert=joycon_convert:main',
+        ],
+    },
+    install_requires=requirements,
+    extras_require={
+        'live': ['sounddevice'],   # live.py, csv_emu.py playback
+        'hotplug': ['pyudev'],     # udev events for DeviceRegistry.watch()
+        'test': ['pytest', 'pytest-benchmark'],
+    },
     classifiers=[
         'Programming Language :: Python :: 3.7'
     ]
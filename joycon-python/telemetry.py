@@ -0,0 +1,110 @@
+import sys
+import threading
+
+import numpy as np
+
+# ==========================================
+# 再生テレメトリ（フレームごと・デバイスごとの送信時刻）
+# ==========================================
+# 記録するのは perf_counter の時刻で、送っていないフレームは NaN のまま:
+#   scheduled   フレームがデバイスに届くべき時刻（マスタークロックの予定時刻）
+#   write_start 書き込みを始めた時刻
+#   write_end   書き込みが終わった時刻
+# 遅れ = write_end - scheduled（正なら予定より遅れて届いた）
+#
+# 配列は再生前に確保し、再生中は要素に代入するだけなので、送信ループでメモリを確保しない。
+
+
+class PlaybackTelemetry:
+    def __init__(self, num_frames: int, fps: int = 66, max_devices: int = 8):
+        self.num_frames = num_frames
+        self.fps = fps
+        self.period = 1.0 / fps
+        self.names = []
+        self.scheduled = np.full((max_devices, num_frames), np.nan)
+        self.write_start = np.full((max_devices, num_frames), np.nan)
+        self.write_end = np.full((max_devices, num_frames), np.nan)
+        self._lock = threading.Lock()
+
+    @property
+    def num_devices(self) -> int:
+        return len(self.names)
+
+    def add_device(self, name: str = None) -> int:
+        """記録先のデバイス番号を返す。max_devices 台を超えたら None（そのデバイスは記録しない）"""
+        with self._lock:
+            if len(self.names) == self.scheduled.shape[0]:
+                return None
+            self.names.append(name or f"device{len(self.names)}")
+            return len(self.names) - 1
+
+    @property
+    def lateness(self) -> np.ndarray:
+        """(デバイス数, フレーム数) の遅れ [s]"""
+        n = self.num_devices
+        return self.write_end[:n] - self.scheduled[:n]
+
+    def device_summary(self, device: int) -> dict:
+        """遅れ・書き込み時間は ms。missed は予定されたのに送れなかったフレーム、
+        skipped は予定すらされなかった（クロックが飛ばした・途中で追加された）フレーム"""
+        scheduled, start, end = self.scheduled[device], self.write_start[device], self.write_end[device]
+        sent = ~np.isnan(end)
+        planned = ~np.isnan(scheduled)
+        last = np.flatnonzero(planned)[-1] + 1 if planned.any() else 0
+        first = np.flatnonzero(planned)[0] if planned.any() else 0
+
+        lateness = (end - scheduled)[sent & planned] * 1e3
+        duration = (end - start)[sent] * 1e3
+        gaps = np.diff(end[sent])
+        percentile = (lambda a, q: float(np.percentile(a, q)) if len(a) else float('nan'))
+        return {
+            "name": self.names[device],
+            "frames_sent": int(sent.sum()),
+            "lateness_p50_ms": percentile(lateness, 50),
+            "lateness_p99_ms": percentile(lateness, 99),
+            "lateness_max_ms": float(lateness.max()) if len(lateness) else float('nan'),
+            "write_p50_ms": percentile(duration, 50),
+            "write_p99_ms": percentile(duration, 99),
+            # 連続する2フレームの書き込み完了の間隔のうち、1フレーム分を超えた最大値
+            "max_stall_ms": float(max(gaps.max() - self.period, 0.0)) * 1e3 if len(gaps) else 0.0,
+            "missed_frames": int((planned & ~sent).sum()),
+            "skipped_frames": int((~planned[first:last]).sum()),
+        }
+
+    def summary(self) -> list:
+        return [self.device_summary(d) for d in range(self.num_devices)]
+
+    def print_summary(self):
+        print("送信テレメトリ:")
+        for s in self.summary():
+            print(f"  {s['name']}: 遅れ p50 {s['lateness_p50_ms']:.3f} ms / p99 {s['lateness_p99_ms']:.3f} ms "
+                  f"/ 最大 {s['lateness_max_ms']:.3f} ms | 書き込み p50 {s['write_p50_ms']:.3f} ms "
+                  f"/ p99 {s['write_p99_ms']:.3f} ms | 最大停止 {s['max_stall_ms']:.3f} ms "
+                  f"| 送れなかった {s['missed_frames']} / スキップ {s['skipped_frames']} フレーム")
+
+    def save(self, path: str):
+        """オフライン解析用に .npz として書き出す（PlaybackTelemetry.load で読み直せる）"""
+        n = self.num_devices
+        np.savez_compressed(
+            path, fps=self.fps, names=np.array(self.names, dtype=str),
+            scheduled=self.scheduled[:n], write_start=self.write_start[:n], write_end=self.write_end[:n],
+        )
+        print(f"送信テレメトリを出力しました: {path}")
+
+    @classmethod
+    def load(cls, path: str) -> "PlaybackTelemetry":
+        with np.load(path) as data:
+            num_devices, num_frames = data["scheduled"].shape
+            telemetry = cls(num_frames, fps=int(data["fps"]), max_devices=num_devices)
+            telemetry.names = [str(name) for name in data["names"]]
+            telemetry.scheduled[:] = data["scheduled"]
+            telemetry.write_start[:] = data["write_start"]
+            telemetry.write_end[:] = data["write_end"]
+        return telemetry
+
+
+if __name__ == '__main__':
+    # 保存したテレメトリの集計を表示する: python telemetry.py playback_telemetry.npz
+    for path in sys.argv[1:]:
+        print(f"--- {path} ---")
+        PlaybackTelemetry.load(path).print_summary()
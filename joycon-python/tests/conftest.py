@@ -0,0 +1,64 @@
+import pytest
+
+from tests.synthetic import write_synthetic_wav
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """解析キャッシュはテストごとの一時ディレクトリに置く（~/.cache を汚さない）"""
+    path = tmp_path / "cache"
+    monkeypatch.setenv("JOYCON_CACHE_DIR", str(path))
+    monkeypatch.delenv("JOYCON_CACHE", raising=False)
+    return path
+
+
+@pytest.fixture
+def synthetic_wav(tmp_path):
+    """synthetic_wav(秒数) で合成音の WAV を書き出してパスを返す"""
+    def make(seconds: float, name: str = "synthetic.wav", **kw) -> str:
+        path = str(tmp_path / name)
+        write_synthetic_wav(path, seconds, **kw)
+        return path
+    return make
+
+
+@pytest.fixture
+def simulated():
+    """simulated(**kw) で SimulatedJoyCon を作る。テストの終わりにすべて止める"""
+    from pyjoycon import SimulatedJoyCon
+
+    sims = []
+
+    def make(**kw):
+        sim = SimulatedJoyCon(**kw)
+        sims.append(sim)
+        return sim
+    yield make
+    for sim in sims:
+        sim.close()
+
+
+@pytest.fixture
+def audio_joycon(simulated):
+    """
+    audio_joycon(**kw) で SimulatedJoyCon につないだ AudioJoyCon を作り、(joycon, sim) を返す。
+    接続時の書き込みは記録から消すので、sim.rumble_reports() には再生したフレームだけが残る
+    """
+    from main import AudioJoyCon
+    from pyjoycon.constants import JOYCON_VENDOR_ID
+
+    def make(**kw):
+        sim = simulated(**kw)
+        jc = AudioJoyCon(JOYCON_VENDOR_ID, sim.product_id, transport=sim)
+        sim.output_reports.clear()
+        return jc, sim
+    return make
+
+
+@pytest.fixture
+def profiler():
+    """計測を有効にして Profiler を返す（summary() で区間ごとの回数を見る）"""
+    import profiling
+
+    yield profiling.enable()
+    profiling.disable()
@@ -0,0 +1,213 @@
+import numpy as np
+
+# ==========================================
+# 以前の実装（テストでは正解として、benchmark.py では速度の比較対象として使う）
+# ==========================================
+
+
+def stft_peaks(stft_matrix, frequencies) -> list:
+    # 以前の analyze_with_stft のフレームごとのループ
+    lf_mask = (frequencies >= 40.0) & (frequencies < 160.0)
+    hf_mask = (frequencies >= 160.0) & (frequencies <= 1000.0)
+    commands = []
+    for t in range(stft_matrix.shape[1]):
+        frame = stft_matrix[:, t]
+        lf_spectrum = frame[lf_mask]
+        if len(lf_spectrum) > 0 and np.max(lf_spectrum) > 0.05:
+            lf_f = float(frequencies[lf_mask][np.argmax(lf_spectrum)])
+            lf_a = min(1.0, float(np.max(lf_spectrum)) / 80.0)
+        else:
+            lf_f, lf_a = 0.0, 0.0
+        hf_spectrum = frame[hf_mask]
+        if len(hf_spectrum) > 0 and np.max(hf_spectrum) > 0.05:
+            hf_f = float(frequencies[hf_mask][np.argmax(hf_spectrum)])
+            hf_a = min(1.0, float(np.max(hf_spectrum)) / 10.0)
+        else:
+            hf_f, hf_a = 0.0, 0.0
+        commands.append((hf_f, hf_a, lf_f, lf_a))
+    return commands
+
+
+def dsp_peaks(stft_matrix, frequencies) -> list:
+    # 以前の mp3_csv.analyze_audio_for_joycon_dsp のフレームごとのループ
+    lf_mask = (frequencies >= 40.0) & (frequencies < 160.0)
+    hf_mask = (frequencies >= 160.0) & (frequencies <= 1250.0)
+    commands = []
+    for t in range(stft_matrix.shape[1]):
+        frame = stft_matrix[:, t]
+        lf_spectrum = frame[lf_mask]
+        if len(lf_spectrum) > 0 and np.max(lf_spectrum) > 0.05:
+            lf_freq = frequencies[lf_mask][np.argmax(lf_spectrum)]
+            lf_amp = float(np.max(lf_spectrum))
+        else:
+            lf_freq, lf_amp = 0.0, 0.0
+        hf_spectrum = frame[hf_mask]
+        if len(hf_spectrum) > 0 and np.max(hf_spectrum) > 0.05:
+            hf_freq = frequencies[hf_mask][np.argmax(hf_spectrum)]
+            hf_amp = float(np.max(hf_spectrum))
+        else:
+            hf_freq, hf_amp = 0.0, 0.0
+        lf_amp = min(1.0, lf_amp / 100.0)
+        hf_amp = min(1.0, hf_amp / 5.0)
+        if hf_amp > 0.3:
+            lf_amp = lf_amp * 0.2
+        commands.append((float(hf_freq), float(hf_amp), float(lf_freq), float(lf_amp)))
+    return commands
+
+
+def synthesize(commands, fps: int = 66, sample_rate: int = 44100) -> np.ndarray:
+    # 以前の csv_emu.synthesize_joycon_audio のフレームごとのループ
+    samples_per_frame = int(sample_rate / fps)
+    audio_data = np.zeros(len(commands) * samples_per_frame, dtype=np.float32)
+    hf_phase = lf_phase = 0.0
+    for i, (hf_f, hf_a, lf_f, lf_a) in enumerate(commands):
+        t = np.arange(samples_per_frame) / sample_rate
+        if hf_f > 0 and hf_a > 0:
+            hf_wave = hf_a * np.sin(2 * np.pi * hf_f * t + hf_phase)
+            hf_phase += 2 * np.pi * hf_f * (samples_per_frame / sample_rate)
+        else:
+            hf_wave = np.zeros(samples_per_frame)
+        if lf_f > 0 and lf_a > 0:
+            lf_wave = lf_a * np.sin(2 * np.pi * lf_f * t + lf_phase)
+            lf_phase += 2 * np.pi * lf_f * (samples_per_frame / sample_rate)
+        else:
+            lf_wave = np.zeros(samples_per_frame)
+        audio_data[i * samples_per_frame:(i + 1) * samples_per_frame] = hf_wave + lf_wave
+    max_val = np.max(np.abs(audio_data))
+    if max_val > 0:
+        audio_data = (audio_data / max_val) * 0.5
+    return audio_data
+
+
+STATUS_BUTTONS = (
+    ("right", (("y", 3, 0), ("x", 3, 1), ("b", 3, 2), ("a", 3, 3), ("sr", 3, 4), ("sl", 3, 5),
+               ("r", 3, 6), ("zr", 3, 7))),
+    ("shared", (("minus", 4, 0), ("plus", 4, 1), ("r-stick", 4, 2), ("l-stick", 4, 3),
+                ("home", 4, 4), ("capture", 4, 5), ("charging-grip", 4, 7))),
+    ("left", (("down", 5, 0), ("up", 5, 1), ("right", 5, 2), ("left", 5, 3), ("sr", 5, 4),
+              ("sl", 5, 5), ("l", 5, 6), ("zl", 5, 7))),
+)
+
+
+def imu(jc, offset: int, sample_idx: int = 0) -> int:
+    return jc._to_int16le_from_2bytes(jc._input_report[offset + sample_idx * 12],
+                                      jc._input_report[offset + 1 + sample_idx * 12])
+
+
+def get_status(jc) -> dict:
+    # 以前の JoyCon.get_status と同じく、値ごとに生のレポートからビットを取り出す
+    nbit = jc._get_nbit_from_input_report
+    return {
+        "battery": {"charging": nbit(2, 4, 1), "level": nbit(2, 5, 3)},
+        "buttons": {
+            group: {name: nbit(byte, bit, 1) for name, byte, bit in names}
+            for group, names in STATUS_BUTTONS
+        },
+        "analog-sticks": {
+            "left": {
+                "horizontal": nbit(6, 0, 8) | (nbit(7, 0, 4) << 8),
+                "vertical": nbit(7, 4, 4) | (nbit(8, 0, 8) << 4),
+            },
+            "right": {
+                "horizontal": nbit(9, 0, 8) | (nbit(10, 0, 4) << 8),
+                "vertical": nbit(10, 4, 4) | (nbit(11, 0, 8) << 4),
+            },
+        },
+        "accel": {
+            "x": (imu(jc, 13) - jc._ACCEL_OFFSET_X) * jc._ACCEL_COEFF_X,
+            "y": (imu(jc, 15) - jc._ACCEL_OFFSET_Y) * jc._ACCEL_COEFF_Y,
+            "z": (imu(jc, 17) - jc._ACCEL_OFFSET_Z) * jc._ACCEL_COEFF_Z,
+        },
+        "gyro": {
+            "x": (imu(jc, 19) - jc._GYRO_OFFSET_X) * jc._GYRO_COEFF_X,
+            "y": (imu(jc, 21) - jc._GYRO_OFFSET_Y) * jc._GYRO_COEFF_Y,
+            "z": (imu(jc, 23) - jc._GYRO_OFFSET_Z) * jc._GYRO_COEFF_Z,
+        },
+    }
+
+
+def imu_property(jc, base: int, offsets, coeffs) -> list:
+    # 以前の PythonicJoyCon.accel / gyro（サンプル・軸ごとに生のレポートを読む）
+    c = jc._ime_yz_coeff
+    return [
+        tuple((imu(jc, base + 2 * k, i) - offsets[k]) * coeffs[k] * (1 if k == 0 else c)
+              for k in range(3))
+        for i in range(3)
+    ]
+
+
+def accel(jc) -> list:
+    return imu_property(jc, 13, (jc._ACCEL_OFFSET_X, jc._ACCEL_OFFSET_Y, jc._ACCEL_OFFSET_Z),
+                        (jc._ACCEL_COEFF_X, jc._ACCEL_COEFF_Y, jc._ACCEL_COEFF_Z))
+
+
+def gyro(jc) -> list:
+    return imu_property(jc, 19, (jc._GYRO_OFFSET_X, jc._GYRO_OFFSET_Y, jc._GYRO_OFFSET_Z),
+                        (jc._GYRO_COEFF_X, jc._GYRO_COEFF_Y, jc._GYRO_COEFF_Z))
+
+
+EVENT_NAMES = ("stick_r_btn", "r", "zr", "plus", "a", "b", "x", "y", "home", "right_sr", "right_sl")
+
+
+def event_hook_right(self):
+    # 以前の ButtonEventJoyCon._event_tracking_update_hook_right
+    if self._event_track_sticks:
+        pressed = self.stick_r_btn
+        if self._previous_stick_r_btn != pressed:
+            self._previous_stick_r_btn = pressed
+            self.joycon_button_event("stick_r_btn", pressed)
+    pressed = self.r
+    if self._previous_r != pressed:
+        self._previous_r = pressed
+        self.joycon_button_event("r", pressed)
+    pressed = self.zr
+    if self._previous_zr != pressed:
+        self._previous_zr = pressed
+        self.joycon_button_event("zr", pressed)
+    pressed = self.plus
+    if self._previous_plus != pressed:
+        self._previous_plus = pressed
+        self.joycon_button_event("plus", pressed)
+    pressed = self.a
+    if self._previous_a != pressed:
+        self._previous_a = pressed
+        self.joycon_button_event("a", pressed)
+    pressed = self.b
+    if self._previous_b != pressed:
+        self._previous_b = pressed
+        self.joycon_button_event("b", pressed)
+    pressed = self.x
+    if self._previous_x != pressed:
+        self._previous_x = pressed
+        self.joycon_button_event("x", pressed)
+    pressed = self.y
+    if self._previous_y != pressed:
+        self._previous_y = pressed
+        self.joycon_button_event("y", pressed)
+    pressed = self.home
+    if self._previous_home != pressed:
+        self._previous_home = pressed
+        self.joycon_button_event("home", pressed)
+    pressed = self.right_sr
+    if self._previous_right_sr != pressed:
+        self._previous_right_sr = pressed
+        self.joycon_button_event("right_sr", pressed)
+    pressed = self.right_sl
+    if self._previous_right_sl != pressed:
+        self._previous_right_sl = pressed
+        self.joycon_button_event("right_sl", pressed)
+
+
+def get_device_ids(enumerate) -> list:
+    from pyjoycon.constants import JOYCON_VENDOR_ID, JOYCON_PRODUCT_IDS
+    out = []
+    for device in enumerate(0, 0):
+        serial = device.get('serial') or device.get("serial_number")
+        if device["vendor_id"] != JOYCON_VENDOR_ID:
+            continue
+        if device["product_id"] not in JOYCON_PRODUCT_IDS:
+            continue
+        if not device["product_string"]:
+            continue
+        out.append((device["vendor_id"], device["product_id"], serial))
+    return out
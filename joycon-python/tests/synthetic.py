@@ -0,0 +1,126 @@
+import numpy as np
+
+import rumble
+
+# ==========================================
+# テストと benchmark.py で共有する合成データと偽デバイス
+# ==========================================
+
+
+def random_commands(n: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    commands = np.empty((n, 4), dtype=np.float64)
+    commands[:, 0] = rng.uniform(0.0, 1300.0, n)
+    commands[:, 1] = rng.uniform(0.0, 1.0, n)
+    commands[:, 2] = rng.uniform(0.0, 1300.0, n)
+    commands[:, 3] = rng.uniform(0.0, 1.0, n)
+    # 無音フレームと範囲外の値も混ぜる
+    commands[rng.random(n) < 0.1, 1] = 0.0
+    commands[rng.random(n) < 0.1, 3] = 0.0
+    commands[rng.random(n) < 0.01] = (0.0, 0.0, 0.0, 0.0)
+    commands[rng.random(n) < 0.01, 1] = -0.5
+    return commands
+
+
+def edge_commands() -> np.ndarray:
+    """量子化テーブルの全境界とその1ulp手前の値、各区間の切り替わり点を列挙する"""
+    t = rumble._tables()
+    freqs = []
+    for edge in t["freq_edges"]:
+        freqs += [edge, rumble._prev_float(edge) if edge > 0.0 else 0.0]
+    amps = []
+    for edge in t["amp_edges"]:
+        amps += [edge, rumble._prev_float(edge) if edge > 0.0 else 0.0]
+    amps += [0.12, 0.23, 1.0, rumble._next_float(0.12), rumble._next_float(0.23)]
+    freqs = np.array(freqs + [0.0, 10.0, 1252.0, 1300.0, -1.0, np.nan])
+    amps = np.array(amps + [np.nan, 2.0])
+
+    n = max(len(freqs), len(amps))
+    commands = np.empty((n, 4), dtype=np.float64)
+    commands[:, 0] = np.resize(freqs, n)
+    commands[:, 1] = np.resize(amps, n)
+    commands[:, 2] = np.resize(freqs[::-1], n)
+    commands[:, 3] = np.resize(amps[::-1], n)
+    return commands
+
+
+def write_synthetic_wav(path: str, seconds: float, sr: int = 44100, seed: int = 0):
+    """メロディ + ベース + ノイズの合成音を1秒ずつ書き出す（メモリに全体を載せない）"""
+    import soundfile as sf
+
+    rng = np.random.default_rng(seed)
+    phase_hi = phase_lo = 0.0
+    with sf.SoundFile(path, 'w', samplerate=sr, channels=1, subtype='PCM_16') as f:
+        for sec in range(int(seconds)):
+            t = np.arange(sr) / sr
+            f_hi = 220.0 * 2 ** (rng.integers(0, 24) / 12)
+            f_lo = 55.0 * 2 ** (rng.integers(0, 12) / 12)
+            hi = np.sin(phase_hi + 2 * np.pi * f_hi * t)
+            lo = np.sin(phase_lo + 2 * np.pi * f_lo * t)
+            phase_hi += 2 * np.pi * f_hi
+            phase_lo += 2 * np.pi * f_lo
+            y = 0.3 * hi + 0.3 * lo + 0.02 * rng.standard_normal(sr)
+            f.write(y.astype(np.float32))
+
+
+def synthetic_stft(seconds: float, sr: int = 22050, fps: int = 66, seed: int = 0):
+    import librosa
+
+    rng = np.random.default_rng(seed)
+    n = int(seconds * sr)
+    y = 0.05 * rng.standard_normal(n).astype(np.float32)
+    t = np.arange(n) / sr
+    for f in (55.0, 110.0, 440.0, 660.0, 880.0):
+        y += (0.3 * np.sin(2 * np.pi * f * t) * (np.sin(t * rng.uniform(0.1, 2.0)) > 0)).astype(np.float32)
+    stft_matrix = np.abs(librosa.stft(y, hop_length=int(sr / fps)))
+    return stft_matrix, librosa.fft_frequencies(sr=sr)
+
+
+class FakeHidBus:
+    """
+    hid.enumerate の代わり。hidapi (Linux) と同じく、条件に関わらず全デバイスの
+    uevent を読んで解析し、条件に合ったデバイスだけ辞書を作って返す。
+    """
+
+    def __init__(self, others: int = 500, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        self._plugged = 0
+        self.devices = [
+            self._uevent(int(rng.integers(1, 0xffff)), int(rng.integers(0, 0xffff)), f"dev{n:04d}", "Generic HID")
+            for n in range(others)
+        ]
+        self.scanned = 0
+
+    def _uevent(self, vendor_id, product_id, serial, name):
+        # 実機と同じく、つなぐたびに別の hidraw ノードになる
+        path = f"/dev/hidraw{self._plugged}"
+        self._plugged += 1
+        return f"DRIVER=hid-generic\nHID_ID=0005:{vendor_id:08X}:{product_id:08X}\n" \
+               f"HID_NAME={name}\nHID_UNIQ={serial}\nDEVNAME={path}\n"
+
+    def plug(self, product_id: int, serial: str) -> str:
+        """つないだデバイスのパスを返す"""
+        from pyjoycon.constants import JOYCON_VENDOR_ID
+        self.devices.append(self._uevent(JOYCON_VENDOR_ID, product_id, serial, "Joy-Con"))
+        return f"/dev/hidraw{self._plugged - 1}"
+
+    def unplug(self, serial: str = None, path: str = None):
+        key = f"HID_UNIQ={serial}\n" if path is None else f"DEVNAME={path}\n"
+        self.devices = [d for d in self.devices if key not in d]
+
+    def enumerate(self, vendor_id: int = 0, product_id: int = 0) -> list:
+        out = []
+        for uevent in self.devices:
+            self.scanned += 1
+            fields = dict(line.split("=", 1) for line in uevent.splitlines())
+            _, vid, pid = fields["HID_ID"].split(":")
+            vid, pid = int(vid, 16), int(pid, 16)
+            if vendor_id and vid != vendor_id or product_id and pid != product_id:
+                continue
+            out.append({
+                "path": fields["DEVNAME"].encode(), "vendor_id": vid, "product_id": pid,
+                "serial_number": fields["HID_UNIQ"], "release_number": 0x100,
+                "manufacturer_string": "", "product_string": fields["HID_NAME"],
+                "usage_page": 1, "usage": 5, "interface_number": -1,
+            })
+        return out
@@ -0,0 +1,74 @@
+import asyncio
+import socket
+import threading
+import time
+import pytest
+
+import rumble
+from fanout import STOP_FRAME, play_tracks_async
+from pyjoycon import AsyncJoyCon, FdTransport
+from pyjoycon.constants import JOYCON_VENDOR_ID, JOYCON_L_PRODUCT_ID, JOYCON_R_PRODUCT_ID
+from tests.synthetic import random_commands
+
+FPS = 66
+
+
+@pytest.fixture
+def served(simulated):
+    """served(**kw) で SimulatedJoyCon を socketpair の向こう側で動かし、(sim, FdTransport) を返す"""
+    sockets = []
+
+    def make(**kw):
+        sim = simulated(**kw)
+        host, device = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        sockets.append(device)
+        threading.Thread(target=sim.serve, args=(device.fileno(),), daemon=True).start()
+        return sim, FdTransport(host.detach())
+    yield make
+    for device in sockets:
+        device.close()
+
+
+def _rumble_writes(sim) -> list:
+    return [r[2:10] for _, r in sim.output_reports if r[0] == 0x10]
+
+
+def _wait_for(condition, timeout: float = 2.0):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        assert time.perf_counter() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_connect_and_read_reports(served):
+    sim, transport = served(color_body=(1, 2, 3), gyro_offset=(-3, 5, 20))
+
+    async def run():
+        async with await AsyncJoyCon.open(JOYCON_VENDOR_ID, JOYCON_L_PRODUCT_ID, transport=transport) as jc:
+            reports = [await asyncio.wait_for(jc.read_report(), 1.0) for _ in range(3)]
+            return jc.color_body, reports
+
+    color_body, reports = asyncio.run(run())
+    assert color_body == (1, 2, 3)
+    assert [r[0] for r in reports] == [0x30] * 3
+    assert (sim.input_mode, sim.imu_enabled) == (0x30, True)
+
+
+def test_play_tracks_async_sends_every_frame(served):
+    devices = [served(product_id=pid) for pid in (JOYCON_L_PRODUCT_ID, JOYCON_R_PRODUCT_ID)]
+    commands = random_commands(FPS)
+
+    async def run():
+        joycons = [await AsyncJoyCon.open(JOYCON_VENDOR_ID, sim.product_id, transport=transport)
+                   for sim, transport in devices]
+        await play_tracks_async([(jc, commands) for jc in joycons], fps=FPS)
+        return joycons
+
+    joycons = asyncio.run(run())
+    frames = rumble.encode_many(commands)
+    expected = [frames[i * 8:(i + 1) * 8] for i in range(FPS)] + [STOP_FRAME]
+    for sim, _ in devices:
+        _wait_for(lambda: len(_rumble_writes(sim)) == len(expected))
+        assert _rumble_writes(sim) == expected
+    for jc in joycons:
+        jc.close()
@@ -0,0 +1,120 @@
+import os
+import numpy as np
+import pytest
+import librosa
+
+import analysis_cache
+import mp3_csv
+import mp3_to_command_noize as engine
+from tests import legacy
+from tests.synthetic import synthetic_stft
+
+
+def test_stream_matches_batch(synthetic_wav):
+    path = synthetic_wav(20.0)
+    batch = np.array(engine.analyze_with_stft(path))
+    stream = np.concatenate(list(engine.analyze_with_stft_stream(path, chunk_frames=300)))
+
+    assert batch.shape == stream.shape
+    diff = np.abs(batch - stream)
+    assert np.all(diff[:, [0, 2]] == 0.0), "ピーク周波数が一括処理と一致しません"
+    assert np.all(diff[:, [1, 3]] <= 1e-6), "振幅が許容誤差を超えています"
+
+
+@pytest.mark.parametrize("reference, vectorized", [
+    (legacy.stft_peaks, engine.pick_stft_peaks),
+    (legacy.dsp_peaks, mp3_csv._pick_dsp_peaks),
+])
+def test_peak_picking_matches_loop(reference, vectorized):
+    stft_matrix, frequencies = synthetic_stft(10.0)
+    rng = np.random.default_rng(1)
+    # 閾値ちょうどの値や同じ振幅のビンが並ぶ列も混ぜる
+    stft_matrix[:, :50] = rng.choice([0.0, 0.05, np.float32(0.05), 0.2, 500.0], size=(stft_matrix.shape[0], 50))
+    stft_matrix[:, 50:60] = 0.0
+
+    expected = np.array(reference(stft_matrix, frequencies), dtype=np.float32)
+    actual = vectorized(stft_matrix, frequencies)
+    assert actual.dtype == np.float32
+    assert np.array_equal(actual, expected)
+
+
+@pytest.mark.parametrize("analyze", [
+    engine.analyze_with_stft,
+    mp3_csv.analyze_audio_for_joycon_dsp,
+    lambda path: engine.analyze_with_f0(path, method="hps"),
+    lambda path: engine.analyze_with_f0(path, method="yin"),
+], ids=["stft", "dsp", "f0-hps", "f0-yin"])
+def test_cache_off_decodes_once(synthetic_wav, monkeypatch, profiler, analyze):
+    path = synthetic_wav(5.0)
+    cached = np.asarray(analyze(path))
+    cached = np.asarray(analyze(path))  # 2回目はキャッシュから
+    monkeypatch.setenv("JOYCON_CACHE", "0")
+    profiler.spans.clear()
+
+    uncached = np.asarray(analyze(path))
+    calls = {name: s["calls"] for name, s in profiler.summary().items()}
+    assert calls.get("decode") == 1 and calls.get("hpss") == 1, calls
+    assert np.array_equal(cached, uncached)
+
+
+def test_cache_hit_skips_decode(synthetic_wav, monkeypatch):
+    path = synthetic_wav(5.0)
+    first = engine.analyze_with_stft(path)
+
+    def decode(*args, **kw):
+        raise AssertionError("キャッシュがあるのに音声を解析し直しました")
+    monkeypatch.setattr(librosa, "load", decode)
+    monkeypatch.setattr(librosa.effects, "hpss", decode)
+    monkeypatch.setattr(librosa, "stft", decode)
+    assert np.array_equal(engine.analyze_with_stft(path), first)
+
+
+def test_cache_key_follows_content(tmp_path):
+    cache = analysis_cache.AnalysisCache(tmp_path / "cache")
+    a, b, c = tmp_path / "a.wav", tmp_path / "b.wav", tmp_path / "c.wav"
+    a.write_bytes(b"same")
+    b.write_bytes(b"same")
+    c.write_bytes(b"other")
+
+    # ファイル名ではなく内容とパラメータで決まる
+    assert cache.key(str(a), "pcm", sr=None) == cache.key(str(b), "pcm", sr=None)
+    assert cache.key(str(a), "pcm", sr=None) != cache.key(str(c), "pcm", sr=None)
+    assert cache.key(str(a), "pcm", sr=None) != cache.key(str(a), "pcm", sr=22050)
+
+
+def test_cache_hit_survives_concurrent_evict(tmp_path, monkeypatch):
+    cache = analysis_cache.AnalysisCache(tmp_path / "cache")
+    cache.store("k", np.arange(10.0), sr=1)
+
+    def evicted(path, *args, **kw):
+        # 読んだ直後に他のプロセスが削除した
+        os.unlink(path)
+        raise FileNotFoundError(path)
+    monkeypatch.setattr(os, "utime", evicted)
+
+    array, meta = cache.load("k")
+    assert np.array_equal(array, np.arange(10.0)) and meta == {"sr": 1}
+
+
+def test_interrupted_store_keeps_the_old_entry(tmp_path, monkeypatch):
+    cache = analysis_cache.AnalysisCache(tmp_path / "cache")
+    cache.store("k", np.arange(10.0), sr=1)
+
+    def interrupted(obj, f):
+        f.write('{"sr": ')
+        raise KeyboardInterrupt
+    monkeypatch.setattr(analysis_cache.json, "dump", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        cache.store("k", np.arange(10.0), sr=1)
+
+    array, meta = cache.load("k")
+    assert np.array_equal(array, np.arange(10.0)) and meta == {"sr": 1}
+
+
+def test_evict_keeps_newest(tmp_path):
+    cache = analysis_cache.AnalysisCache(tmp_path / "cache", max_bytes=4000)  # 2件分
+    for n in range(4):
+        cache.store(f"k{n}", np.zeros(200), sr=n)
+        os.utime(cache.root / f"k{n}.npy", (n, n))  # 使用時刻の順序を確定させる
+
+    assert [key for key, _, _ in cache.entries()] == ["k2", "k3"]
@@ -0,0 +1,46 @@
+import os
+
+import pytest
+
+import jcr
+import joycon_convert
+
+
+def test_find_inputs(tmp_path):
+    (tmp_path / "album" / "disc2").mkdir(parents=True)
+    for name in ("album/a.mp3", "album/disc2/b.WAV", "album/cover.jpg", "c.flac"):
+        (tmp_path / name).write_bytes(b"")
+
+    found = joycon_convert.find_inputs([str(tmp_path / "album"), str(tmp_path / "*.flac")])
+    assert [p.relative_to(tmp_path).as_posix() for p in found] == ["album/a.mp3", "album/disc2/b.WAV", "c.flac"]
+
+
+def test_converts_then_skips_up_to_date(synthetic_wav, tmp_path):
+    inputs = [synthetic_wav(2.0, name=f"song{n}.wav") for n in range(2)]
+    out_dir = tmp_path / "out"
+    argv = inputs + ["-o", str(out_dir), "-j", "2"]
+
+    assert joycon_convert.main(argv) == 0
+    outputs = sorted(out_dir.iterdir())
+    assert [p.name for p in outputs] == ["song0_skeleton_commands.jcr", "song1_skeleton_commands.jcr"]
+    for path in outputs:
+        with jcr.load_track(str(path)) as track:
+            assert len(track) == 2 * 66 + 1
+
+    mtimes = [os.stat(p).st_mtime_ns for p in outputs]
+    assert joycon_convert.main(argv) == 0
+    assert [os.stat(p).st_mtime_ns for p in outputs] == mtimes
+
+
+def test_failed_file_leaves_no_output(tmp_path):
+    broken = tmp_path / "broken.mp3"
+    broken.write_bytes(b"not audio")
+
+    assert joycon_convert.main([str(broken), "-j", "1"]) == 1
+    assert not joycon_convert.output_path_for(broken, None, True).exists()
+
+
+def test_unknown_f0_method_is_rejected(tmp_path, capsys):
+    with pytest.raises(SystemExit):
+        joycon_convert.main([str(tmp_path), "--engine", "f0", "--f0-method", "crepe"])
+    assert "invalid choice" in capsys.readouterr().err
@@ -0,0 +1,37 @@
+import csv
+import numpy as np
+
+import csv_emu
+from tests import legacy
+from tests.synthetic import random_commands
+
+
+def _commands():
+    commands = random_commands(66 * 20, seed=3)
+    commands[::7, 1] = 0.0  # 無音のフレームも混ぜる
+    commands[::5, 2] = 0.0
+    return commands
+
+
+def test_synthesize_matches_loop(tmp_path):
+    csv_path = str(tmp_path / "commands.csv")
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['hf_freq', 'hf_amp', 'lf_freq', 'lf_amp'])
+        writer.writerows(_commands().tolist())
+
+    expected = legacy.synthesize(csv_emu.load_commands(csv_path).tolist())
+    audio, sr = csv_emu.synthesize_joycon_audio(csv_path)
+    assert sr == 44100 and audio.shape == expected.shape
+    # 音量 0.5 に正規化した後で、float32 の位相による差だけ
+    assert np.max(np.abs(audio - expected)) <= 1e-4
+
+
+def test_blocks_do_not_depend_on_block_size():
+    commands = _commands()
+    for interpolate in (False, True):
+        whole = np.concatenate(list(csv_emu.synthesize_blocks(commands, interpolate=interpolate,
+                                                              block_frames=len(commands))))
+        blocks = np.concatenate(list(csv_emu.synthesize_blocks(commands, interpolate=interpolate,
+                                                               block_frames=7)))
+        assert np.allclose(whole, blocks, atol=1e-5)
@@ -0,0 +1,113 @@
+import time
+
+from pyjoycon import DeviceRegistry
+from pyjoycon import transport
+from pyjoycon.constants import JOYCON_VENDOR_ID, JOYCON_L_PRODUCT_ID, JOYCON_R_PRODUCT_ID, JOYCON_PRO_PRODUCT_ID
+from tests import legacy
+from tests.synthetic import FakeHidBus
+
+
+def _bus():
+    bus = FakeHidBus(others=50)
+    bus.plug(JOYCON_L_PRODUCT_ID, "98:b6:e9:00:00:01")
+    bus.plug(JOYCON_R_PRODUCT_ID, "98:b6:e9:00:00:02")
+    bus.plug(JOYCON_PRO_PRODUCT_ID, "98:b6:e9:00:00:03")
+    return bus
+
+
+def test_refresh_matches_legacy_enumeration():
+    bus = _bus()
+    registry = DeviceRegistry(enumerate=bus.enumerate)
+    registry.refresh()
+
+    ids = legacy.get_device_ids(bus.enumerate)
+    assert registry.get_L_ids() == [i for i in ids if i[1] == JOYCON_L_PRODUCT_ID]
+    assert registry.get_R_ids() == [i for i in ids if i[1] == JOYCON_R_PRODUCT_ID]
+    assert [i[2] for i in registry.get_pro_ids()] == ["98:b6:e9:00:00:03"]
+
+
+def test_added_and_removed_callbacks():
+    bus = _bus()
+    registry = DeviceRegistry(enumerate=bus.enumerate)
+    registry.refresh()
+    added, removed = [], []
+    registry.on_added(lambda ids, path: added.append((ids, path)))
+    registry.on_removed(lambda ids, path: removed.append((ids, path)))
+
+    bus.unplug("98:b6:e9:00:00:02")
+    path = bus.plug(JOYCON_R_PRODUCT_ID, "98:b6:e9:00:00:04")
+    assert registry.refresh() == (added, removed)
+    assert added == [((JOYCON_VENDOR_ID, JOYCON_R_PRODUCT_ID, "98:b6:e9:00:00:04"), path.encode())]
+    assert [ids[2] for ids, _ in removed] == ["98:b6:e9:00:00:02"]
+    assert registry.refresh() == ([], [])
+
+
+def test_controllers_without_serial_are_kept_apart():
+    bus = _bus()
+    registry = DeviceRegistry(enumerate=bus.enumerate)
+    registry.refresh()
+    added, removed = [], []
+    registry.on_added(lambda ids, path: added.append(path))
+    registry.on_removed(lambda ids, path: removed.append(path))
+
+    first, second = bus.plug(JOYCON_L_PRODUCT_ID, ""), bus.plug(JOYCON_L_PRODUCT_ID, "")
+    registry.refresh()
+    # the callbacks get each controller's own path to open it by
+    assert added == [first.encode(), second.encode()]
+    assert len(registry.get_L_ids()) == 3
+
+    bus.unplug(path=second)
+    registry.refresh()
+    assert removed == [second.encode()]
+    assert first.encode() in registry.devices and len(registry.get_L_ids()) == 2
+
+
+def test_open_by_path(monkeypatch):
+    opened = []
+
+    class Device:
+        def open_path(self, path):
+            opened.append(path)
+
+        def open(self, *ids):
+            opened.append(ids)
+    monkeypatch.setattr(transport.hid, "device", Device)
+
+    transport.open_hid_device(JOYCON_VENDOR_ID, JOYCON_L_PRODUCT_ID, path=b"/dev/hidraw7")
+    transport.open_hid_device(JOYCON_VENDOR_ID, JOYCON_L_PRODUCT_ID)
+    assert opened == [b"/dev/hidraw7", (JOYCON_VENDOR_ID, JOYCON_L_PRODUCT_ID, None)]
+
+
+def test_failing_callback_does_not_stop_the_others(caplog):
+    bus = _bus()
+    registry = DeviceRegistry(enumerate=bus.enumerate)
+    registry.refresh()
+    added = []
+
+    @registry.on_added
+    def broken(ids, path):
+        raise RuntimeError("callback failed")
+    registry.on_added(lambda ids, path: added.append(ids))
+
+    bus.plug(JOYCON_L_PRODUCT_ID, "98:b6:e9:00:00:05")
+    registry.refresh()
+    assert [i[2] for i in added] == ["98:b6:e9:00:00:05"]
+    assert "callback failed" in caplog.text
+
+
+def test_watch_detects_plug():
+    bus = _bus()
+    registry = DeviceRegistry(enumerate=bus.enumerate)
+    registry.refresh()
+    added = []
+    registry.on_added(lambda ids, path: added.append(ids))
+
+    registry.watch(interval=0.01, use_udev=False)
+    try:
+        bus.plug(JOYCON_L_PRODUCT_ID, "98:b6:e9:00:00:06")
+        deadline = time.perf_counter() + 2.0
+        while not added and time.perf_counter() < deadline:
+            time.sleep(0.005)
+    finally:
+        registry.stop()
+    assert [i[2] for i in added] == ["98:b6:e9:00:00:06"]
@@ -0,0 +1,55 @@
+import asyncio
+import numpy as np
+
+from pyjoycon import ButtonEventJoyCon
+from pyjoycon.constants import JOYCON_VENDOR_ID, JOYCON_R_PRODUCT_ID
+from tests import legacy
+
+
+def _joycon(simulated, **kw):
+    sim = simulated(product_id=JOYCON_R_PRODUCT_ID)
+    jc = ButtonEventJoyCon(JOYCON_VENDOR_ID, JOYCON_R_PRODUCT_ID, transport=sim, **kw)
+    sim.close()  # the test calls the hook itself
+    jc._events_buffer.clear()
+    for name in legacy.EVENT_NAMES:
+        setattr(jc, "_previous_" + name, 0)
+    return jc
+
+
+def test_events_match_legacy_hook(simulated):
+    rng = np.random.default_rng(0)
+    reports = []
+    buttons = bytes(3)
+    for _ in range(2000):
+        if rng.random() < 0.3:
+            buttons = rng.integers(0, 256, 3, dtype=np.uint8).tobytes()
+        reports.append(b'\x30\x00\x00' + buttons + bytes(43))
+
+    jc = _joycon(simulated, track_sticks=True)
+    expected = []
+    jc.joycon_button_event = lambda button, state: expected.append((button, state))
+    for report in reports:
+        jc._input_report = report
+        legacy.event_hook_right(jc)
+
+    jc = _joycon(simulated, track_sticks=True)
+    for report in reports:
+        jc._input_report = report
+        jc._event_tracking_update_hook(jc)
+    assert expected and list(jc.events()) == expected
+
+
+def test_aevents_delivers_presses(simulated):
+    sim = simulated(product_id=JOYCON_R_PRODUCT_ID)
+    jc = ButtonEventJoyCon(JOYCON_VENDOR_ID, JOYCON_R_PRODUCT_ID, transport=sim)
+
+    async def press(count: int = 6):
+        received = []
+        events = jc.aevents()
+        for i in range(count):
+            sim.buttons[0] = 0x08 if i % 2 == 0 else 0x00  # a
+            received.append(await asyncio.wait_for(events.__anext__(), 1.0))
+        await events.aclose()
+        return received
+
+    assert asyncio.run(press()) == [("a", 1), ("a", 0)] * 3
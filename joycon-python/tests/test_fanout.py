@@ -0,0 +1,91 @@
+import threading
+import numpy as np
+import pytest
+
+import jcr
+import rumble
+from fanout import STOP_FRAME, Fanout, play_tracks_on_joycons
+from tests.synthetic import random_commands
+
+FPS = 66
+
+
+@pytest.fixture
+def thread_errors(monkeypatch):
+    """送信スレッドから漏れた例外を集める"""
+    errors = []
+    monkeypatch.setattr(threading, "excepthook", errors.append)
+    return errors
+
+
+def _sent(sim) -> list:
+    return [r for _, r in sim.rumble_reports()]
+
+
+def test_every_frame_then_stop(audio_joycon):
+    commands = random_commands(FPS)
+    devices = [audio_joycon(write_latency=0.001), audio_joycon(write_latency=0.003)]
+    writers = play_tracks_on_joycons([(jc, commands) for jc, _ in devices], fps=FPS)
+
+    frames = rumble.encode_many(commands)
+    expected = [frames[i * 8:(i + 1) * 8] for i in range(FPS)] + [STOP_FRAME]
+    for (_, sim), w in zip(devices, writers):
+        assert _sent(sim) == expected
+        assert (w.error, w.overruns) == (None, 0)
+
+
+def test_track_is_encoded_once(audio_joycon, monkeypatch):
+    from main import play_audio_on_joycons
+
+    encoded = []
+
+    def encode_many(commands):
+        encoded.append(len(commands))
+        return rumble.encode_many(commands)
+    monkeypatch.setattr(jcr, "encode_many", encode_many)
+    commands = random_commands(FPS)
+    devices = [audio_joycon(), audio_joycon()]
+    play_audio_on_joycons([jc for jc, _ in devices], commands, fps=FPS)
+
+    assert encoded == [FPS]
+    assert _sent(devices[0][1]) == _sent(devices[1][1])
+
+
+def test_latency_compensation_aligns_devices(audio_joycon):
+    commands = random_commands(FPS)
+    latencies = (0.001, 0.004)
+    devices = [audio_joycon(write_latency=lat) for lat in latencies]
+    play_tracks_on_joycons([(jc, commands) for jc, _ in devices], fps=FPS, latencies=list(latencies))
+
+    arrived = np.array([[t for t, _ in sim.rumble_reports()[:FPS]] for _, sim in devices])
+    # 補正しなければ 3 ms ずれる
+    assert np.median(np.abs(arrived[0] - arrived[1])) < 0.0015
+
+
+def test_unplugged_device_does_not_stop_the_others(audio_joycon, thread_errors):
+    commands = random_commands(FPS)
+    (first, first_sim), (late, late_sim) = audio_joycon(write_latency=0.001), audio_joycon(write_latency=0.001)
+    lost, lost_sim = audio_joycon(write_latency=0.001, unplug_after=20)
+    fanout = Fanout(FPS)
+    fanout.add(first, commands)
+    lost_writer = fanout.add(lost, commands)
+    threading.Timer(0.5, fanout.add, (late, commands)).start()
+    fanout.play(FPS)
+
+    assert len(_sent(first_sim)) == FPS + 1
+    assert 1 < len(_sent(late_sim)) < FPS  # 途中から鳴り始める
+    assert len(_sent(lost_sim)) == 20 and isinstance(lost_writer.error, OSError)
+    assert not thread_errors
+
+
+def test_remove_after_unplug(audio_joycon, thread_errors):
+    commands = random_commands(FPS)
+    lost, sim = audio_joycon(write_latency=0.001)
+    fanout = Fanout(FPS)
+    writer = fanout.add(lost, commands)
+    sim.unplug()  # 停止フレームの書き込みも失敗する
+    fanout.remove(lost)
+
+    assert not writer.is_alive()
+    assert isinstance(writer.error, OSError)
+    assert not thread_errors
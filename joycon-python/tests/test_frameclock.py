@@ -0,0 +1,66 @@
+import asyncio
+import time
+import numpy as np
+import pytest
+
+from frameclock import FrameClock, POLICY_DROP, POLICY_STRETCH
+
+FPS = 100
+
+
+def _run(clock, num_frames, stall_at=None, stall=0.0):
+    sent = []
+    t0 = time.perf_counter()
+    for i in clock.ticks(num_frames):
+        sent.append(i)
+        if i == stall_at:
+            time.sleep(stall)
+    return sent, time.perf_counter() - t0
+
+
+def test_schedule_does_not_drift():
+    clock = FrameClock(FPS)
+    sent, elapsed = _run(clock, 50)
+
+    assert sent == list(range(50))
+    assert np.allclose(clock.deadlines - clock.start_time, np.arange(50) / FPS)
+    # 予定時刻は開始時刻からの絶対時刻なので、遅れは積み重ならない
+    offsets = clock.sent_at - clock.start_time - np.arange(50) / FPS
+    assert np.all(offsets >= 0.0) and np.median(offsets) < 0.002
+    # 最後のフレームの再生時間まで待つ（上限はスケジューラの揺らぎを見込む）
+    assert 50 / FPS <= elapsed < 50 / FPS + 0.05
+
+
+def test_drop_skips_expired_frames():
+    clock = FrameClock(FPS, policy=POLICY_DROP)
+    sent, _ = _run(clock, 50, stall_at=10, stall=0.1)
+
+    assert clock.skipped > 0 and len(sent) == 50 - clock.skipped
+    assert sent == sorted(sent) and sent[-1] == 49
+    assert clock.stats()["sent"] == len(sent)
+
+
+def test_stretch_delays_the_rest():
+    clock = FrameClock(FPS, policy=POLICY_STRETCH)
+    sent, elapsed = _run(clock, 50, stall_at=10, stall=0.1)
+
+    assert sent == list(range(50)) and clock.skipped == 0
+    # 止まった後の予定時刻は、止まった分だけ後ろへずれる
+    assert np.diff(clock.deadlines)[10] > 0.1
+    assert np.allclose(np.diff(clock.deadlines)[11:], 1 / FPS)
+    assert elapsed == pytest.approx(50 / FPS + 0.1, abs=0.05)
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        FrameClock(FPS, policy="rewind")
+
+
+def test_aticks_yields_every_frame():
+    clock = FrameClock(FPS)
+
+    async def collect():
+        return [i async for i in clock.aticks(20)]
+
+    assert asyncio.run(collect()) == list(range(20))
+    assert clock.stats()["sent"] == 20
@@ -0,0 +1,66 @@
+import time
+import glm
+import numpy as np
+import pytest
+
+from pyjoycon import GyroTrackingJoyCon
+from pyjoycon.constants import JOYCON_VENDOR_ID, JOYCON_R_PRODUCT_ID
+
+GYRO_OFFSET = (-3, 5, 20)
+
+
+def _tracker(simulated, **kw):
+    sim = simulated(product_id=JOYCON_R_PRODUCT_ID, gyro_offset=GYRO_OFFSET)
+    jc = GyroTrackingJoyCon(JOYCON_VENDOR_ID, JOYCON_R_PRODUCT_ID, transport=sim, **kw)
+    sim.close()  # the test calls the hooks itself
+    time.sleep(0.05)  # let the reports already queued by the simulator land
+    jc.reset_orientation()
+    return jc
+
+
+def _reports(gyro: np.ndarray) -> list:
+    """0x30 reports carrying the raw gyro samples, 3 per report"""
+    reports = []
+    for i in range(0, len(gyro), 3):
+        report = bytearray(49)
+        report[0] = 0x30
+        imu = np.zeros((3, 6), dtype='<i2')
+        imu[:, 3:] = gyro[i:i + 3]
+        report[13:49] = imu.tobytes()
+        reports.append(bytes(report))
+    return reports
+
+
+def _angle(q) -> float:
+    return np.degrees(glm.angle(glm.dquat(q)))
+
+
+def test_rotation_about_one_axis_adds_up(simulated):
+    jc = _tracker(simulated)
+    rate = 400  # raw units above the offset, about the z axis
+    reports = _reports(np.tile(np.add(GYRO_OFFSET, (0, 0, rate)), (300, 1)))
+    for report in reports:
+        jc._input_report = report
+        GyroTrackingJoyCon._gyro_update_hook(jc)
+
+    expected = abs(len(reports) * 3 * rate * jc._GYRO_COEFF_Z * jc._GYRO_STEP)
+    assert _angle(jc.direction_Q) == pytest.approx(np.degrees(expected), rel=1e-3)
+    # rotating about z leaves the z axis where it was
+    assert glm.length(jc.direction_Z - glm.vec3(0, 0, 1)) < 1e-5
+
+
+def test_integration_thread_matches_reader_thread(simulated):
+    rng = np.random.default_rng(0)
+    gyro = np.add(GYRO_OFFSET, rng.integers(-2000, 2000, (600, 3)))
+    reports = _reports(gyro)
+    inline, threaded = _tracker(simulated), _tracker(simulated, integrate_in_thread=True)
+    for report in reports:
+        inline._input_report = threaded._input_report = report
+        GyroTrackingJoyCon._gyro_update_hook(inline)
+        GyroTrackingJoyCon._gyro_enqueue_hook(threaded)
+
+    # the integration thread catches up with the reader thread
+    deadline = time.perf_counter() + 2.0
+    while _angle(glm.inverse(inline.direction_Q) * threaded.direction_Q) >= 1e-3:
+        assert time.perf_counter() < deadline, "timed out"
+        time.sleep(0.005)
@@ -0,0 +1,75 @@
+import csv
+import numpy as np
+import pytest
+
+import jcr
+import rumble
+from tests.synthetic import random_commands
+
+
+def _write_csv(path, commands):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['hf_freq', 'hf_amp', 'lf_freq', 'lf_amp'])
+        writer.writerows(commands.tolist())
+
+
+def test_csv_and_jcr_frames_match(tmp_path):
+    commands = random_commands(2000)
+    csv_path, jcr_path = tmp_path / "track.csv", tmp_path / "track.jcr"
+    _write_csv(csv_path, commands)
+    jcr.csv_to_jcr(str(csv_path), str(jcr_path), fps=66)
+
+    expected = rumble.encode_many(jcr.load_commands_from_csv(str(csv_path)))
+    with jcr.load_track(str(jcr_path)) as track:
+        assert (track.fps, len(track)) == (66, len(commands))
+        assert bytes(track.frames) == expected
+        assert np.array_equal(track.raw, commands.astype(np.float32))
+
+
+def test_csv_rows_without_four_columns_are_skipped(tmp_path):
+    path = tmp_path / "track.csv"
+    path.write_text("hf_freq,hf_amp,lf_freq,lf_amp\n320,0.5,160,0.5\n\n1,2,3\n80,0.1,40,0.2\n", encoding="utf-8")
+    jcr.csv_to_jcr(str(path), str(tmp_path / "track.jcr"))
+
+    with jcr.load_track(str(tmp_path / "track.jcr")) as track:
+        assert np.array_equal(track.raw, np.float32([[320, 0.5, 160, 0.5], [80, 0.1, 40, 0.2]]))
+
+
+@pytest.mark.parametrize("shape", [(100,), (25, 3), (10, 4, 2)])
+def test_commands_of_the_wrong_shape_are_rejected(tmp_path, shape):
+    commands = np.zeros(shape)
+    with pytest.raises(ValueError, match="shape"):
+        jcr.encode_commands(commands)
+    with pytest.raises(ValueError, match="shape"):
+        jcr.save_commands_to_jcr(commands, str(tmp_path / "track.jcr"))
+    assert not (tmp_path / "track.jcr").exists()
+
+
+def test_jcr_to_csv_round_trip(tmp_path):
+    commands = random_commands(500).astype(np.float32)
+    jcr_path, csv_path = tmp_path / "track.jcr", tmp_path / "track.csv"
+    jcr.save_commands_to_jcr(commands, str(jcr_path))
+    jcr.jcr_to_csv(str(jcr_path), str(csv_path))
+
+    assert np.array_equal(np.loadtxt(csv_path, delimiter=',', skiprows=1, dtype=np.float32), commands)
+
+
+@pytest.mark.parametrize("include_raw", [True, False])
+def test_truncated_file_is_rejected(tmp_path, include_raw):
+    path = tmp_path / "track.jcr"
+    jcr.save_commands_to_jcr(random_commands(100), str(path), include_raw=include_raw)
+    data = path.read_bytes()
+    path.write_bytes(data[:-1])
+
+    with pytest.raises(ValueError, match="truncated"):
+        jcr.RumbleTrack(str(path))
+
+
+def test_header_only_is_rejected(tmp_path):
+    path = tmp_path / "track.jcr"
+    jcr.save_commands_to_jcr(random_commands(100), str(path))
+    path.write_bytes(path.read_bytes()[:jcr.JCR_HEADER.size])
+
+    with pytest.raises(ValueError, match="truncated"):
+        jcr.RumbleTrack(str(path))
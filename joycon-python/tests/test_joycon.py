@@ -0,0 +1,213 @@
+import time
+import numpy as np
+import pytest
+
+from pyjoycon import CalibrationCache, JoyCon, PythonicJoyCon
+from pyjoycon.constants import JOYCON_VENDOR_ID, JOYCON_L_PRODUCT_ID, JOYCON_R_PRODUCT_ID
+from pyjoycon.imu import ACCEL_IN_G, GYRO_IN_RAD, IMUHistory
+from tests import legacy
+
+CALIBRATION = dict(accel_offset=(12, -30, 7), gyro_offset=(-3, 5, 20), gyro_coeff=(13000, 13400, 13500))
+
+
+def _random_reports(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    for _ in range(n):
+        yield bytes([0x30]) + rng.integers(0, 256, 48, dtype=np.uint8).tobytes()
+
+
+def _wait_for(condition, timeout: float = 2.0):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        assert time.perf_counter() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def pythonic(simulated):
+    def make(product_id=JOYCON_L_PRODUCT_ID, **kw):
+        sim = simulated(product_id=product_id, **CALIBRATION)
+        jc = PythonicJoyCon(JOYCON_VENDOR_ID, product_id, transport=sim, **kw)
+        sim.close()  # stop the reports so the test can set _input_report itself
+        return jc
+    return make
+
+
+# --- input reports ---
+
+def test_get_status_matches_legacy(pythonic):
+    jc = pythonic()
+    for report in _random_reports(500):
+        jc._input_report = report
+        assert jc.get_status() == legacy.get_status(jc)
+        assert jc.accel == legacy.accel(jc)
+        assert jc.gyro == legacy.gyro(jc)
+
+
+def test_short_report_is_rejected(pythonic):
+    jc = pythonic()
+    report = next(_random_reports(1))
+    jc._input_report = report
+    status = jc.get_status()
+
+    with pytest.raises(ValueError):
+        jc._input_report = report[:20]
+    # the previous report stays, raw bytes and decoded fields alike
+    assert jc._input_report == report and jc.get_status() == status
+
+
+def test_reader_survives_truncated_read(simulated):
+    sim = simulated(product_id=JOYCON_R_PRODUCT_ID)
+    jc = JoyCon(JOYCON_VENDOR_ID, JOYCON_R_PRODUCT_ID, transport=sim)
+    read, truncated = jc._read_input_report, []
+
+    def read_once_truncated():
+        report = read()
+        if report[0] == 0x30 and not truncated:
+            truncated.append(report)
+            return report[:20]
+        return report
+    jc._read_input_report = read_once_truncated
+    sim.buttons[0] = 0x08  # a
+
+    _wait_for(jc.get_button_a)
+    assert truncated
+
+
+@pytest.mark.parametrize("product_id", [JOYCON_L_PRODUCT_ID, JOYCON_R_PRODUCT_ID])
+def test_get_imu_matches_properties(pythonic, product_id):
+    jc = pythonic(product_id)
+    units = np.array([ACCEL_IN_G] * 3 + [GYRO_IN_RAD] * 3)
+    for report in _random_reports(500):
+        jc._input_report = report
+        # including the left/right inversion, the same values as the tuple properties
+        expected = np.hstack([jc.accel, jc.gyro])
+        assert np.array_equal(jc.get_imu(dtype=np.float64), expected)
+        assert np.array_equal(jc.get_imu(units, dtype=np.float64), np.hstack([jc.accel_in_g, jc.gyro_in_rad]))
+        assert np.allclose(jc.get_imu(), expected, rtol=1e-6)
+
+
+def test_imu_history_wraps_in_order():
+    history = IMUHistory(0.1)  # 20 samples
+    for i in range(50):
+        history.push(np.full((3, 6), i, dtype=np.int16), i * 0.015)
+
+    times, samples = history.get()
+    assert len(times) == 20 and np.all(np.diff(times) > 0)
+    assert np.array_equal(samples[-3:, 0], [49, 49, 49])
+    assert times[-1] == pytest.approx(49 * 0.015)
+    assert len(history.get(0.05)[0]) == 10
+
+
+def test_imu_history_fills_while_streaming(simulated):
+    sim = simulated()
+    jc = PythonicJoyCon(JOYCON_VENDOR_ID, sim.product_id, transport=sim)
+    jc.enable_imu_history(0.2)
+    time.sleep(0.3)
+    times, samples = jc.get_imu_history()
+
+    assert samples.shape == (len(times), 6)
+    # 3 samples per 15 ms report
+    assert np.median(np.diff(times)) == pytest.approx(0.005, abs=0.001)
+
+
+# --- subcommands ---
+
+def test_spi_read_many_matches_flash(simulated):
+    sim = simulated(reply_latency=0.005)
+    jc = JoyCon(JOYCON_VENDOR_ID, JOYCON_L_PRODUCT_ID, transport=sim)
+    spans = [(0x6000 + i * 0x10, 0x10) for i in range(16)]
+
+    batched = jc._spi_flash_read_many(spans)
+    assert batched == [jc._spi_flash_read(address, size) for address, size in spans]
+    assert batched == [bytes(sim.spi_flash[a:a + n]) for a, n in spans]
+    assert not jc._pending_replies
+
+
+def test_subcommand_resent_after_timeout(simulated):
+    sim = simulated()
+    jc = JoyCon(JOYCON_VENDOR_ID, JOYCON_L_PRODUCT_ID, transport=sim)
+    sim.reply_latency = 0.25
+    sent = len(sim.output_reports)
+
+    ack, _ = jc._send_subcmd_get_response(b'\x30', b'\x01', timeout=0.1, retries=5)
+    assert ack
+    assert sum(1 for _, r in sim.output_reports[sent:] if r[0] == 0x01 and r[10] == 0x30) == 3
+    # the late replies to the first two attempts find no waiter and are dropped
+    time.sleep(0.3)
+    assert not jc._pending_replies
+
+
+def test_subcommand_timeout_leaves_no_waiter(simulated):
+    sim = simulated()
+    jc = JoyCon(JOYCON_VENDOR_ID, JOYCON_L_PRODUCT_ID, transport=sim)
+    sim.close()  # never replies again
+
+    with pytest.raises(TimeoutError):
+        jc._send_subcmd_get_response(b'\x30', b'\x01', timeout=0.02, retries=2)
+    assert not jc._pending_replies
+
+
+def test_duplicate_reply_goes_to_next_waiter_only(simulated):
+    sim = simulated()
+    jc = JoyCon(JOYCON_VENDOR_ID, JOYCON_L_PRODUCT_ID, transport=sim)
+    sim.close()
+    reply = bytearray(49)
+    reply[0], reply[13], reply[14] = 0x21, 0x80, 0x30
+
+    first, second = jc._send_subcommand(b'\x30', b'\x01'), jc._send_subcommand(b'\x30', b'\x02')
+    first.cancel()
+    jc._dispatch_reply(bytes(reply))
+    assert second.result(0)[0]
+    jc._dispatch_reply(bytes(reply))  # nobody is waiting any more
+    assert not jc._pending_replies
+
+
+def test_lamp_setters(simulated):
+    sim = simulated()
+    jc = JoyCon(JOYCON_VENDOR_ID, JOYCON_L_PRODUCT_ID, transport=sim)
+
+    assert jc.set_player_lamp_on(0b0101) is None
+    ack, data = jc.set_player_lamp_on(0b0011, wait=True)
+    assert ack and data[1] == 0x30
+    assert [r[11] for _, r in sim.output_reports if r[0] == 0x01 and r[10] == 0x30] == [0b0101, 0b0011]
+    assert not jc._pending_replies
+
+
+# --- connect and calibration cache ---
+
+def test_calibration_cache(simulated, tmp_path):
+    cache = CalibrationCache(tmp_path)
+    serial = "98:B6:E9:00:00:01"
+
+    def connect():
+        sim = simulated(color_body=(1, 2, 3), **CALIBRATION)
+        jc = JoyCon(JOYCON_VENDOR_ID, JOYCON_L_PRODUCT_ID, serial=serial, transport=sim, calibration_cache=cache)
+        return jc, sim
+
+    cold, _ = connect()
+    warm, sim = connect()
+    fields = ("color_body", "_ACCEL_OFFSET_X", "_GYRO_OFFSET_Z", "_GYRO_COEFF_Y")
+    assert [getattr(warm, f) for f in fields] == [getattr(cold, f) for f in fields]
+    assert warm.color_body == (1, 2, 3)
+    # a cache hit is still checked against SPI flash in the background, in one batch
+    _wait_for(lambda: sum(1 for _, r in sim.output_reports if r[0] == 0x01 and r[10] == 0x10) == 4)
+
+
+def test_background_refresh_keeps_imu_sign(simulated, tmp_path):
+    """A stale cache entry is replaced by the SPI calibration, with the left yz inversion kept."""
+    cache = CalibrationCache(tmp_path)
+    serial = "98:B6:E9:00:00:02"
+    stale = simulated()
+    cache.store(JOYCON_L_PRODUCT_ID, serial, bytes(stale.spi_flash[0x6050:0x6056]),
+                bytes(stale.spi_flash[0x6020:0x6038]))
+
+    sim = simulated(**CALIBRATION)
+    jc = PythonicJoyCon(JOYCON_VENDOR_ID, JOYCON_L_PRODUCT_ID, serial=serial, transport=sim,
+                        calibration_cache=cache)
+    _wait_for(lambda: jc._GYRO_OFFSET_Z == 20)
+    sim.close()
+
+    for report in _random_reports(100, seed=1):
+        jc._input_report = report
+        assert np.array_equal(jc.get_imu(dtype=np.float64), np.hstack([legacy.accel(jc), legacy.gyro(jc)]))
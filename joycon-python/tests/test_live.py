@@ -0,0 +1,84 @@
+import librosa
+import numpy as np
+
+import live
+import mp3_to_command_noize as engine
+
+
+def test_streaming_stft_matches_offline(synthetic_wav):
+    """任意の大きさのブロックで流しても、一括の（因果的な）STFT と同じコマンドになる"""
+    y, sr = librosa.load(synthetic_wav(5.0), sr=None)
+    hop_length, n_fft = int(sr / 66), 2048
+    frequencies = librosa.fft_frequencies(sr=sr, n_fft=n_fft)
+    # 各hopの直前 n_fft サンプルを窓とする（先頭は 0 埋め）
+    offline = np.abs(librosa.stft(np.pad(y, (n_fft, 0)), n_fft=n_fft, hop_length=hop_length, center=False))[:, 1:]
+    expected = engine.pick_stft_peaks(offline, frequencies)
+
+    stft = live.StreamingSTFT(hop_length, n_fft)
+    rng = np.random.default_rng(0)
+    blocks, pos = [], 0
+    while pos < len(y):
+        n = int(rng.integers(1, 2000))
+        magnitude, ends = stft.feed(y[pos:pos + n])
+        pos += n
+        if len(ends):
+            blocks.append(engine.pick_stft_peaks(magnitude, frequencies))
+    actual = np.concatenate(blocks)
+
+    assert actual.shape == expected.shape
+    diff = np.abs(actual - expected)
+    assert np.all(diff[:, [0, 2]] == 0.0), "ピーク周波数が一致しません"
+    assert np.all(diff[:, [1, 3]] <= 1e-6), "振幅が許容誤差を超えています"
+
+
+def test_frame_ring_returns_latest():
+    ring = live.FrameRing(4)
+    assert ring.take_latest() is None
+    for i in range(6):
+        ring.put(bytes([i]) * 8, float(i))
+
+    # 満杯になった後の 2 フレームは書かれない
+    assert ring.overflows == 2
+    assert ring.take_latest() == (bytes([3]) * 8, 3.0, 3)
+    assert ring.take_latest() is None
+
+
+def test_sample_ring_is_bounded():
+    ring = live.SampleRing(8)
+    for i in range(100):
+        ring.append(float(i))
+
+    assert ring.count == 100
+    assert sorted(ring.values()) == list(range(92, 100))
+
+
+def test_live_rumble_stats_are_bounded(synthetic_wav, audio_joycon):
+    device, sim = audio_joycon()
+    rumble_live = live.LiveRumble([device], 44100, stats_samples=16)
+    rumble_live.start()
+    live.feed_wav(rumble_live, synthetic_wav(1.0))
+    rumble_live.stop()
+
+    stats = rumble_live.stats()
+    sent = [r for _, r in sim.rumble_reports()]
+    assert len(rumble_live.latencies.values()) == 16
+    assert len(rumble_live.callback_times.values()) == 16
+    assert stats["sent"] == len(sent) - 1  # 最後の停止フレームを除く
+    assert stats["sent"] + stats["dropped"] <= stats["frames"]  # 停止時にリングに残った分は数えない
+    assert sent[-1] == live.STOP_FRAME
+
+
+def test_unplugged_device_is_dropped(synthetic_wav, audio_joycon):
+    """切断されたデバイスだけを外し、残りのデバイスには送り続ける"""
+    (left, left_sim), (right, right_sim) = audio_joycon(unplug_after=10), audio_joycon()
+    rumble_live = live.LiveRumble([left, right], 44100)
+    rumble_live.start()
+    live.feed_wav(rumble_live, synthetic_wav(1.0))
+    rumble_live.stop()
+
+    assert [(jc, type(e)) for jc, e in rumble_live.errors] == [(left, OSError)]
+    assert rumble_live.joycons == [right]
+    assert len(left_sim.rumble_reports()) == 10
+    sent = [r for _, r in right_sim.rumble_reports()]
+    assert len(sent) == rumble_live.stats()["sent"] + 1
+    assert sent[-1] == live.STOP_FRAME
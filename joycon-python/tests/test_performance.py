@@ -0,0 +1,71 @@
+import time
+import numpy as np
+import pytest
+
+import rumble
+from main import AudioJoyCon, play_audio_on_joycons
+from pyjoycon.constants import JOYCON_VENDOR_ID, JOYCON_R_PRODUCT_ID
+from tests.synthetic import random_commands
+
+pytest.importorskip("pytest_benchmark")
+
+# ==========================================
+# SimulatedJoyCon での性能計測（pytest-benchmark）
+# ==========================================
+# python -m pytest tests/test_performance.py --benchmark-autosave で結果を保存し、
+# 変更後に --benchmark-compare --benchmark-compare-fail=mean:20% で劣化を検出する。
+
+FPS = 66
+
+
+def test_connect_time(benchmark, simulated):
+    """SPI の読み出しとセンサー設定を含む接続時間"""
+    def connect():
+        sim = simulated(color_body=(1, 2, 3))
+        return AudioJoyCon(JOYCON_VENDOR_ID, sim.product_id, transport=sim)
+
+    jc = benchmark.pedantic(connect, rounds=20)
+    assert jc.color_body == (1, 2, 3)
+
+
+def test_rumble_write_throughput(benchmark, audio_joycon):
+    jc, sim = audio_joycon()
+    frame = rumble.encode_joycon_rumble(320.0, 0.5, 160.0, 0.5) * 2
+
+    benchmark.pedantic(jc.send_rumble_data, (frame,), rounds=50, iterations=200)
+    written = [r for _, r in sim.rumble_reports()]
+    assert len(written) >= 50 * 200 and set(written) == {frame}
+
+
+def test_input_report_parse_cost(benchmark, audio_joycon):
+    """0x30 を受信中のデバイスでの get_status"""
+    jc, sim = audio_joycon(product_id=JOYCON_R_PRODUCT_ID)
+    sim.buttons[0] = 0x08  # a
+    sim.battery = 0x4E    # 残量 2
+    deadline = time.perf_counter() + 2.0
+    while not (jc.get_button_a() and jc.get_battery_level() == 2):
+        assert time.perf_counter() < deadline, "timed out"
+        time.sleep(0.005)
+
+    status = benchmark(jc.get_status)
+    assert status["buttons"]["right"]["a"] == 1
+    assert status["battery"]["level"] == 2
+
+
+def test_playback_jitter(benchmark, audio_joycon):
+    """play_audio_on_joycons のフレーム間隔の揺らぎとデバイス間のずれ"""
+    devices = [audio_joycon(), audio_joycon(product_id=JOYCON_R_PRODUCT_ID)]
+    commands = random_commands(2 * FPS)
+
+    benchmark.pedantic(play_audio_on_joycons, ([jc for jc, _ in devices], commands), {"fps": FPS}, rounds=1)
+    # 最後の停止フレームを除く
+    arrivals = [np.array([t for t, _ in sim.rumble_reports()][:-1]) for _, sim in devices]
+    intervals = np.diff(arrivals[0])
+    skew = np.abs(arrivals[0] - arrivals[1])
+    benchmark.extra_info.update(jitter_ms=intervals.std() * 1e3, skew_ms=np.median(skew) * 1e3)
+
+    assert len(arrivals[0]) == len(arrivals[1]) == 2 * FPS
+    assert intervals.mean() == pytest.approx(1 / FPS, rel=0.02)
+    # 1回のスケジューラの遅れで std は大きく振れるので、典型的な揺らぎは中央値で見る
+    assert np.median(np.abs(intervals - 1 / FPS)) < 0.001
+    assert np.median(skew) < 0.002
@@ -0,0 +1,41 @@
+import librosa
+import pytest
+
+import jcr
+import processor
+import mp3_to_command_noize as engine
+from pipeline import build_pipeline
+
+
+def test_matches_two_step_conversion(synthetic_wav, tmp_path, monkeypatch):
+    monkeypatch.setenv("JOYCON_CACHE", "0")
+    path = synthetic_wav(10.0)
+    # 以前: 骨格化した WAV を書き出し、解析で読み直す
+    skeleton_path = str(tmp_path / "skeleton.wav")
+    processor.create_skeleton_audio(path, skeleton_path)
+    two_step = engine.apply_median_filter(engine.analyze_with_stft(skeleton_path), kernel_size=5)
+
+    out = tmp_path / "pipeline.jcr"
+    buf = build_pipeline(path, str(out)).run(verbose=False)
+    # 解析側の HPSS と WAV の量子化を省いた分だけ値は変わるので、形と書き出した内容だけ比べる
+    assert buf.commands.shape == two_step.shape
+    assert [name for name, seconds in buf.timings if seconds is None] == ["hpss"]
+    with jcr.load_track(str(out)) as track:
+        assert bytes(track.frames) == buf.payload
+
+
+@pytest.mark.parametrize("use_cache", [True, False])
+def test_decodes_once(synthetic_wav, monkeypatch, use_cache):
+    if not use_cache:
+        monkeypatch.setenv("JOYCON_CACHE", "0")
+    path = synthetic_wav(5.0)
+    decoded = []
+    load = librosa.load
+
+    def counting_load(*args, **kw):
+        decoded.append(args[0])
+        return load(*args, **kw)
+    monkeypatch.setattr(librosa, "load", counting_load)
+
+    build_pipeline(path, skeletonize=False).run(verbose=False)
+    assert decoded == [path]
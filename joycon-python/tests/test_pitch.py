@@ -0,0 +1,63 @@
+import librosa
+import numpy as np
+import pytest
+
+import pitch
+import mp3_to_command_noize as engine
+
+SR = 22050
+HOP = SR // 66
+
+
+def _tone(f0: float, seconds: float = 2.0) -> np.ndarray:
+    """倍音付きの f0 の音のあとに同じ長さの無音"""
+    t = np.arange(int(seconds * SR)) / SR
+    y = sum(np.sin(2 * np.pi * f0 * h * t) / h for h in range(1, 5))
+    return np.concatenate([0.3 * y, np.zeros(len(t))]).astype(np.float32)
+
+
+@pytest.mark.parametrize("f0", [110.0, 220.0, 440.0])
+def test_yin_finds_f0(f0):
+    estimate, voiced = pitch.yin(_tone(f0), SR, engine.F0_FMIN, engine.F0_FMAX, HOP)
+    half = len(estimate) // 2
+
+    # 音の部分（境界の窓を除く）は有声で f0 に一致し、無音の部分は無声
+    assert voiced[5:half - 5].all()
+    assert np.allclose(estimate[5:half - 5], f0, rtol=0.01)
+    assert not voiced[half + 5:].any() and not estimate[half + 5:].any()
+
+
+def test_yin_workers_match_single_process():
+    y = _tone(220.0) + _tone(330.0)[::-1]
+    single = pitch.yin(y, SR, engine.F0_FMIN, engine.F0_FMAX, HOP, chunk_frames=64)
+    parallel = pitch.yin(y, SR, engine.F0_FMIN, engine.F0_FMAX, HOP, workers=2, chunk_frames=64)
+
+    assert np.array_equal(single[0], parallel[0]) and np.array_equal(single[1], parallel[1])
+
+
+@pytest.mark.parametrize("f0", [110.0, 220.0, 440.0])
+def test_hps_finds_f0(f0):
+    n_fft = 4096
+    magnitude = np.abs(librosa.stft(_tone(f0), n_fft=n_fft, hop_length=HOP))
+    estimate, voiced = pitch.hps(magnitude, librosa.fft_frequencies(sr=SR, n_fft=n_fft),
+                                 engine.F0_FMIN, engine.F0_FMAX)
+    half = magnitude.shape[1] // 2
+
+    assert voiced[10:half - 10].all()
+    assert np.allclose(estimate[10:half - 10], f0, atol=SR / n_fft)
+    assert not voiced[half + 10:].any()
+
+
+def test_unknown_method_is_rejected(synthetic_wav):
+    with pytest.raises(ValueError):
+        engine.estimate_f0(synthetic_wav(1.0), method="crepe")
+
+
+@pytest.mark.parametrize("method", ["hps", "yin"])
+def test_analyze_with_f0_matches_f0_commands(synthetic_wav, method):
+    path = synthetic_wav(2.0)
+    y_harmonic, sr = engine.cached_harmonic(path, margin=1.2)
+
+    # hps はキャッシュ済みのスペクトログラムを使うが、y_harmonic から計算したものと一致する
+    expected = engine.f0_commands(y_harmonic, sr, method=method)
+    assert np.array_equal(engine.analyze_with_f0(path, method=method), expected)
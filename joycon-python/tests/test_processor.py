@@ -0,0 +1,19 @@
+import numpy as np
+import soundfile as sf
+
+import processor
+
+
+def test_stream_matches_batch(synthetic_wav, tmp_path, monkeypatch):
+    monkeypatch.setenv("JOYCON_CACHE", "0")
+    path = synthetic_wav(20.0)
+    batch_path, stream_path = str(tmp_path / "batch.wav"), str(tmp_path / "stream.wav")
+    processor.create_skeleton_audio(path, batch_path)
+    # 小さなブロックでブロック境界を多く通す
+    processor.create_skeleton_audio_stream(path, stream_path, chunk_samples=1 << 16)
+    batch, _ = sf.read(batch_path)
+    stream, _ = sf.read(stream_path)
+
+    assert batch.shape == stream.shape
+    # 出力は PCM_16 なので、量子化の1段（1/32768）までの差を許す
+    assert np.max(np.abs(batch - stream)) <= 1.5 / 32768
@@ -0,0 +1,100 @@
+import json
+import threading
+import time
+import numpy as np
+import pytest
+
+import profiling
+
+
+def test_disabled_span_is_shared_null():
+    profiling.disable()
+    with profiling.span("stft", count=10) as s:
+        s.count = 20  # ignored
+    assert profiling.span("hpss") is profiling._NULL_SPAN
+    assert profiling.active() is None
+
+
+def test_nested_spans_record_parent_and_rate(profiler):
+    with profiling.span("pipeline"):
+        with profiling.span("stft", count=100) as s:
+            pass
+        with profiling.span("stft") as s:
+            s.count = 50
+
+    spans = {(s.name, s.parent) for s in profiler.spans}
+    assert spans == {("pipeline", None), ("stft", "pipeline")}
+    summary = profiler.summary()
+    assert summary["stft"]["calls"] == 2 and summary["stft"]["count"] == 150
+    assert summary["pipeline"]["count"] is None and summary["pipeline"]["rate"] is None
+    assert summary["pipeline"]["wall"] >= summary["stft"]["wall"]
+
+
+def test_threads_keep_their_own_stack(profiler):
+    def worker():
+        with profiling.span("writer"):
+            pass
+
+    with profiling.span("main"):
+        t = threading.Thread(target=worker, name="worker-0")
+        t.start()
+        t.join()
+
+    writer = next(s for s in profiler.spans if s.name == "writer")
+    assert (writer.parent, writer.thread) == (None, "worker-0")
+
+
+def test_cpu_is_the_spans_own_thread(profiler):
+    stop = threading.Event()
+
+    def busy():
+        while not stop.is_set():
+            pass
+
+    t = threading.Thread(target=busy)
+    t.start()
+    try:
+        with profiling.span("sleep") as s:
+            time.sleep(0.2)
+    finally:
+        stop.set()
+        t.join()
+    # the other thread was busy all along, but only this thread's CPU time counts
+    assert s.wall >= 0.2 and s.cpu < 0.05
+
+
+def test_rss_delta_is_per_span(profiler):
+    with profiling.span("alloc") as alloc:
+        block = np.ones(50_000_000 // 8)  # 50 MB, every page touched
+    with profiling.span("idle") as idle:
+        pass
+    del block
+    if alloc.rss is None:
+        pytest.skip("RSS is not available on this platform")
+
+    assert alloc.rss_delta > 40e6
+    # unlike the process peak, a later span doesn't inherit the growth
+    assert abs(idle.rss_delta) < 10e6
+    assert profiler.summary()["idle"]["rss_delta"] == idle.rss_delta
+
+
+def test_profiled_counts_the_result(profiler):
+    @profiling.profiled("encode")
+    def encode(n):
+        return bytes(n)
+
+    encode(8)
+    assert profiler.summary()["encode"]["count"] == 8
+
+
+def test_reports_are_valid_json(profiler, tmp_path):
+    with profiling.span("stft", count=10):
+        pass
+    profiler.write_json(tmp_path / "profile.json")
+    profiler.write_chrome_trace(tmp_path / "trace.json")
+
+    report = json.loads((tmp_path / "profile.json").read_text(encoding="utf-8"))
+    assert [s["name"] for s in report["spans"]] == ["stft"]
+    trace = json.loads((tmp_path / "trace.json").read_text(encoding="utf-8"))
+    phases = sorted(e["ph"] for e in trace["traceEvents"])
+    assert phases == ["M", "X"]
@@ -0,0 +1,35 @@
+import numpy as np
+
+import rumble
+from tests.synthetic import edge_commands, random_commands
+
+
+def test_encode_matches_formula():
+    commands = np.concatenate([
+        edge_commands(),
+        random_commands(20000, seed=1),
+        # 0–1252 Hz / 0–1 を細かい格子で走査
+        np.stack(np.meshgrid(
+            np.linspace(0.0, 1252.0, 313), np.linspace(0.0, 1.0, 101),
+        ), axis=-1).reshape(-1, 2).repeat(2, axis=1),
+    ])
+
+    expected = b''.join(rumble._encode_joycon_rumble_formula(*cmd) * 2 for cmd in commands.tolist())
+    assert b''.join(rumble.encode_joycon_rumble(*cmd) * 2 for cmd in commands.tolist()) == expected
+    assert rumble.encode_many(commands) == expected
+
+
+def test_decode_inverts_pack():
+    """実機の範囲内のコードは、パックしてデコードすると元に戻る"""
+    hf_codes = np.arange(0x60, 0x60 + 128)
+    amp_codes = np.arange(0, rumble.AMP_CODE_MAX + 1)
+    lf_codes = np.arange(0x40, 0x40 + 128)
+    grid = np.stack([
+        np.repeat(hf_codes, len(amp_codes)), np.tile(amp_codes, len(hf_codes)),
+        np.repeat(lf_codes, len(amp_codes)), np.tile(amp_codes, len(lf_codes)),
+    ], axis=1)
+    payload = b''.join(rumble._pack_codes(*map(int, row)) for row in grid)
+
+    expected = grid.copy()
+    expected[:, 3] -= expected[:, 3] % 2  # LF振幅はコードの最下位ビットが失われる
+    assert np.array_equal(rumble.decode_codes(payload, frame_size=4), expected)
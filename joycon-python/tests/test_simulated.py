@@ -0,0 +1,46 @@
+import time
+
+from main import AudioJoyCon
+from pyjoycon import JoyCon
+from pyjoycon.constants import JOYCON_VENDOR_ID, JOYCON_L_PRODUCT_ID, JOYCON_R_PRODUCT_ID
+
+
+def _wait_for(condition, timeout: float = 2.0):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        assert time.perf_counter() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_connect_reads_flash(simulated):
+    sim = simulated(color_body=(1, 2, 3), color_btn=(4, 5, 6), accel_offset=(12, -30, 7), gyro_offset=(-3, 5, 20))
+    jc = JoyCon(JOYCON_VENDOR_ID, JOYCON_L_PRODUCT_ID, transport=sim)
+
+    assert (jc.color_body, jc.color_btn) == ((1, 2, 3), (4, 5, 6))
+    assert (jc._ACCEL_OFFSET_X, jc._ACCEL_OFFSET_Y, jc._ACCEL_OFFSET_Z) == (12, -30, 7)
+    assert (jc._GYRO_OFFSET_X, jc._GYRO_OFFSET_Y, jc._GYRO_OFFSET_Z) == (-3, 5, 20)
+    assert (sim.input_mode, sim.imu_enabled) == (0x30, True)
+
+
+def test_streams_input_reports(simulated):
+    sim = simulated(product_id=JOYCON_R_PRODUCT_ID)
+    jc = JoyCon(JOYCON_VENDOR_ID, JOYCON_R_PRODUCT_ID, transport=sim)
+
+    sim.buttons[0] = 0x08  # a
+    _wait_for(lambda: jc.get_button_a())
+    sent, t0 = sim.reports_sent, time.perf_counter()
+    time.sleep(0.3)
+    rate = (sim.reports_sent - sent) / (time.perf_counter() - t0)
+    assert 50 < rate < 80  # about 66 Hz
+
+
+def test_records_rumble_writes(simulated):
+    sim = simulated()
+    jc = AudioJoyCon(JOYCON_VENDOR_ID, JOYCON_L_PRODUCT_ID, transport=sim)
+    frames = [bytes([n]) * 8 for n in range(10)]
+    for frame in frames:
+        jc.send_rumble_data(frame)
+
+    recorded = sim.rumble_reports()[-10:]
+    assert [r for _, r in recorded] == frames
+    assert all(a <= b for (a, _), (b, _) in zip(recorded, recorded[1:]))
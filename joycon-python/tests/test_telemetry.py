@@ -0,0 +1,46 @@
+import numpy as np
+
+from fanout import play_tracks_on_joycons
+from main import play_audio_on_joycons
+from telemetry import PlaybackTelemetry
+from tests.synthetic import random_commands
+
+FPS = 66
+
+
+def _play_with_stall(audio_joycon):
+    commands = random_commands(2 * FPS)
+    devices = [audio_joycon(write_latency=0.001),
+               audio_joycon(write_latency=0.002, stall_at=(FPS // 2,), stall=0.2)]
+    writers = play_tracks_on_joycons([(jc, commands) for jc, _ in devices], fps=FPS, telemetry=True)
+    return writers, writers[0].telemetry
+
+
+def test_stalled_device_is_reported(audio_joycon):
+    writers, telemetry = _play_with_stall(audio_joycon)
+
+    stalled = telemetry.device_summary(1)
+    assert stalled["max_stall_ms"] > 150
+    assert stalled["missed_frames"] == writers[1].overruns > 0
+    assert telemetry.device_summary(0)["missed_frames"] == 0
+
+
+def test_save_and_load(audio_joycon, tmp_path):
+    _, telemetry = _play_with_stall(audio_joycon)
+    path = str(tmp_path / "telemetry.npz")
+    telemetry.save(path)
+
+    loaded = PlaybackTelemetry.load(path)
+    assert loaded.names == telemetry.names
+    assert (loaded.num_devices, loaded.num_frames) == (2, 2 * FPS)
+    assert np.array_equal(loaded.write_end, telemetry.write_end[:2], equal_nan=True)
+
+
+def test_play_audio_on_joycons_returns_every_device(audio_joycon):
+    devices = [audio_joycon(), audio_joycon()]
+    telemetry = play_audio_on_joycons([jc for jc, _ in devices], random_commands(FPS), fps=FPS, telemetry=True)
+
+    assert telemetry.num_devices == 2
+    assert [s["frames_sent"] for s in telemetry.summary()] == [FPS, FPS]
+    # どのデバイスもマスタークロックの同じ予定時刻に合わせて送る
+    assert np.array_equal(telemetry.scheduled[0], telemetry.scheduled[1])